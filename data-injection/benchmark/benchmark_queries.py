@@ -0,0 +1,175 @@
+# Fraud-query latency benchmark for the typed Spanner, schemaless Spanner and BigQuery graphs
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dotenv import dotenv_values
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmark_dir, '..', 'common'))
+
+from fraud_queries import GraphDialect, workloads, run_spanner_query, run_bigquery_query
+
+# Each target reads the .env of its import folder, like its test_queries.py does
+target_folders = {
+    "spanner": "spanner",
+    "spanner-schemaless": "spanner-schemaless",
+    "bigquery": "bigquery",
+}
+
+def load_target_config(target):
+    """Settings of a target from its folder's .env, falling back to the process environment"""
+    folder = os.path.join(benchmark_dir, '..', target_folders[target])
+    values = dotenv_values(os.path.join(folder, '.env'))
+
+    def setting(name, default=None):
+        return values.get(name) or os.getenv(name) or default
+
+    return {
+        "folder": folder,
+        "instance": setting('INSTANCE_NAME'),
+        "database": setting('DATABASE_NAME', "paysim_schemaless" if target == "spanner-schemaless" else "paysim"),
+        "dataset": setting('DATASET_NAME', "paysim_graph"),
+        "graph": setting('GRAPH_NAME', "paysim_schemaless_graph" if target == "spanner-schemaless" else "graph_view"),
+        "keyfile": setting('GOOGLE_AUTH_KEYFILE', 'google_auth_keyfile.json'),
+        "typed_schema": setting('TYPED_SCHEMA', 'false').strip().lower() in ['1', 'true', 'yes'],
+    }
+
+def open_target(target, config, concurrency):
+    """Return (dialect, graph name, run(query), profile(query)) for a target"""
+    keyfile = os.path.join(config["folder"], config["keyfile"])
+    if target == "bigquery":
+        from google.cloud import bigquery
+        from google.oauth2 import service_account
+        credentials = service_account.Credentials.from_service_account_file(keyfile)
+        client = bigquery.Client(credentials=credentials, project=credentials.project_id)
+        run = lambda query: run_bigquery_query(client, query)
+        return (GraphDialect("typed", config["typed_schema"]), f'{config["dataset"]}.{config["graph"]}',
+                run, run)
+
+    from spanner_connection import get_spanner_client, get_database
+    if not config["instance"]:
+        raise ValueError(f"INSTANCE_NAME is not set for {target}")
+    client = get_spanner_client(keyfile)
+    database = get_database(client.instance(config["instance"]), config["database"], pool_size=concurrency)
+    schema = "schemaless" if target == "spanner-schemaless" else "typed"
+    return (GraphDialect(schema, config["typed_schema"]), config["graph"],
+            lambda query: run_spanner_query(database, query),
+            lambda query: run_spanner_query(database, query, profile=True))
+
+def latency_percentiles(latencies):
+    """p50/p95/p99/max of latencies in seconds, in milliseconds"""
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "p50": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99": round(float(np.percentile(latencies_ms, 99)), 2),
+        "max": round(float(latencies_ms.max()), 2),
+    }
+
+def measure(run, profile, query, warmup, repetitions, concurrency):
+    """Run a query warmup times unmeasured, then repetitions times with concurrency parallel clients"""
+    for _ in range(warmup):
+        run(query)
+
+    latencies = []
+    rows = []
+    errors = []
+    lock = threading.Lock()
+
+    def timed_run(_):
+        try:
+            result_rows, latency, _ = run(query)
+            with lock:
+                latencies.append(latency)
+                rows.append(len(result_rows))
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed_run, range(repetitions)))
+    wall_seconds = time.perf_counter() - start
+
+    # Scan statistics come from one extra run, so profiling does not skew the latencies
+    stats = {}
+    if latencies:
+        _, _, stats = profile(query)
+    return {
+        "repetitions": repetitions,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "rows": rows[0] if rows else None,
+        "latency_ms": latency_percentiles(latencies),
+        "queries_per_second": round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        "stats": stats,
+    }
+
+def format_bytes(stats):
+    """Bytes scanned (BigQuery) or returned (Spanner) for the console summary"""
+    for key in ["bytes_processed", "bytes_returned"]:
+        if stats.get(key) is not None:
+            return f"{key.replace('_', ' ')} {stats[key]}"
+    return ""
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark fraud-detection graph queries per backend")
+    parser.add_argument('--targets', default='spanner,spanner-schemaless',
+                        help="Comma separated: spanner, spanner-schemaless, bigquery")
+    parser.add_argument('--workloads', default=','.join(workloads),
+                        help=f"Comma separated: {', '.join(workloads)}")
+    parser.add_argument('--warmup', type=int, default=2, help="Unmeasured runs per query")
+    parser.add_argument('--repetitions', type=int, default=10, help="Measured runs per query")
+    parser.add_argument('--concurrency', type=int, default=1, help="Queries running in parallel")
+    parser.add_argument('--emulator', action='store_true',
+                        help="Run the Spanner targets against the emulator (SPANNER_EMULATOR_HOST, default localhost:9010)")
+    parser.add_argument('--show-queries', action='store_true', help="Print each query before running it")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    targets = [target.strip() for target in args.targets.split(',') if target.strip()]
+    selected = [name.strip() for name in args.workloads.split(',') if name.strip()]
+    if args.emulator:
+        os.environ.setdefault('SPANNER_EMULATOR_HOST', 'localhost:9010')
+
+    report = {"warmup": args.warmup, "repetitions": args.repetitions, "concurrency": args.concurrency, "runs": []}
+    for target in targets:
+        config = load_target_config(target)
+        dialect, graph, run, profile = open_target(target, config, args.concurrency)
+        print(f"\n{target}: graph {graph} ({dialect.schema} schema"
+              f"{', typed columns' if dialect.typed_columns else ''})")
+        for name in selected:
+            query = workloads[name](dialect, graph)
+            if args.show_queries:
+                print(query)
+            result = measure(run, profile, query, args.warmup, args.repetitions, args.concurrency)
+            report["runs"].append({"target": target, "schema": dialect.schema, "workload": name, **result})
+            latency = result["latency_ms"]
+            print(f"  {name}: p50 {latency['p50']}ms p95 {latency['p95']}ms p99 {latency['p99']}ms, "
+                  f"{result['rows']} rows {format_bytes(result['stats'])}"
+                  f"{', ' + str(result['errors']) + ' errors: ' + result['first_error'] if result['errors'] else ''}")
+
+    # Side by side: every target per workload
+    print("\nWorkload comparison (p50 / p95 / p99 ms):")
+    for name in selected:
+        print(f"  {name}")
+        for run_result in [r for r in report["runs"] if r["workload"] == name]:
+            latency = run_result["latency_ms"]
+            print(f"    {run_result['target']:<20} {latency['p50']:>10} {latency['p95']:>10} {latency['p99']:>10}"
+                  f"  {format_bytes(run_result['stats'])}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved benchmark results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# Import throughput benchmark for the typed and schemaless Spanner loaders
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmark_dir, '..', 'common'))
+sys.path.append(os.path.join(benchmark_dir, '..', 'spanner'))
+sys.path.append(os.path.join(benchmark_dir, '..', 'spanner-schemaless'))
+
+# The loaders read INSTANCE_NAME at import time
+os.environ.setdefault('INSTANCE_NAME', 'paysim-benchmark')
+import import_paysim
+import import_paysim_schemaless
+from fake_spanner import FakeDatabase
+from spanner_connection import get_spanner_client, get_database
+
+# Tables loaded by each loader: one small node table, the wide transaction table and an edge table
+typed_tables = [
+    ("clients.csv", "Client", False),
+    ("transactions_cleaned.csv", "Transaction", True),
+    ("Client_Perform_Transaction.csv", "Client_Perform_Transaction", False),
+]
+schemaless_tables = [
+    ("clients.csv", "client", False),
+    ("transactions_cleaned.csv", "transaction", False),
+    ("Client_Perform_Transaction.csv", "performs", True),
+]
+
+def generate_dataset(data_dir, scale, seed=42):
+    """Write a synthetic PaySim-shaped dataset with `scale` transactions to data_dir/raw and data_dir/processed"""
+    rng = np.random.default_rng(seed)
+    raw_dir = os.path.join(data_dir, 'raw')
+    processed_dir = os.path.join(data_dir, 'processed')
+    os.makedirs(raw_dir, exist_ok=True)
+    os.makedirs(processed_dir, exist_ok=True)
+
+    num_clients = max(10, scale // 10)
+    client_ids = rng.permutation(np.unique(rng.integers(10**15, 10**16, size=num_clients * 2, dtype=np.int64))[:num_clients])
+    clients = pd.DataFrame({
+        'email': [f"client{i}@mail.com" for i in range(num_clients)],
+        'id': client_ids,
+        'isfraud': rng.random(num_clients) < 0.05,
+        'name': [f"Client {i}" for i in range(num_clients)],
+        'phonenumber': [f"{i:03d}-555-{i % 10000:04d}" for i in range(num_clients)],
+        'ssn': [f"{i % 1000:03d}-55-{i % 10000:04d}" for i in range(num_clients)],
+    })
+    clients.to_csv(os.path.join(raw_dir, 'clients.csv'), index=False)
+
+    globalstep = np.arange(scale, dtype=np.int64)
+    timestamps = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.cumsum(rng.integers(1, 31, size=scale)), unit='s')
+    transactions = pd.DataFrame({
+        'step': globalstep // 100,
+        'action': rng.choice(['CASH_IN', 'CASH_OUT', 'DEBIT', 'PAYMENT', 'TRANSFER'], size=scale),
+        'amount': rng.uniform(1, 100000, size=scale).round(2),
+        'idorig': rng.choice(client_ids, size=scale),
+        'typeorig': 'CLIENT',
+        'iddest': rng.choice(client_ids, size=scale),
+        'typedest': 'CLIENT',
+        'isfraud': rng.random(scale) < 0.01,
+        'isflaggedfraud': False,
+        'globalstep': globalstep,
+        'timestamp': timestamps.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+    transactions.to_csv(os.path.join(processed_dir, 'transactions_cleaned.csv'), index=False)
+
+    performs = pd.DataFrame({
+        'client_id': transactions['idorig'].astype('string'),
+        'transaction_id': transactions['globalstep'].astype('string'),
+        'timestamp': transactions['timestamp'],
+    }).sort_values(by=['client_id', 'transaction_id'])
+    performs.to_csv(os.path.join(processed_dir, 'Client_Perform_Transaction.csv'), index=False)
+
+def summarize(rows, prepare_seconds, encode_seconds, commit_seconds, latencies, batch_size, concurrency):
+    """Per-table throughput and commit latency percentiles"""
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    total_seconds = prepare_seconds + encode_seconds + commit_seconds
+    return {
+        "rows": rows,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "commits": len(latencies),
+        "prepare_seconds": round(prepare_seconds, 4),
+        "encode_seconds": round(encode_seconds, 4),
+        "commit_seconds": round(commit_seconds, 4),
+        "encode_rows_per_second": round(rows / encode_seconds, 1) if encode_seconds else None,
+        "commit_rows_per_second": round(rows / commit_seconds, 1) if commit_seconds else None,
+        "rows_per_second": round(rows / total_seconds, 1) if total_seconds else None,
+        "commit_latency_ms": {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        },
+    }
+
+def reset_schemaless_tables(database):
+    """Recreate GraphNode/GraphEdge (tables only, the emulator needs no graph for writes)"""
+    import_paysim_schemaless.g_nodeRegistry.clear()
+    if isinstance(database, FakeDatabase):
+        return
+    for table_name in ['GraphEdge', 'GraphNode']:
+        if import_paysim.table_exists(database, table_name):
+            database.update_ddl([f"DROP TABLE {table_name}"]).result()
+    with open(os.path.join(benchmark_dir, '..', 'spanner-schemaless', 'schemaless.sql'), 'r') as f:
+        statements = [stmt.strip() for stmt in f.read().split(';') if stmt.strip()]
+    database.update_ddl([stmt for stmt in statements if stmt.startswith('CREATE TABLE')]).result()
+
+def bench_typed(database, batch_size, concurrency):
+    """Load the typed tables with the loader of import_paysim.py, including its table creation and
+    checkpoint writes. It encodes inside the loader and commits one batch at a time, so only prepare
+    and load time are reported and concurrency is always 1."""
+    results = {}
+    checkpoint = {"tables": {}}
+    for csv_file, table_name, is_transaction in typed_tables:
+        start = time.perf_counter()
+        df = import_paysim.prepare_data(csv_file, is_transaction)
+        prepare_seconds = time.perf_counter() - start
+
+        table_batch_size = batch_size or import_paysim.get_batch_size(df.columns)
+        latencies = []
+        start = time.perf_counter()
+        import_paysim.load_csv_to_spanner(database, df, table_name, checkpoint, table_batch_size, latencies)
+        load_seconds = time.perf_counter() - start
+        results[table_name] = summarize(len(df), prepare_seconds, 0, load_seconds, latencies, table_batch_size, 1)
+    return results
+
+def bench_schemaless(database, batch_size, concurrency):
+    """Load the schemaless tables, timing prepare (prefix ids and JSON), encode and commit separately"""
+    reset_schemaless_tables(database)
+    results = {}
+    for csv_file, label, is_relationship in schemaless_tables:
+        start = time.perf_counter()
+        df = import_paysim_schemaless.prepare_data(csv_file, label, is_relationship)
+        prepare_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = import_paysim_schemaless.encode_rows(df)
+        encode_seconds = time.perf_counter() - start
+
+        table_name = "GraphEdge" if is_relationship else "GraphNode"
+        table_batch_size = batch_size or import_paysim_schemaless.get_batch_size(df.columns)
+        latencies = []
+        start = time.perf_counter()
+        import_paysim_schemaless.commit_batches(database, table_name, list(df.columns), rows,
+                                                table_batch_size, concurrency, latencies)
+        commit_seconds = time.perf_counter() - start
+        results[label] = summarize(len(rows), prepare_seconds, encode_seconds, commit_seconds,
+                                   latencies, table_batch_size, concurrency)
+    return results
+
+def bench_schemaless_streaming(database, batch_size, concurrency):
+    """Load the schemaless tables through the streaming pipeline; stages overlap, so only end-to-end time is reported"""
+    reset_schemaless_tables(database)
+    results = {}
+    for csv_file, label, is_relationship in schemaless_tables:
+        latencies = []
+        start = time.perf_counter()
+        rows = import_paysim_schemaless.stream_csv_to_spanner(database, csv_file, label, is_relationship,
+                                                              batch_size=batch_size or None,
+                                                              concurrency=concurrency, latencies=latencies)
+        total_seconds = time.perf_counter() - start
+        results[label] = summarize(rows, 0, 0, total_seconds, latencies, batch_size or None, concurrency)
+    return results
+
+loader_benches = {
+    'typed': bench_typed,
+    'schemaless': bench_schemaless,
+    'schemaless-streaming': bench_schemaless_streaming,
+}
+
+def open_emulator_database(instance_id, database_id, pool_size):
+    """Create (if needed) and open a database on the local Spanner emulator"""
+    os.environ.setdefault('SPANNER_EMULATOR_HOST', 'localhost:9010')
+    keyfile = os.path.join(benchmark_dir, '..', 'spanner', import_paysim.google_auth_keyfile)
+    client = get_spanner_client(keyfile)
+    instance = client.instance(instance_id,
+                               configuration_name=f"projects/{client.project}/instanceConfigs/emulator-config",
+                               display_name="PaySim benchmark",
+                               node_count=1)
+    if not instance.exists():
+        instance.create().result()
+    database = instance.database(database_id)
+    if not database.exists():
+        database.create().result()
+    return get_database(instance, database_id, pool_size=pool_size)
+
+def parse_list(value, cast=int):
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Spanner import throughput per table")
+    parser.add_argument('--backend', choices=['fake', 'emulator'], default='fake',
+                        help="fake: in-memory database with simulated commit latency; emulator: local Spanner emulator")
+    parser.add_argument('--loaders', default='typed,schemaless', help="Comma separated: typed, schemaless, schemaless-streaming")
+    parser.add_argument('--scales', default='10000', help="Comma separated transaction counts")
+    parser.add_argument('--batch-sizes', default='0',
+                        help="Comma separated rows per commit, 0 uses the loader's mutation-limit batch size")
+    parser.add_argument('--concurrency', default='1', help="Comma separated numbers of parallel commits")
+    parser.add_argument('--typed-schema', action='store_true', help="Use TIMESTAMP/INT64/NUMERIC typed columns")
+    parser.add_argument('--fake-commit-latency-ms', type=float, default=5.0,
+                        help="Simulated commit latency of the fake backend")
+    parser.add_argument('--instance', default='paysim-benchmark', help="Emulator instance id")
+    parser.add_argument('--database', default='paysim_benchmark', help="Emulator database id")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the loaders' per-batch output")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    loaders = [loader.strip() for loader in args.loaders.split(',') if loader.strip()]
+    scales = parse_list(args.scales)
+    batch_sizes = parse_list(args.batch_sizes)
+    concurrencies = parse_list(args.concurrency)
+    import_paysim.typedSchema = args.typed_schema
+
+    if args.backend == 'emulator':
+        database = open_emulator_database(args.instance, args.database, max(concurrencies))
+    else:
+        database = FakeDatabase(commit_latency=args.fake_commit_latency_ms / 1000)
+
+    report = {"backend": args.backend, "typed_schema": args.typed_schema, "runs": []}
+    with tempfile.TemporaryDirectory(prefix='paysim-bench-') as data_dir:
+        # Point both loaders at the generated data, and the typed loader's checkpoint next to it
+        for module in [import_paysim, import_paysim_schemaless]:
+            module.raw_data_dir = os.path.join(data_dir, 'raw')
+            module.processed_data_dir = os.path.join(data_dir, 'processed')
+        import_paysim.checkpoint_path = os.path.join(data_dir, 'import_checkpoint.json')
+
+        for scale in scales:
+            print(f"Generating dataset with {scale} transactions...")
+            generate_dataset(data_dir, scale)
+            for loader in loaders:
+                bench = loader_benches[loader]
+                # The typed loader commits serially
+                loader_concurrencies = [1] if loader == 'typed' else concurrencies
+                for batch_size in batch_sizes:
+                    for concurrency in loader_concurrencies:
+                        print(f"Running {loader} loader: scale={scale} batch_size={batch_size or 'auto'} "
+                              f"concurrency={concurrency}")
+                        output = sys.stdout if args.verbose else io.StringIO()
+                        with contextlib.redirect_stdout(output):
+                            tables = bench(database, batch_size, concurrency)
+                        for table_name, stats in tables.items():
+                            print(f"  {table_name}: {stats['rows_per_second']} rows/s end-to-end, "
+                                  f"encode {stats['encode_seconds']}s, commit p50 {stats['commit_latency_ms']['p50']}ms")
+                        report["runs"].append({
+                            "loader": loader,
+                            "scale": scale,
+                            "batch_size": batch_size or None,
+                            "concurrency": concurrency,
+                            "tables": tables,
+                        })
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report_json)
+        print(f"Saved benchmark results to {args.output}")
+    else:
+        print(report_json)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# Append new transactions and their edges to an imported BigQuery graph through the Storage Write API
+import sys
+import os
+import json
+import time
+import hashlib
+import argparse
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+import import_to_bigquery
+from import_to_bigquery import datasetName, google_auth_keyfile, typedSchema, derivedEdges
+
+# Rows per appended Arrow record batch, kept well under the 10 MB request limit
+appendBatchRows = int(os.getenv('BQ_APPEND_BATCH_ROWS') or 10000)
+appendRetries = int(os.getenv('BQ_APPEND_RETRIES') or 3)
+
+# google.rpc status codes in append responses
+ALREADY_EXISTS = 6
+
+# Streams and confirmed offsets per project, dataset and input file, so a rerun continues where
+# the last one stopped. None keeps the state in memory (--fake, whose streams end with the process).
+append_state_path = os.path.join(os.path.dirname(__file__), '.append_state.json')
+
+def load_append_state():
+    """Load the append state, or an empty one if there is none"""
+    if append_state_path is None or not os.path.exists(append_state_path):
+        return {}
+    with open(append_state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_append_state(state):
+    """Write the append state atomically so a crash never leaves a partial file"""
+    if append_state_path is None:
+        return
+    tmp_path = append_state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, append_state_path)
+
+def file_fingerprint(csv_path):
+    """Fingerprint the input file contents"""
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def derive_edges(df):
+    """Edge rows of new transactions, with the same columns as src/gen_relationships.py"""
+    edges = {}
+    client_perform = df[['idorig', 'globalstep', 'timestamp']].copy()
+    client_perform.columns = ['client_id', 'transaction_id', 'timestamp']
+    edges["Client_Perform_Transaction"] = client_perform
+
+    for table_name, types, id_column in [
+        ("Transaction_To_Client", ['CLIENT', 'MULE'], 'client_id'),
+        ("Transaction_To_Merchant", ['MERCHANT'], 'merchant_id'),
+        ("Transaction_To_Bank", ['BANK'], 'bank_id'),
+    ]:
+        edge = df[df['typedest'].isin(types)][['globalstep', 'iddest', 'timestamp']].copy()
+        edge.columns = ['transaction_id', id_column, 'timestamp']
+        edges[table_name] = edge
+    return edges
+
+def prepare_tables(csv_path):
+    """Prepare the Transaction rows and their edge rows the way import_to_bigquery.py does"""
+    df = pd.read_csv(csv_path)
+    df.columns = [col.lower() for col in df.columns]
+    print(f"Read {len(df)} new transactions from {csv_path}")
+
+    tables = {"Transaction": import_to_bigquery.prepare_frame(df.copy(), "transactions_cleaned.csv", True)}
+    if derivedEdges:
+        # The edge views over Transaction pick up the new rows by themselves
+        return tables
+    for table_name, edge in derive_edges(df).items():
+        tables[table_name] = import_to_bigquery.prepare_frame(edge, f"{table_name}.csv")
+    for table_name, frame in tables.items():
+        if frame is None:
+            raise ValueError(f"Could not prepare {table_name} rows")
+    return tables
+
+def get_write_schema(bq_client, dataset_id, df, table_name):
+    """Schema of the destination table, or the importer's explicit schema when there is no BigQuery client"""
+    if bq_client is not None:
+        return bq_client.get_table(f"{dataset_id}.{table_name}").schema
+    return import_to_bigquery.get_table_schema(df, table_name)
+
+def serialize_batches(df, schema, batch_rows):
+    """Serialized Arrow schema and record batches of the rows, in the destination column order"""
+    arrow_schema = import_to_bigquery.get_arrow_schema(schema)
+    table = pa.Table.from_pandas(df[[field.name for field in schema]], schema=arrow_schema, preserve_index=False)
+    batches = [(batch.serialize().to_pybytes(), batch.num_rows) for batch in table.to_batches(max_chunksize=batch_rows)]
+    return arrow_schema.serialize().to_pybytes(), batches
+
+def get_write_types(write_client):
+    """Request message types of the write client; a fake client brings its own"""
+    if hasattr(write_client, 'types'):
+        return write_client.types
+    from google.cloud.bigquery_storage_v1 import types
+    return types
+
+def make_append_request(types, stream_name, offset, serialized_schema, serialized_batch, row_count):
+    """AppendRowsRequest carrying one Arrow record batch at an explicit offset"""
+    return types.AppendRowsRequest(
+        write_stream=stream_name,
+        offset=offset,
+        arrow_rows=types.AppendRowsRequest.ArrowData(
+            writer_schema=types.ArrowSchema(serialized_schema=serialized_schema),
+            rows=types.ArrowRecordBatch(serialized_record_batch=serialized_batch, row_count=row_count),
+        ),
+    )
+
+def append_batch(write_client, request, retries=None):
+    """Append one batch, retrying transient failures. The explicit offset makes retries exactly-once:
+    a batch that was written before its response got lost comes back as ALREADY_EXISTS."""
+    retries = appendRetries if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            response = next(iter(write_client.append_rows(iter([request]))))
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            print(f"Append at offset {request.offset} failed ({e}), retrying...")
+            time.sleep(2 ** attempt * 0.5)
+            continue
+
+        if response.error.code == 0:
+            return True
+        if response.error.code == ALREADY_EXISTS:
+            print(f"Rows at offset {request.offset} were already written, skipping")
+            return False
+        raise RuntimeError(f"Append at offset {request.offset} failed: {response.error.message}")
+
+def is_retryable(error):
+    """Connection errors and transient API errors are retried"""
+    if isinstance(error, ConnectionError):
+        return True
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (exceptions.ServiceUnavailable, exceptions.DeadlineExceeded,
+                              exceptions.InternalServerError, exceptions.Aborted))
+
+def create_stream(write_client, table_path, stream_type):
+    """Create a committed or pending write stream on a table"""
+    types = get_write_types(write_client)
+    stream_types = {"committed": types.WriteStream.Type.COMMITTED, "pending": types.WriteStream.Type.PENDING}
+    stream = write_client.create_write_stream(
+        parent=table_path,
+        write_stream=types.WriteStream(type_=stream_types[stream_type])
+    )
+    return stream.name
+
+def append_table(write_client, table_path, df, schema, stream_type, table_state, state, batch_rows=None):
+    """Stream the rows of one table. Committed streams make each batch visible on append;
+    pending streams make all rows visible at once when the stream is committed."""
+    batch_rows = batch_rows or appendBatchRows
+    serialized_schema, batches = serialize_batches(df, schema, batch_rows)
+
+    # A pending stream recorded by a run that crashed after committing it is done: its rows are
+    # visible and appending them again would duplicate them
+    if table_state.get("stream") and stream_type == "pending":
+        if write_client.get_write_stream(name=table_state["stream"]).commit_time:
+            table_state["done"] = True
+            save_append_state(state)
+            print(f"Stream {table_state['stream']} was already committed, skipping")
+            return table_state["offset"]
+
+    # A committed stream is continued from its confirmed offset; rows of an uncommitted
+    # pending stream were never visible, so that stream is abandoned and the table restarted
+    if table_state.get("stream") and stream_type == "committed":
+        stream_name = table_state["stream"]
+        print(f"Continuing stream {stream_name} at offset {table_state['offset']}")
+    else:
+        stream_name = create_stream(write_client, table_path, stream_type)
+        table_state.update({"stream": stream_name, "offset": 0})
+        save_append_state(state)
+
+    offset = 0
+    for serialized_batch, row_count in batches:
+        if offset + row_count <= table_state["offset"]:
+            offset += row_count
+            continue
+        request = make_append_request(get_write_types(write_client), stream_name, offset, serialized_schema, serialized_batch, row_count)
+        append_batch(write_client, request)
+        offset += row_count
+        table_state["offset"] = offset
+        save_append_state(state)
+
+    write_client.finalize_write_stream(name=stream_name)
+    if stream_type == "pending":
+        response = write_client.batch_commit_write_streams(parent=table_path, write_streams=[stream_name])
+        if response.stream_errors:
+            raise RuntimeError(f"Commit of {stream_name} failed: {response.stream_errors}")
+    table_state["done"] = True
+    save_append_state(state)
+    print(f"Appended {offset} rows to {table_path}")
+    return offset
+
+def append_transactions(write_client, bq_client, project, csv_path, stream_type="pending", batch_rows=None):
+    """Append the transactions of a CSV and their edges, one write stream per table.
+    Returns the number of rows appended per table."""
+    dataset_id = f"{project}.{datasetName}"
+    tables = prepare_tables(csv_path)
+
+    state = load_append_state()
+    # The same file appended to another project or dataset starts over
+    state_key = f"{project}/{datasetName}/{file_fingerprint(csv_path)}"
+    file_state = state.setdefault(state_key, {"source": csv_path, "stream_type": stream_type, "tables": {}})
+    if file_state["stream_type"] != stream_type:
+        # Offsets of the earlier streams do not carry over to another stream type
+        file_state.update({"stream_type": stream_type, "tables": {}})
+
+    appended = {}
+    start = time.perf_counter()
+    for table_name, df in tables.items():
+        table_state = file_state["tables"].setdefault(table_name, {})
+        if table_state.get("done"):
+            print(f"Rows of {table_name} from {csv_path} were already appended, skipping")
+            continue
+        if df.empty:
+            continue
+        table_path = f"projects/{project}/datasets/{datasetName}/tables/{table_name}"
+        schema = get_write_schema(bq_client, dataset_id, df, table_name)
+        appended[table_name] = append_table(write_client, table_path, df, schema, stream_type,
+                                            table_state, state, batch_rows)
+    print(f"Appended {sum(appended.values())} rows in {time.perf_counter() - start:.2f}s")
+    return appended
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Append new transactions to BigQuery through the Storage Write API")
+    parser.add_argument('csv', help="CSV of new transactions in the transactions_cleaned.csv format")
+    parser.add_argument('--stream-type', choices=['pending', 'committed'], default='pending',
+                        help="pending: rows of a table become visible together on commit; "
+                             "committed: each batch is visible as soon as it is appended")
+    parser.add_argument('--batch-rows', type=int, help="Rows per appended Arrow record batch")
+    parser.add_argument('--fake', action='store_true',
+                        help="Append to an in-memory fake write client instead of BigQuery")
+    return parser.parse_args()
+
+def main():
+    global append_state_path
+    args = parse_args()
+    if args.fake:
+        append_state_path = None
+        from fake_bigquery_write import FakeBigQueryWriteClient
+        write_client = FakeBigQueryWriteClient()
+        bq_client = None
+        project = "fake-project"
+    else:
+        from google.cloud import bigquery, bigquery_storage_v1
+        from google.oauth2 import service_account
+        credentials = service_account.Credentials.from_service_account_file(
+            os.path.join(os.path.dirname(__file__), google_auth_keyfile)
+        )
+        write_client = bigquery_storage_v1.BigQueryWriteClient(credentials=credentials)
+        bq_client = bigquery.Client(credentials=credentials, project=credentials.project_id)
+        project = credentials.project_id
+
+    print(f"Appending {args.csv} to dataset '{datasetName}' ({'typed' if typedSchema else 'string'} schema, "
+          f"{args.stream_type} streams)")
+    append_transactions(write_client, bq_client, project, args.csv, args.stream_type, args.batch_rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+    CREATE OR REPLACE VIEW paysim_graph.Client_Perform_Transaction AS
+        SELECT t.idorig AS client_id, t.id AS transaction_id, t.timestamp AS timestamp
+        FROM paysim_graph.Transaction AS t;
+
+    CREATE OR REPLACE VIEW paysim_graph.Transaction_To_Client AS
+        SELECT t.id AS transaction_id, t.iddest AS client_id, t.timestamp AS timestamp
+        FROM paysim_graph.Transaction AS t
+        WHERE t.typedest IN ('CLIENT', 'MULE');
+
+    CREATE OR REPLACE VIEW paysim_graph.Transaction_To_Merchant AS
+        SELECT t.id AS transaction_id, t.iddest AS merchant_id, t.timestamp AS timestamp
+        FROM paysim_graph.Transaction AS t
+        WHERE t.typedest = 'MERCHANT';
+
+    CREATE OR REPLACE VIEW paysim_graph.Transaction_To_Bank AS
+        SELECT t.id AS transaction_id, t.iddest AS bank_id, t.timestamp AS timestamp
+        FROM paysim_graph.Transaction AS t
+        WHERE t.typedest = 'BANK';
@@ -0,0 +1,29 @@
+    CREATE OR REPLACE VIEW paysim_graph.Email AS
+        SELECT DISTINCT c.email AS id, c.email AS name
+        FROM paysim_graph.Client AS c
+        WHERE c.email IS NOT NULL;
+
+    CREATE OR REPLACE VIEW paysim_graph.PhoneNumber AS
+        SELECT DISTINCT c.phonenumber AS id, c.phonenumber AS name
+        FROM paysim_graph.Client AS c
+        WHERE c.phonenumber IS NOT NULL;
+
+    CREATE OR REPLACE VIEW paysim_graph.SSN AS
+        SELECT DISTINCT c.ssn AS id, c.ssn AS name
+        FROM paysim_graph.Client AS c
+        WHERE c.ssn IS NOT NULL;
+
+    CREATE OR REPLACE VIEW paysim_graph.Has_Email AS
+        SELECT c.id AS client_id, c.email AS email_id
+        FROM paysim_graph.Client AS c
+        WHERE c.email IS NOT NULL;
+
+    CREATE OR REPLACE VIEW paysim_graph.Has_PhoneNumber AS
+        SELECT c.id AS client_id, c.phonenumber AS phonenumber_id
+        FROM paysim_graph.Client AS c
+        WHERE c.phonenumber IS NOT NULL;
+
+    CREATE OR REPLACE VIEW paysim_graph.Has_SSN AS
+        SELECT c.id AS client_id, c.ssn AS ssn_id
+        FROM paysim_graph.Client AS c
+        WHERE c.ssn IS NOT NULL;
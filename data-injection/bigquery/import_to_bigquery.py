@@ -1,7 +1,15 @@
 # Import required libraries
 import sys
+import decimal
 import pandas as pd 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import bigquery
 from google.oauth2 import service_account
 
@@ -14,12 +22,88 @@ load_dotenv()
 datasetName = os.getenv('DATASET_NAME') or "paysim_graph"
 graphName = os.getenv('GRAPH_NAME') or "graph_view"
 google_auth_keyfile = os.getenv('GOOGLE_AUTH_KEYFILE') or 'google_auth_keyfile.json'
+# Typed schema: TIMESTAMP timestamps, INT64 step counters and NUMERIC amounts instead of STRING/FLOAT
+typedSchema = (os.getenv('TYPED_SCHEMA') or 'false').strip().lower() in ['1', 'true', 'yes']
+# Derived edges: the transaction edges are views over the Transaction table instead of loaded tables
+derivedEdges = (os.getenv('DERIVED_EDGES') or 'false').strip().lower() in ['1', 'true', 'yes']
+derived_edge_tables = ['Client_Perform_Transaction', 'Transaction_To_Client', 'Transaction_To_Merchant', 'Transaction_To_Bank']
+# Derived PII: Email, PhoneNumber, SSN and their HAS_* edges are views over the Client table
+derivedPii = (os.getenv('DERIVED_PII') or 'false').strip().lower() in ['1', 'true', 'yes']
+derived_pii_tables = ['Email', 'PhoneNumber', 'SSN', 'Has_Email', 'Has_PhoneNumber', 'Has_SSN']
 
-data_dir = os.path.join(os.path.dirname(__file__), './../../', 'data')
+# Load jobs running at the same time and seconds between job status polls
+maxConcurrentJobs = int(os.getenv('BQ_MAX_CONCURRENT_JOBS') or 4)
+jobPollInterval = float(os.getenv('BQ_JOB_POLL_INTERVAL') or 2)
+
+# Load mode: "dataframe" sends pandas frames, "parquet" writes typed Parquet files once and loads those
+loadFormat = (os.getenv('BQ_LOAD_FORMAT') or 'dataframe').strip().lower()
+# Rows per Parquet file, larger tables are split and the files loaded in parallel (0 keeps one file)
+parquetChunkRows = int(os.getenv('BQ_PARQUET_CHUNK_ROWS') or 0)
+
+# Step counters stored as INT64 in typed schema mode
+step_columns = ['step', 'globalstep']
+
+# DATA_DIR points the import at another copy of the data, e.g. a subgraph written by src/extract_subgraph.py
+data_dir = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(__file__), './../../', 'data')
 raw_data_dir = os.path.join(data_dir, 'raw')
 processed_data_dir = os.path.join(data_dir, 'processed')
+parquet_data_dir = os.getenv('BQ_PARQUET_DIR') or os.path.join(processed_data_dir, 'parquet')
+
+# Parquet column type for each BigQuery column type
+arrow_types = {
+    "STRING": pa.string(),
+    "INT64": pa.int64(),
+    "FLOAT": pa.float64(),
+    "BOOL": pa.bool_(),
+    "TIMESTAMP": pa.timestamp('us', tz='UTC'),
+    "NUMERIC": pa.decimal128(38, 9),
+}
+# Legacy type names returned in table schemas by the API
+arrow_types.update({"INTEGER": arrow_types["INT64"], "FLOAT64": arrow_types["FLOAT"], "BOOLEAN": arrow_types["BOOL"]})
+
+def drop_missing_elements(sql, tables):
+    """Remove the node and edge tables that were not loaded from the graph, and the edge tables
+    that reference a removed node table (e.g. Ring and In_Ring before src/gen_rings.py has run)"""
+    output, elements = [], None
+    for line in sql.split('\n'):
+        if elements is None:
+            output.append(line)
+            if 'TABLES' in line:
+                elements = []
+        elif line.strip().startswith(')'):
+            kept = [element for element in elements
+                    if element[0].strip().split('.')[-1] in tables
+                    and all(table in tables for table in re.findall(r'REFERENCES (\w+)', '\n'.join(element)))]
+            for i, element in enumerate(kept):
+                element[-1] = element[-1].rstrip(',') + (',' if i < len(kept) - 1 else '')
+                output.extend(element)
+            output.append(line)
+            elements = None
+        elif re.fullmatch(r'[\w.]+', line.strip()):
+            # An element starts with its table name, its clauses follow on their own lines
+            elements.append([line])
+        else:
+            elements[-1].append(line)
+    return '\n'.join(output)
+
+def get_graph_sql(sql, tables):
+    """Fit graph_view.sql to the loaded tables, and drop the properties the loaded clients.csv/merchants.csv
+    lack from the Client and Merchant property lists: the feature columns of src/gen_features.py are
+    only there after it has run"""
+    sql = drop_missing_elements(sql, tables)
+    for label, csv_file in [('Client', 'clients.csv'), ('Merchant', 'merchants.csv')]:
+        if label not in tables:
+            continue
+        columns = {col.lower() for col in pd.read_csv(get_csv_path(csv_file), nrows=0).columns}
+
+        def keep_loaded(match):
+            properties = [prop.strip() for prop in match.group(2).split(',')]
+            return match.group(1) + ', '.join(prop for prop in properties if prop in columns) + ')'
 
-def create_graph(client):
+        sql = re.sub(rf'(LABEL {label}\s+PROPERTIES \()([^)]*)\)', keep_loaded, sql)
+    return sql
+
+def create_graph(client, tables):
     """Execute the property creation SQL using BigQuery client"""
     try:
 
@@ -36,6 +120,7 @@ def create_graph(client):
 
         ## replace GRAPH graph_view name to the variable
         sql = sql.replace('.graph_view', f'.{graphName}')
+        sql = get_graph_sql(sql, tables)
 
         ## remove last ;
         if sql.strip().endswith(';'):
@@ -49,13 +134,52 @@ def create_graph(client):
         print(f"Error creating property graph: {e}", file=sys.stderr)
         raise e
 
+def get_rollup_files():
+    """Rollup tables written by src/gen_rollups.py, one per entity and granularity, with their load options"""
+    if not os.path.isdir(processed_data_dir):
+        return []
+    files = []
+    for csv_file in sorted(os.listdir(processed_data_dir)):
+        if not (csv_file.startswith('Rollup_') and csv_file.endswith('.csv')):
+            continue
+        # Rollup_<Entity>_<Granularity>.csv is keyed by <entity>_id
+        key_column = csv_file.split('_')[1].lower() + '_id'
+        files.append((csv_file, os.path.splitext(csv_file)[0], False,
+                      {"partition_by": "timestamp", "cluster_by": [key_column, "timestamp"]}))
+    return files
+
+def get_derived_views():
+    """SQL file and replaced tables of each enabled derived mode"""
+    derived_views = []
+    if derivedEdges:
+        derived_views.append(('derived_edges.sql', derived_edge_tables))
+    if derivedPii:
+        derived_views.append(('derived_pii.sql', derived_pii_tables))
+    return derived_views
+
+def create_derived_views(client):
+    """Create the views of the derived modes (derived_edges.sql, derived_pii.sql) in place of their tables"""
+    for sql_file, table_names in get_derived_views():
+        sql_path = os.path.join(os.path.dirname(__file__), sql_file)
+        with open(sql_path, 'r', encoding='utf-8', newline='\n') as file:
+            sql = file.read()
+
+        ## replace DATASET paysim_graph name to the variable
+        sql = sql.replace('paysim_graph.', f'{datasetName}.')
+        client.query(sql).result()
+        print(f"Created derived views: {', '.join(table_names)}")
+
 def delete_all_tables(client, dataset_id):
-    """Delete all tables in the specified dataset"""
+    """Delete all tables in the specified dataset, several at a time"""
     try:
-        tables = client.list_tables(dataset_id)
-        for table in tables:
+        tables = list(client.list_tables(dataset_id))
+
+        def delete(table):
             client.delete_table(table.reference)
             print(f"Deleted table {table.table_id}")
+
+        with ThreadPoolExecutor(max_workers=maxConcurrentJobs) as executor:
+            list(executor.map(delete, tables))
     except Exception as e:
         print(f"Error deleting tables: {e}")
 
@@ -73,27 +197,36 @@ def create_dataset(client, dataset_name):
     
     return dataset_id
 
+def get_csv_path(csv_file):
+    """Determine which directory to read from"""
+    # Original files (clients.csv, merchants.csv) are in raw/, unless src/gen_features.py
+    # wrote them with their feature columns to processed/
+    # All processed files are in processed/
+    if csv_file in ['clients.csv', 'merchants.csv'] and not os.path.exists(os.path.join(processed_data_dir, csv_file)):
+        return os.path.join(raw_data_dir, csv_file)
+    return os.path.join(processed_data_dir, csv_file)
+
 def prepare_data(csv_file, is_transaction=False):
     """Prepare data by normalizing column names and creating IDs"""
     try:
-        # Determine which directory to read from
-        # Original files (clients.csv, merchants.csv) are in raw/
-        # All processed files are in processed/
-        if csv_file in ['clients.csv', 'merchants.csv']:
-            file_path = os.path.join(raw_data_dir, csv_file)
-        else:
-            file_path = os.path.join(processed_data_dir, csv_file)
-        
         # Read CSV file
-        df = pd.read_csv(file_path)
+        df = pd.read_csv(get_csv_path(csv_file))
         print(f"Read {len(df)} rows from {csv_file}")
+        return prepare_frame(df, csv_file, is_transaction)
         
+    except Exception as e:
+        print(f"Error preparing data from {csv_file}: {e}")
+        return None
+
+def prepare_frame(df, csv_file, is_transaction=False):
+    """Normalize column names, create IDs and convert types of an already read frame"""
+    try:
         # Convert column names to lowercase
         df.columns = [col.lower() for col in df.columns]
         
         # Check if this is a relationship table
         is_relationship = any(csv_file.startswith(prefix) for prefix in 
-                            ['Has_', 'Client_Perform_', 'Transaction_To_'])
+                            ['Has_', 'Client_Perform_', 'Transaction_To_', 'In_', 'Rollup_'])
         
         # Handle IDs based on table type
         if is_relationship:
@@ -104,11 +237,26 @@ def prepare_data(csv_file, is_transaction=False):
         elif is_transaction:
             # For transactions, convert globalstep to string id
             df['id'] = df['globalstep'].astype('string')
+            if derivedEdges:
+                # The edge views join these to the Client, Merchant and Bank ids
+                df['idorig'] = df['idorig'].astype('string')
+                df['iddest'] = df['iddest'].astype('string')
         else:
             # For other entity tables, ensure id exists and convert to string
             if 'id' not in df.columns:
                 raise ValueError(f"No 'id' column found in {csv_file}")
             df['id'] = df['id'].astype('string')
+
+        # Convert to native types for typed schema mode
+        if typedSchema:
+            if 'timestamp' in df.columns:
+                df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+            for col in step_columns:
+                if col in df.columns:
+                    df[col] = df[col].astype('int64')
+            if 'amount' in df.columns:
+                # NUMERIC values are sent as Decimal to keep exact cents
+                df['amount'] = df['amount'].round(2).astype('string').map(decimal.Decimal)
         
         print(f"Prepared data columns: {', '.join(df.columns)}")
         if not is_relationship:
@@ -121,76 +269,314 @@ def prepare_data(csv_file, is_transaction=False):
         print(f"Error preparing data from {csv_file}: {e}")
         return None
 
-def load_csv_to_bigquery(client, dataset_id, df, table_name):
-    """Load a DataFrame into a BigQuery table"""
-    try:
-        if df is None:
-            raise ValueError("DataFrame is None")
-            
-        # Define the destination table
-        table_id = f"{dataset_id}.{table_name}"
-        
-        # Check if this is a relationship table
-        is_relationship = any(table_name.startswith(prefix) for prefix in 
-                            ['Has_', 'Client_Perform_', 'Transaction_To_'])
-        
-        # Configure the load job
-        if is_relationship:
-            # For relationship tables, set all ID columns to STRING
-            schema = []
-            for col in df.columns:
-                if col.endswith('_id'):
-                    # ID columns should be STRING
-                    schema.append(bigquery.SchemaField(col, "STRING", mode="REQUIRED"))
-                else:
-                    # Let BigQuery autodetect other columns
-                    schema.append(bigquery.SchemaField(col, "STRING" if col == "timestamp" else "FLOAT"))
-            
-            job_config = bigquery.LoadJobConfig(
-                schema=schema,
-                write_disposition="WRITE_TRUNCATE"
-            )
-        else:
-            # For entity tables, set id as primary key
-            schema = [
-                bigquery.SchemaField("id", "STRING", mode="REQUIRED"),
-            ]
-            job_config = bigquery.LoadJobConfig(
-                schema=schema,
-                autodetect=True,
-                write_disposition="WRITE_TRUNCATE",
-                clustering_fields=['id']
-            )
-        
-        # Load DataFrame to BigQuery
-        job = client.load_table_from_dataframe(
-            df, 
-            table_id,
-            job_config=job_config
+def is_relationship_table(table_name):
+    """Relationship tables are named after the edge they hold. Rollup tables (src/gen_rollups.py)
+    are keyed the same way, by their *_id column and timestamp bucket."""
+    return any(table_name.startswith(prefix) for prefix in 
+               ['Has_', 'Client_Perform_', 'Transaction_To_', 'In_', 'Rollup_'])
+
+def get_table_layout(table_name, options=None):
+    """Day-partitioning column and clustering columns from a table's load options.
+    Entity tables are clustered on id unless the options say otherwise."""
+    options = options or {}
+    partition_field = options.get('partition_by')
+    if partition_field and not typedSchema:
+        print(f"Not partitioning {table_name} on {partition_field}: day partitioning needs TYPED_SCHEMA=true")
+        partition_field = None
+    clustering_fields = options.get('cluster_by') or (None if is_relationship_table(table_name) else ['id'])
+    return partition_field, clustering_fields
+
+def apply_table_layout(target, table_name, options=None):
+    """Set partitioning and clustering on a LoadJobConfig or Table"""
+    partition_field, clustering_fields = get_table_layout(table_name, options)
+    if partition_field:
+        target.time_partitioning = bigquery.TimePartitioning(
+            type_=bigquery.TimePartitioningType.DAY,
+            field=partition_field
         )
+    if clustering_fields:
+        target.clustering_fields = clustering_fields
+    return target
+
+def get_load_job_config(df, table_name, options=None):
+    """Build the load job configuration (schema, partitioning and clustering) for a prepared DataFrame"""
+    # Configure the load job
+    if is_relationship_table(table_name):
+        # For relationship tables, set all ID columns to STRING
+        schema = []
+        for col in df.columns:
+            if col.endswith('_id'):
+                # ID columns should be STRING
+                schema.append(bigquery.SchemaField(col, "STRING", mode="REQUIRED"))
+            elif col.endswith('_count'):
+                schema.append(bigquery.SchemaField(col, "INT64"))
+            else:
+                # Let BigQuery autodetect other columns
+                timestamp_type = "TIMESTAMP" if typedSchema else "STRING"
+                schema.append(bigquery.SchemaField(col, timestamp_type if col == "timestamp" else "FLOAT"))
         
-        # Wait for job to complete
-        job.result()
-        
-        # Add primary key constraint only for entity tables
-        if not is_relationship:
-            query = f"""
-            ALTER TABLE `{table_id}`
-            ADD PRIMARY KEY(id) NOT ENFORCED
-            """
-            client.query(query).result()
-            print(f"Added primary key constraint on id for {table_name}")
+        job_config = bigquery.LoadJobConfig(
+            schema=schema,
+            write_disposition="WRITE_TRUNCATE"
+        )
+        return apply_table_layout(job_config, table_name, options)
+
+    # For entity tables, set id as primary key
+    schema = [
+        bigquery.SchemaField("id", "STRING", mode="REQUIRED"),
+    ]
+    if typedSchema:
+        # Pin native types instead of relying on autodetect
+        for col in df.columns:
+            if col == 'timestamp':
+                schema.append(bigquery.SchemaField(col, "TIMESTAMP"))
+            elif col in step_columns:
+                schema.append(bigquery.SchemaField(col, "INT64"))
+            elif col == 'amount':
+                schema.append(bigquery.SchemaField(col, "NUMERIC"))
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        autodetect=True,
+        write_disposition="WRITE_TRUNCATE"
+    )
+    return apply_table_layout(job_config, table_name, options)
+
+def get_table_schema(df, table_name):
+    """Explicit BigQuery schema for every column of a prepared DataFrame, nothing is left to autodetect"""
+    is_relationship = is_relationship_table(table_name)
+    schema = []
+    for col in df.columns:
+        dtype = df[col].dtype
+        if col == 'id' or col.endswith('_id'):
+            schema.append(bigquery.SchemaField(col, "STRING", mode="REQUIRED"))
+            continue
+        if col == 'timestamp':
+            field_type = "TIMESTAMP" if typedSchema else "STRING"
+        elif is_relationship and col.endswith('_count'):
+            field_type = "INT64"
+        elif is_relationship:
+            field_type = "FLOAT"
+        elif typedSchema and col in step_columns:
+            field_type = "INT64"
+        elif typedSchema and col == 'amount':
+            field_type = "NUMERIC"
+        elif pd.api.types.is_bool_dtype(dtype):
+            field_type = "BOOL"
+        elif pd.api.types.is_integer_dtype(dtype):
+            field_type = "INT64"
+        elif pd.api.types.is_float_dtype(dtype):
+            field_type = "FLOAT"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            field_type = "TIMESTAMP"
+        else:
+            field_type = "STRING"
+        schema.append(bigquery.SchemaField(col, field_type))
+    return schema
+
+def get_arrow_schema(schema):
+    """Arrow schema matching a list of BigQuery SchemaFields"""
+    return pa.schema([
+        pa.field(field.name, arrow_types[field.field_type], nullable=field.mode != "REQUIRED")
+        for field in schema
+    ])
+
+def get_parquet_sidecar_path(table_name):
+    return os.path.join(parquet_data_dir, f"{table_name}.json")
+
+def get_prepare_settings():
+    """Settings that change how prepare_frame converts the columns, so Parquet written under other
+    settings is never reused (DERIVED_EDGES turns idorig/iddest into STRING)"""
+    return {
+        "typed_schema": typedSchema,
+        "derived_edges": derivedEdges,
+        "derived_pii": derivedPii,
+    }
+
+def load_parquet_sidecar(csv_file, table_name):
+    """Return the sidecar of the table's Parquet files if they are still current for the CSV, else None.
+    The sidecar records the source CSV size and mtime, the prepare settings and the files written."""
+    sidecar_path = get_parquet_sidecar_path(table_name)
+    if not os.path.exists(sidecar_path):
+        return None
+    with open(sidecar_path, 'r', encoding='utf-8') as f:
+        sidecar = json.load(f)
+    source = os.stat(get_csv_path(csv_file))
+    if (sidecar.get('source_size') != source.st_size
+            or sidecar.get('source_mtime') != source.st_mtime
+            or any(sidecar.get(key) != value for key, value in get_prepare_settings().items())
+            or not all(os.path.exists(os.path.join(parquet_data_dir, name)) for name in sidecar['files'])):
+        return None
+    return sidecar
+
+def write_parquet(df, csv_file, table_name):
+    """Write a prepared DataFrame to typed Parquet files with an explicit schema and record them in a sidecar"""
+    os.makedirs(parquet_data_dir, exist_ok=True)
+    schema = get_table_schema(df, table_name)
+    arrow_schema = get_arrow_schema(schema)
+    chunk_rows = parquetChunkRows or max(len(df), 1)
+    files = []
+    for i, start in enumerate(range(0, max(len(df), 1), chunk_rows)):
+        file_name = f"{table_name}-{i:05d}.parquet"
+        chunk = pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=arrow_schema, preserve_index=False)
+        pq.write_table(chunk, os.path.join(parquet_data_dir, file_name))
+        files.append(file_name)
+
+    source = os.stat(get_csv_path(csv_file))
+    sidecar = {
+        "source": csv_file,
+        "source_size": source.st_size,
+        "source_mtime": source.st_mtime,
+        **get_prepare_settings(),
+        "rows": len(df),
+        "schema": [[field.name, field.field_type, field.mode] for field in schema],
+        "files": files,
+    }
+    # Write the sidecar last, so an interrupted write is never reused
+    sidecar_path = get_parquet_sidecar_path(table_name)
+    with open(sidecar_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, indent=2)
+    os.replace(sidecar_path + '.tmp', sidecar_path)
+    print(f"Wrote {len(df)} rows of {table_name} to {len(files)} Parquet file(s) in {parquet_data_dir}")
+    return sidecar
+
+def submit_parquet_load_jobs(client, dataset_id, sidecar, table_name, options=None):
+    """Start loading a table's Parquet files, one load job per file uploaded in parallel.
+    A single file replaces the table, several files are appended to a freshly created table."""
+    table_id = f"{dataset_id}.{table_name}"
+    schema = [bigquery.SchemaField(name, field_type, mode=mode) for name, field_type, mode in sidecar['schema']]
+    files = sidecar['files']
+
+    if len(files) > 1:
+        table = apply_table_layout(bigquery.Table(table_id, schema=schema), table_name, options)
+        client.delete_table(table_id, not_found_ok=True)
+        client.create_table(table)
+
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        schema=schema,
+        write_disposition="WRITE_TRUNCATE" if len(files) == 1 else "WRITE_APPEND",
+    )
+    apply_table_layout(job_config, table_name, options)
+
+    def submit(file_name):
+        with open(os.path.join(parquet_data_dir, file_name), 'rb') as f:
+            return client.load_table_from_file(f, table_id, job_config=job_config)
+
+    with ThreadPoolExecutor(max_workers=min(len(files), maxConcurrentJobs)) as executor:
+        jobs = list(executor.map(submit, files))
+    print(f"Submitted {len(jobs)} Parquet load job(s) for {table_name}")
+    return jobs
+
+def submit_load_job(client, dataset_id, df, table_name, options=None):
+    """Start loading a DataFrame into a BigQuery table, returns the load job without waiting"""
+    if df is None:
+        raise ValueError("DataFrame is None")
         
-        # Get and print table info
-        table = client.get_table(table_id)
-        print(f"Loaded {table.num_rows} rows into {table_id}")
-        print(f"Table schema for {table_name}:")
-        for field in table.schema:
-            print(f"  {field.name}: {field.field_type}")
-            
-    except Exception as e:
-        print(f"Error loading data to {table_name}: {e}")
-        raise
+    # Define the destination table
+    table_id = f"{dataset_id}.{table_name}"
+    job = client.load_table_from_dataframe(
+        df, 
+        table_id,
+        job_config=get_load_job_config(df, table_name, options)
+    )
+    print(f"Submitted load job {job.job_id} for {table_name}")
+    return job
+
+def load_tables(client, dataset_id, files_to_load, max_jobs=None):
+    """Prepare and load all tables with at most max_jobs load jobs in flight.
+    Submissions run in worker threads, the running jobs are polled together.
+    Returns the names of the loaded tables."""
+    max_jobs = max_jobs or maxConcurrentJobs
+    # A slot is held from preparing a table until its load job finishes
+    slots = threading.Semaphore(max_jobs)
+
+    def prepare_and_submit(csv_file, table_name, is_transaction, options=None):
+        slots.acquire()
+        try:
+            print(f"\nProcessing {csv_file} -> {table_name}")
+            if loadFormat == 'parquet':
+                sidecar = load_parquet_sidecar(csv_file, table_name)
+                if sidecar is not None:
+                    print(f"Reusing Parquet files of {table_name} from {parquet_data_dir}")
+                else:
+                    df = prepare_data(csv_file, is_transaction)
+                    if df is None:
+                        slots.release()
+                        return None
+                    sidecar = write_parquet(df, csv_file, table_name)
+                return submit_parquet_load_jobs(client, dataset_id, sidecar, table_name, options)
+            df = prepare_data(csv_file, is_transaction)
+            if df is None:
+                slots.release()
+                return None
+            return [submit_load_job(client, dataset_id, df, table_name, options)]
+        except Exception:
+            slots.release()
+            raise
+
+    loaded_tables = []
+    failed_tables = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        submissions = {executor.submit(prepare_and_submit, *entry): entry[1] for entry in files_to_load}
+        running = {}
+        while submissions or running:
+            for future in [future for future in submissions if future.done()]:
+                table_name = submissions.pop(future)
+                try:
+                    jobs = future.result()
+                    if jobs is not None:
+                        running[table_name] = jobs
+                except Exception as e:
+                    print(f"Error loading data to {table_name}: {e}")
+                    failed_tables.append(table_name)
+
+            for table_name, jobs in list(running.items()):
+                # done() refreshes the job state from the API
+                if not all(job.done() for job in jobs):
+                    continue
+                del running[table_name]
+                slots.release()
+                try:
+                    for job in jobs:
+                        job.result()
+                    loaded_tables.append(table_name)
+                    print(f"Loaded {sum(job.output_rows or 0 for job in jobs)} rows into {dataset_id}.{table_name} "
+                          f"({time.perf_counter() - start:.1f}s since start)")
+                except Exception as e:
+                    print(f"Error loading data to {table_name}: {e}")
+                    failed_tables.append(table_name)
+
+            if submissions or running:
+                time.sleep(jobPollInterval)
+
+    if failed_tables:
+        raise RuntimeError(f"Failed to load tables: {', '.join(failed_tables)}")
+    print(f"Loaded {len(loaded_tables)} tables in {time.perf_counter() - start:.1f}s")
+    return loaded_tables
+
+def add_table_constraints(client, dataset_id, table_names, table_options=None):
+    """Add the id primary key to all entity tables and require partition filters where the
+    load options ask for it, in one multi-statement script"""
+    table_options = table_options or {}
+    entity_tables = [table_name for table_name in table_names if not is_relationship_table(table_name)]
+    # Partition filters only apply to partitioned tables, which need the typed TIMESTAMP column
+    filtered_tables = [table_name for table_name in table_names
+                       if typedSchema and table_options.get(table_name, {}).get('partition_by')
+                       and table_options[table_name].get('require_partition_filter')]
+    statements = [
+        f"ALTER TABLE `{dataset_id}.{table_name}` ADD PRIMARY KEY(id) NOT ENFORCED;"
+        for table_name in entity_tables
+    ] + [
+        f"ALTER TABLE `{dataset_id}.{table_name}` SET OPTIONS (require_partition_filter = TRUE);"
+        for table_name in filtered_tables
+    ]
+    if not statements:
+        return
+    client.query("\n".join(statements)).result()
+    print(f"Added primary key constraint on id for {', '.join(entity_tables)}")
+    if filtered_tables:
+        print(f"Required partition filter on {', '.join(filtered_tables)}")
 
 def main():
     # Initialize BigQuery client
@@ -207,40 +593,54 @@ def main():
     print(f"\n2. Deleting existing tables in dataset '{datasetName}'...")
     delete_all_tables(client, dataset_id)
 
-    # Define the files to load
+    # Define the files to load, with optional table layout options:
+    # partition_by (day partitioning, needs TYPED_SCHEMA), cluster_by and require_partition_filter
     files_to_load = [
         # Entity tables
         ("clients.csv", "Client", False),
         ("merchants.csv", "Merchant", False),
         ("banks.csv", "Bank", False),
-        ("transactions_cleaned.csv", "Transaction", True),
+        ("transactions_cleaned.csv", "Transaction", True,
+         {"partition_by": "timestamp", "cluster_by": ["id"]}),
         ("emails.csv", "Email", False),
         ("phonenumbers.csv", "PhoneNumber", False),
         ("ssns.csv", "SSN", False),
+        ("rings.csv", "Ring", False),
+        ("flow_patterns.csv", "FlowPattern", False),
         
-        # Relationship tables
-        ("Client_Perform_Transaction.csv", "Client_Perform_Transaction", False),
-        ("Transaction_To_Client.csv", "Transaction_To_Client", False),
-        ("Transaction_To_Merchant.csv", "Transaction_To_Merchant", False),
-        ("Transaction_To_Bank.csv", "Transaction_To_Bank", False),
-        ("Has_Email.csv", "Has_Email", False),
-        ("Has_Phonenumber.csv", "Has_PhoneNumber", False),
-        ("Has_SSN.csv", "Has_SSN", False)
+        # Relationship tables, clustered on (source key, destination key)
+        ("Client_Perform_Transaction.csv", "Client_Perform_Transaction", False,
+         {"partition_by": "timestamp", "cluster_by": ["client_id", "transaction_id"]}),
+        ("Transaction_To_Client.csv", "Transaction_To_Client", False,
+         {"partition_by": "timestamp", "cluster_by": ["transaction_id", "client_id"]}),
+        ("Transaction_To_Merchant.csv", "Transaction_To_Merchant", False,
+         {"partition_by": "timestamp", "cluster_by": ["transaction_id", "merchant_id"]}),
+        ("Transaction_To_Bank.csv", "Transaction_To_Bank", False,
+         {"partition_by": "timestamp", "cluster_by": ["transaction_id", "bank_id"]}),
+        ("Has_Email.csv", "Has_Email", False, {"cluster_by": ["client_id", "email_id"]}),
+        ("Has_Phonenumber.csv", "Has_PhoneNumber", False, {"cluster_by": ["client_id", "phonenumber_id"]}),
+        ("Has_SSN.csv", "Has_SSN", False, {"cluster_by": ["client_id", "ssn_id"]}),
+        ("In_Ring.csv", "In_Ring", False, {"cluster_by": ["client_id", "ring_id"]}),
+        ("In_Flow.csv", "In_Flow", False, {"cluster_by": ["client_id", "flowpattern_id"]})
     ]
+    # Time-bucketed aggregates, loaded when src/gen_rollups.py has written them
+    files_to_load += get_rollup_files()
+    # Views over Transaction and Client replace the tables of the derived modes
+    derived_tables = [table for _, table_names in get_derived_views() for table in table_names]
+    files_to_load = [entry for entry in files_to_load if entry[1] not in derived_tables]
+    table_options = {entry[1]: entry[3] for entry in files_to_load if len(entry) > 3}
 
     print(f"\n3. Processing and loading data files into dataset '{datasetName}'...")
 
-    # Process and load all files
-    for csv_file, table_name, is_transaction in files_to_load:
-        print(f"\nProcessing {csv_file} -> {table_name}")
-        # Prepare the data
-        df = prepare_data(csv_file, is_transaction)
-        if df is not None:
-            # Load to BigQuery
-            load_csv_to_bigquery(client, dataset_id, df, table_name)
+    # Process and load all files, several load jobs at a time
+    loaded_tables = load_tables(client, dataset_id, files_to_load)
+    add_table_constraints(client, dataset_id, loaded_tables, table_options)
+
+    create_derived_views(client)
 
     print(f"\n4. Creating property graph view '{graphName}' in dataset '{datasetName}'...")
-    create_graph(client)
+    # The graph covers the loaded tables and the derived views
+    create_graph(client, loaded_tables + derived_tables)
 
     print("\nData import to BigQuery completed.")
 
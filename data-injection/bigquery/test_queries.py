@@ -7,6 +7,9 @@ from google.oauth2 import service_account
 
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+from fraud_queries import GraphDialect, run_bigquery_query, run_workloads
+
 #automatically load .env file
 load_dotenv()
 
@@ -14,6 +17,13 @@ load_dotenv()
 datasetName = os.getenv('DATASET_NAME') or "paysim_graph"
 graphName = os.getenv('GRAPH_NAME') or "graph_view"
 google_auth_keyfile = os.getenv('GOOGLE_AUTH_KEYFILE') or 'google_auth_keyfile.json'
+typedSchema = (os.getenv('TYPED_SCHEMA') or 'false').strip().lower() in ['1', 'true', 'yes']
+
+# Time-range literals must match the timestamp column type
+if typedSchema:
+    windowStart, windowEnd = "TIMESTAMP '2024-01-01T00:00:00Z'", "TIMESTAMP '2024-01-02T00:00:00Z'"
+else:
+    windowStart, windowEnd = "'2024-01-01T00:00:00'", "'2024-01-02T00:00:00'"
 
 data_dir = os.path.join(os.path.dirname(__file__), './../../', 'data')
 
@@ -41,6 +51,26 @@ def run_test_query(client):
         print(f"Error running test query: {e}", file=sys.stderr)
         raise e
 
+def run_time_range_query(client):
+    """Count PERFORMS edges in a one-day window to check timestamp filtering"""
+    try:
+        query = f"""
+    GRAPH {datasetName}.{graphName}
+    MATCH
+    (c:Client)-[p:PERFORMS]->(t:Transaction)
+    WHERE p.timestamp >= {windowStart} AND p.timestamp < {windowEnd}
+    RETURN COUNT(t) as first_day_transactions
+        """
+
+        job = client.query(query)
+        job.result()  # Wait for query to complete
+        for row in job:
+            print(f"first_day_transactions: {row['first_day_transactions']}")
+        print(f"Bytes processed: {job.total_bytes_processed}")
+    except Exception as e:
+        print(f"Error running time range query: {e}", file=sys.stderr)
+        raise e
+
 
 
 def main():
@@ -51,6 +81,12 @@ def main():
     client = bigquery.Client(credentials=credentials, project=credentials.project_id)
 
     run_test_query(client)
+    run_time_range_query(client)
+
+    # Fraud workloads of the query benchmark (data-injection/benchmark/benchmark_queries.py), run once
+    print("\nFraud workload queries:")
+    run_workloads(lambda query: run_bigquery_query(client, query),
+                  GraphDialect("typed", typedSchema), f"{datasetName}.{graphName}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,118 @@
+# In-memory stand-in for the BigQuery Storage Write API client, for testing append sinks without a project
+import itertools
+import threading
+from types import SimpleNamespace
+
+import pyarrow as pa
+
+# google.rpc status codes used by append responses
+OK = 0
+ALREADY_EXISTS = 6
+OUT_OF_RANGE = 11
+
+class _Message(SimpleNamespace):
+    """Request message built from keyword arguments, like the proto-plus types"""
+
+class _WriteStream(_Message):
+    Type = SimpleNamespace(COMMITTED=SimpleNamespace(name="COMMITTED"), PENDING=SimpleNamespace(name="PENDING"))
+
+class _AppendRowsRequest(_Message):
+    ArrowData = _Message
+
+# Stand-ins for the google.cloud.bigquery_storage_v1.types used by the append sink
+fake_types = SimpleNamespace(
+    AppendRowsRequest=_AppendRowsRequest,
+    ArrowSchema=_Message,
+    ArrowRecordBatch=_Message,
+    WriteStream=_WriteStream,
+)
+
+class FakeBigQueryWriteClient:
+    """Write client with committed and pending stream semantics and offset checks.
+    lose_responses makes that many appends write their rows but fail before answering,
+    the way a dropped connection does, so callers can exercise their retries."""
+    types = fake_types
+
+    def __init__(self, lose_responses=0):
+        self.streams = {}
+        self.tables = {}
+        self.lose_responses = lose_responses
+        self.append_calls = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_write_stream(self, parent=None, write_stream=None):
+        stream_type = getattr(write_stream, "type_", None)
+        name = f"{parent}/streams/fake-{next(self._ids)}"
+        self.streams[name] = {
+            "table": parent,
+            "type": getattr(stream_type, "name", str(stream_type)),
+            "batches": [],
+            "rows": 0,
+            "finalized": False,
+            "commit_time": None,
+        }
+        return SimpleNamespace(name=name, type_=stream_type)
+
+    def append_rows(self, requests):
+        """Yield one response per request, checking each offset against the rows already in the stream"""
+        writer_schema = None
+        for request in requests:
+            with self._lock:
+                self.append_calls += 1
+                stream = self.streams[request.write_stream]
+                arrow_rows = request.arrow_rows
+                if arrow_rows.writer_schema.serialized_schema:
+                    writer_schema = pa.ipc.read_schema(pa.py_buffer(arrow_rows.writer_schema.serialized_schema))
+                batch = pa.ipc.read_record_batch(pa.py_buffer(arrow_rows.rows.serialized_record_batch), writer_schema)
+                offset = request.offset
+
+                if stream["finalized"]:
+                    yield self._response(OUT_OF_RANGE, "stream is finalized", offset)
+                    continue
+                if offset is not None and offset < stream["rows"]:
+                    yield self._response(ALREADY_EXISTS, f"offset {offset} already written", offset)
+                    continue
+                if offset is not None and offset > stream["rows"]:
+                    yield self._response(OUT_OF_RANGE, f"offset {offset} beyond end {stream['rows']}", offset)
+                    continue
+
+                stream["batches"].append(batch)
+                stream["rows"] += batch.num_rows
+                if stream["type"] == "COMMITTED":
+                    self.tables.setdefault(stream["table"], []).append(batch)
+                if self.lose_responses > 0:
+                    self.lose_responses -= 1
+                    raise ConnectionError("connection lost before the append was acknowledged")
+            yield self._response(OK, "", offset)
+
+    def get_write_stream(self, name=None):
+        stream = self.streams[name]
+        return SimpleNamespace(name=name, type_=stream["type"], commit_time=stream["commit_time"])
+
+    def finalize_write_stream(self, name=None):
+        stream = self.streams[name]
+        stream["finalized"] = True
+        return SimpleNamespace(row_count=stream["rows"])
+
+    def batch_commit_write_streams(self, parent=None, write_streams=None):
+        """Make the rows of finalized pending streams visible in their table, all at once"""
+        for name in write_streams:
+            stream = self.streams[name]
+            if not stream["finalized"] or stream["table"] != parent:
+                return SimpleNamespace(commit_time=None, stream_errors=[f"{name} cannot be committed"])
+        for name in write_streams:
+            self.tables.setdefault(parent, []).extend(self.streams[name]["batches"])
+            self.streams[name]["commit_time"] = "now"
+        return SimpleNamespace(commit_time="now", stream_errors=[])
+
+    def table_rows(self, table_path):
+        """Number of rows visible in a table"""
+        return sum(batch.num_rows for batch in self.tables.get(table_path, []))
+
+    @staticmethod
+    def _response(code, message, offset):
+        return SimpleNamespace(
+            error=SimpleNamespace(code=code, message=message),
+            append_result=SimpleNamespace(offset=offset),
+        )
@@ -0,0 +1,94 @@
+# In-memory stand-in for a Spanner Database, for benchmarking loaders without a server
+import time
+import threading
+
+class FakeOperation:
+    """Completed long-running operation returned by update_ddl"""
+    def result(self, timeout=None):
+        return None
+
+class FakeResults(list):
+    """Query results, with the stats attribute of a profiled Spanner result set"""
+    stats = None
+
+class FakeBatch:
+    """Mutation batch that counts rows and simulates commit latency on exit"""
+    def __init__(self, database):
+        self._database = database
+        self._mutations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._database.commit(self._mutations)
+        return False
+
+    def _add(self, operation, table, rows):
+        self._mutations.append((operation, table, len(rows)))
+
+    def insert(self, table, columns, values):
+        self._add("insert", table, values)
+
+    def update(self, table, columns, values):
+        self._add("update", table, values)
+
+    def insert_or_update(self, table, columns, values):
+        self._add("insert_or_update", table, values)
+
+    def replace(self, table, columns, values):
+        self._add("replace", table, values)
+
+    def delete(self, table, keyset):
+        self._add("delete", table, getattr(keyset, "keys", None) or [])
+
+class FakeSnapshot:
+    """Read-only snapshot that returns no rows"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def execute_sql(self, sql, *args, **kwargs):
+        return FakeResults()
+
+    def read(self, table, columns, keyset, *args, **kwargs):
+        return FakeResults()
+
+class FakeDatabase:
+    """Accepts DDL, batches and transactions; every commit sleeps for commit_latency seconds"""
+    def __init__(self, commit_latency=0.0):
+        self.commit_latency = commit_latency
+        self.ddl_statements = []
+        self.rows_written = {}
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def update_ddl(self, ddl_statements):
+        self.ddl_statements.extend(ddl_statements)
+        return FakeOperation()
+
+    def reload(self):
+        return None
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def snapshot(self, *args, **kwargs):
+        return FakeSnapshot()
+
+    def run_in_transaction(self, func, *args, **kwargs):
+        batch = FakeBatch(self)
+        result = func(batch, *args, **kwargs)
+        self.commit(batch._mutations)
+        return result
+
+    def commit(self, mutations):
+        if self.commit_latency:
+            time.sleep(self.commit_latency)
+        with self._lock:
+            self.commits += 1
+            for _, table, row_count in mutations:
+                self.rows_written[table] = self.rows_written.get(table, 0) + row_count
@@ -0,0 +1,151 @@
+# Representative fraud-detection GQL workloads, written for the typed and the schemaless graph
+import time
+
+# Labels of the typed graph (graph_view.sql) and the schemaless graph (lowercase labels)
+graph_labels = {
+    "typed": {
+        "Client": "Client", "Transaction": "Transaction", "Merchant": "Merchant",
+        "PERFORMS": "PERFORMS", "TO_CLIENT": "TO_CLIENT", "TO_MERCHANT": "TO_MERCHANT",
+        "HAS_PII": "HAS_EMAIL|HAS_PHONE|HAS_SSN",
+    },
+    "schemaless": {
+        "Client": "client", "Transaction": "transaction", "Merchant": "merchant",
+        "PERFORMS": "performs", "TO_CLIENT": "to_client", "TO_MERCHANT": "to_merchant",
+        "HAS_PII": "has_email|has_phone|has_ssn",
+    },
+}
+
+# Window of the time-filtered workloads
+windowStartText, windowEndText = "2024-01-01T00:00:00", "2024-01-02T00:00:00"
+
+class GraphDialect:
+    """Writes labels, keys, properties and time literals for one graph schema.
+    schema is "typed" or "schemaless"; typed_columns tells whether timestamps are TIMESTAMP columns."""
+    def __init__(self, schema, typed_columns=False):
+        self.schema = schema
+        self.typed_columns = typed_columns
+        self.labels = graph_labels[schema]
+
+    def label(self, name):
+        return self.labels[name]
+
+    def key(self, var):
+        # Schemaless node ids live in the key column, not in the dynamic properties
+        return f"ELEMENT_ID({var})" if self.schema == "schemaless" else f"{var}.id"
+
+    def number(self, var, name):
+        return f"FLOAT64({var}.{name})" if self.schema == "schemaless" else f"{var}.{name}"
+
+    def flag(self, var, name):
+        return f"BOOL({var}.{name})" if self.schema == "schemaless" else f"{var}.{name}"
+
+    def time(self, var, name="timestamp"):
+        return f"STRING({var}.{name})" if self.schema == "schemaless" else f"{var}.{name}"
+
+    def time_literal(self, text):
+        if self.schema == "typed" and self.typed_columns:
+            return f"TIMESTAMP '{text}Z'"
+        return f"'{text}'"
+
+def shared_pii_rings(d, graph):
+    """Clients sharing an email, phone number or SSN with a known fraudulent client"""
+    return f'''
+GRAPH {graph}
+MATCH (f:{d.label("Client")})-[:{d.label("HAS_PII")}]->(pii)<-[:{d.label("HAS_PII")}]-(c:{d.label("Client")})
+WHERE {d.flag("f", "isfraud")} AND {d.key("f")} <> {d.key("c")}
+RETURN {d.key("f")} AS fraud_client, COUNT(DISTINCT {d.key("c")}) AS linked_clients
+GROUP BY fraud_client
+ORDER BY linked_clients DESC
+LIMIT 100
+'''
+
+def mule_chains(d, graph):
+    """Two-hop client -> client -> client money chains where most of the amount is passed on later"""
+    return f'''
+GRAPH {graph}
+MATCH (a:{d.label("Client")})-[:{d.label("PERFORMS")}]->(t1:{d.label("Transaction")})-[:{d.label("TO_CLIENT")}]->(b:{d.label("Client")}),
+      (b)-[:{d.label("PERFORMS")}]->(t2:{d.label("Transaction")})-[:{d.label("TO_CLIENT")}]->(c:{d.label("Client")})
+WHERE {d.time("t1")} >= {d.time_literal(windowStartText)} AND {d.time("t1")} < {d.time_literal(windowEndText)}
+  AND {d.time("t2")} > {d.time("t1")}
+  AND {d.number("t2", "amount")} >= 0.9 * {d.number("t1", "amount")}
+  AND {d.key("a")} <> {d.key("c")}
+RETURN {d.key("a")} AS origin, {d.key("b")} AS mule, {d.key("c")} AS beneficiary
+LIMIT 100
+'''
+
+def merchant_fan_in(d, graph):
+    """Merchants paid by the most distinct clients in the window"""
+    return f'''
+GRAPH {graph}
+MATCH (c:{d.label("Client")})-[:{d.label("PERFORMS")}]->(t:{d.label("Transaction")})-[:{d.label("TO_MERCHANT")}]->(m:{d.label("Merchant")})
+WHERE {d.time("t")} >= {d.time_literal(windowStartText)} AND {d.time("t")} < {d.time_literal(windowEndText)}
+RETURN {d.key("m")} AS merchant, COUNT(DISTINCT {d.key("c")}) AS clients, SUM({d.number("t", "amount")}) AS total_amount
+GROUP BY merchant
+ORDER BY clients DESC
+LIMIT 100
+'''
+
+def client_velocity(d, graph):
+    """Clients with the most transactions in the window"""
+    return f'''
+GRAPH {graph}
+MATCH (c:{d.label("Client")})-[p:{d.label("PERFORMS")}]->(t:{d.label("Transaction")})
+WHERE {d.time("p")} >= {d.time_literal(windowStartText)} AND {d.time("p")} < {d.time_literal(windowEndText)}
+RETURN {d.key("c")} AS client, COUNT(t) AS transactions, SUM({d.number("t", "amount")}) AS total_amount
+GROUP BY client
+ORDER BY transactions DESC
+LIMIT 100
+'''
+
+workloads = {
+    "shared_pii_rings": shared_pii_rings,
+    "mule_chains": mule_chains,
+    "merchant_fan_in": merchant_fan_in,
+    "client_velocity": client_velocity,
+}
+
+def run_workloads(run, dialect, graph):
+    """Run every workload once and print its row count and latency, for the test_queries.py smoke tests"""
+    success = True
+    for name, build_query in workloads.items():
+        try:
+            rows, latency, _ = run(build_query(dialect, graph))
+            print(f"{name}: {len(rows)} rows in {latency * 1000:.1f}ms")
+            for row in rows[:3]:
+                print(f"  {row}")
+        except Exception as e:
+            print(f"{name}: error {e}")
+            success = False
+    return success
+
+def run_spanner_query(database, query, profile=False):
+    """Run a query in a read-only snapshot. Returns (rows, latency seconds, stats);
+    stats holds the Spanner query statistics when profile is set"""
+    from google.cloud.spanner_v1 import ExecuteSqlRequest
+    start = time.perf_counter()
+    with database.snapshot() as snapshot:
+        if profile:
+            results = snapshot.execute_sql(query, query_mode=ExecuteSqlRequest.QueryMode.PROFILE)
+        else:
+            results = snapshot.execute_sql(query)
+        rows = list(results)
+    latency = time.perf_counter() - start
+    stats = {}
+    query_stats = getattr(getattr(results, "stats", None), "query_stats", None)
+    if query_stats:
+        stats = {key: query_stats[key] for key in ["rows_scanned", "bytes_returned", "cpu_time", "elapsed_time"]
+                 if key in query_stats}
+    return rows, latency, stats
+
+def run_bigquery_query(client, query):
+    """Run a query without the result cache. Returns (rows, latency seconds, stats with bytes processed)"""
+    from google.cloud import bigquery
+    start = time.perf_counter()
+    job = client.query(query, job_config=bigquery.QueryJobConfig(use_query_cache=False))
+    rows = list(job.result())
+    latency = time.perf_counter() - start
+    return rows, latency, {
+        "bytes_processed": job.total_bytes_processed,
+        "bytes_billed": job.total_bytes_billed,
+        "slot_millis": job.slot_millis,
+    }
@@ -0,0 +1,120 @@
+# Shared Spanner connection setup for the import and query scripts
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from google.cloud import spanner
+from google.cloud.spanner_v1.pool import BurstyPool, FixedSizePool, PingingPool
+from google.oauth2 import service_account
+from google.auth.credentials import AnonymousCredentials
+
+# Session pool configuration
+# fixed: sessions created up front, pinging: fixed pool kept alive by a background ping, bursty: created on demand
+poolType = (os.getenv('SPANNER_POOL_TYPE') or 'fixed').strip().lower()
+# Size the pool to the loader or query concurrency so no worker waits for a session
+poolSize = int(os.getenv('SPANNER_POOL_SIZE') or 10)
+pingInterval = int(os.getenv('SPANNER_PING_INTERVAL') or 300)
+
+# One client per key file and emulator, and one Database object per database and pool settings
+_clients = {}
+_databases = {}
+_lock = threading.Lock()
+
+def get_spanner_client(auth_keyfile_path):
+    """Return the process-wide Spanner client of a key file, creating it on first use"""
+    # Targets with their own key files (benchmark_queries.py) keep their own project and credentials
+    key = (os.path.abspath(auth_keyfile_path), os.getenv("SPANNER_EMULATOR_HOST"), os.getenv("SPANNER_PROJECT_ID"))
+    with _lock:
+        if key in _clients:
+            return _clients[key]
+        try:
+            print("Initializing Spanner client...")
+            emulator_host = os.getenv("SPANNER_EMULATOR_HOST")
+            if os.path.exists(auth_keyfile_path):
+                with open(auth_keyfile_path, 'r', encoding='utf-8') as f:
+                    authJSON = json.load(f)
+                project_id = authJSON.get("project_id")
+                emulator_host = emulator_host or authJSON.get("emulator_host")
+            elif emulator_host:
+                # The emulator needs no service account, only a project id
+                project_id = os.getenv("SPANNER_PROJECT_ID") or "emulator-project"
+            else:
+                raise FileNotFoundError(
+                    f"Service account key file not found: {auth_keyfile_path}\n"
+                    "Please ensure the GOOGLE_AUTH_KEYFILE path in .env is correct."
+                )
+
+            if emulator_host:
+                print(f"Connecting to Spanner emulator at {emulator_host} for project: {project_id}")
+                client = spanner.Client(project=project_id, 
+                                        credentials=AnonymousCredentials(),
+                                        client_options={"api_endpoint": emulator_host}
+                                        )
+                print(f"Connected to Spanner emulator: {client.project}")
+            else:
+                print(f"Connecting to GCP Spanner project: {project_id}")
+                credentials = service_account.Credentials.from_service_account_file(auth_keyfile_path)
+                client = spanner.Client(credentials=credentials)
+                print(f"Connected to GCP project: {client.project}")
+            _clients[key] = client
+            return client
+        except Exception as e:
+            print(f"Error initializing Spanner client: {e}")
+            raise e
+
+def create_session_pool(pool_type=None, pool_size=None):
+    """Create a session pool of the configured type and size"""
+    pool_type = pool_type or poolType
+    pool_size = pool_size or poolSize
+    if pool_type == 'pinging':
+        return PingingPool(size=pool_size, ping_interval=pingInterval)
+    if pool_type == 'bursty':
+        return BurstyPool(target_size=pool_size)
+    if pool_type != 'fixed':
+        raise ValueError(f"Unknown SPANNER_POOL_TYPE: {pool_type} (expected fixed, pinging or bursty)")
+    return FixedSizePool(size=pool_size)
+
+def start_pinging(pool):
+    """Refresh idle PingingPool sessions from a background thread"""
+    def ping_forever():
+        while True:
+            time.sleep(max(1, pingInterval // 2))
+            try:
+                pool.ping()
+            except Exception as e:
+                print(f"Error pinging Spanner sessions: {e}")
+
+    thread = threading.Thread(target=ping_forever, name="spanner-session-ping", daemon=True)
+    thread.start()
+    return thread
+
+def prewarm_sessions(database, pool_size=None):
+    """Run a trivial query on every pooled session so the first real requests find them ready"""
+    pool_size = pool_size or poolSize
+    start = time.perf_counter()
+
+    def ping_session(_):
+        with database.snapshot() as snapshot:
+            return list(snapshot.execute_sql("SELECT 1"))
+
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        list(executor.map(ping_session, range(pool_size)))
+    print(f"Pre-warmed {pool_size} Spanner sessions in {time.perf_counter() - start:.2f}s")
+
+def get_database(instance, database_id, pool_type=None, pool_size=None, prewarm=True):
+    """Return the process-wide Database for an existing database, bound to a configured session pool"""
+    pool_type = pool_type or poolType
+    pool_size = pool_size or poolSize
+    key = (instance.name, database_id, pool_type, pool_size)
+    with _lock:
+        if key in _databases:
+            return _databases[key]
+        pool = create_session_pool(pool_type, pool_size)
+        database = instance.database(database_id, pool=pool)
+        if isinstance(pool, PingingPool):
+            start_pinging(pool)
+        _databases[key] = database
+    if prewarm:
+        prewarm_sessions(database, pool_size)
+    return database
@@ -1,20 +1,31 @@
 # Recreated clean file with English translations for comments
 # Import required libraries
 import pandas as pd
+import numpy as np
 import json
 import math
 import datetime
 import decimal
-import random
-import string
 import os
 import sys
-from google.cloud import spanner
-from google.oauth2 import service_account
-from google.auth.credentials import AnonymousCredentials
+import time
+import argparse
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    # Optional fast JSON encoder, falls back to the standard library
+    import orjson
+except ImportError:
+    orjson = None
 
 from dotenv import load_dotenv
 
+# Shared Spanner client and session pool setup
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+from spanner_connection import get_spanner_client, get_database
+from node_registry import NodeIdRegistry
+
 #automatically load .env file
 load_dotenv()
 
@@ -26,41 +37,20 @@ if not instanceName:
 databaseName = os.getenv('DATABASE_NAME') or "paysim_schemaless"
 graphName = os.getenv('GRAPH_NAME') or "paysim_schemaless_graph"
 google_auth_keyfile = os.getenv('GOOGLE_AUTH_KEYFILE') or 'google_auth_keyfile.json'
+# Number of batches committed in parallel (insert_or_update makes batch order irrelevant)
+loadConcurrency = int(os.getenv('LOAD_CONCURRENCY') or 1)
+# Rows read per CSV chunk and chunks/batches buffered between pipeline stages
+loadChunkSize = int(os.getenv('LOAD_CHUNK_SIZE') or 100000)
+loadQueueSize = int(os.getenv('LOAD_QUEUE_SIZE') or 4)
 
 
-data_dir = os.path.join(os.path.dirname(__file__), './../../', 'data')
+# DATA_DIR points the import at another copy of the data, e.g. a subgraph written by src/extract_subgraph.py
+data_dir = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(__file__), './../../', 'data')
 raw_data_dir = os.path.join(data_dir, 'raw')
 processed_data_dir = os.path.join(data_dir, 'processed')
 
-def get_spanner_client():
-    try:
-        print("Initializing Spanner client...")
-        auth_keyfile_path = os.path.join(os.path.dirname(__file__), google_auth_keyfile)
-        if not os.path.exists(auth_keyfile_path):
-            raise FileNotFoundError(
-                f"Service account key file not found: {auth_keyfile_path}\n"
-                "Please ensure the google_auth_keyfile path in config.json is correct."
-            )
-        authJSON = json.load(open(auth_keyfile_path))
-        project_id = authJSON.get("project_id")
-        emulator_host = os.getenv("SPANNER_EMULATOR_HOST") or authJSON.get("emulator_host")
-        if emulator_host:
-            print(f"Connecting to Spanner emulator at {emulator_host} for project: {project_id}")
-            client = spanner.Client(project=project_id, 
-                                    credentials=AnonymousCredentials(),
-                                    client_options={"api_endpoint": emulator_host}
-                                    )
-            print(f"Connected to Spanner emulator: {client.project}")
-        else:
-            print(f"Connecting to GCP Spanner project: {project_id}")
-            credentials = service_account.Credentials.from_service_account_file(auth_keyfile_path)
-            client = spanner.Client(credentials=credentials)
-            print(f"Connected to GCP project: {client.project}")
-        return client
-    except Exception as e:
-        print(f"Error initializing Spanner client: {e}")
-        raise e
-
+# Node ids already loaded into the database, reused by incremental imports
+registry_path = os.path.join(os.path.dirname(__file__), f'.node_registry_{databaseName}.npz')
 
 def delete_all_tables(database):
     """Delete all tables in the specified database"""
@@ -150,7 +140,7 @@ def create_database(spanner_client, instance_name, database_name):
         try:
             database.reload()
             print(f"Using existing database {database_id}")
-            return database
+            return get_database(instance, database_id)
         except Exception:
             print(f"Database {database_id} in instance {instance_id} does not exist")
 
@@ -160,7 +150,8 @@ def create_database(spanner_client, instance_name, database_name):
         operation.result()
         print(f"Created database {database_id}")
 
-        return database
+        # Bind the session pool only once the database exists
+        return get_database(instance, database_id)
     except Exception as e:
         print(f"Error creating dataset: {e}")
         raise
@@ -184,31 +175,59 @@ def create_schemaless_graph(database):
         print(f"Error creating schemaless graph: {e}")
         raise
 
-def safe_json(x, exclude_columns):
-    props = x.drop(exclude_columns)
-    # Use allow_nan=False to surface NaN/Inf issues quickly
-    json_text = json.dumps(props.to_dict(), ensure_ascii=False, allow_nan=False)
-    # json_text empty or none , return '{}'
-    if not json_text or json_text == 'null':
-        return '{}'
-    return json_text
-g_allNodeIdsSet = set()
+def check_json_values(df):
+    """Vectorized equivalent of json.dumps(allow_nan=False): reject NaN/Inf and missing values"""
+    invalid = df.isna().to_numpy(copy=True)
+    float_columns = df.select_dtypes(include=['floating']).columns
+    if len(float_columns):
+        invalid_float = np.isinf(df[float_columns].to_numpy(dtype='float64'))
+        invalid[:, [df.columns.get_loc(col) for col in float_columns]] |= invalid_float
+    if invalid.any():
+        bad_columns = [col for col, bad in zip(df.columns, invalid.any(axis=0)) if bad]
+        raise ValueError(f"Out of range float values are not JSON compliant (NaN/Inf/missing) in columns: "
+                         f"{', '.join(bad_columns)}")
+
+def to_json_column(df):
+    """Serialize every row of df to a JSON object string in bulk"""
+    # Surface NaN/Inf issues quickly, before any row is encoded
+    check_json_values(df)
+    if len(df.columns) == 0:
+        return pd.Series('{}', index=df.index)
+    # Record-oriented conversion yields native Python values for the whole frame at once
+    records = df.to_dict(orient='records')
+    if orjson is not None:
+        texts = [orjson.dumps(record).decode('utf-8') for record in records]
+    else:
+        encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False).encode
+        texts = [encode(record) for record in records]
+    return pd.Series(texts, index=df.index)
+def content_edge_ids(df):
+    """Deterministic edge ids: 64-bit hash of each row, as 16 hex characters"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return pd.Series(np.char.mod('%016x', row_hashes), index=df.index, dtype='string')
+
+g_nodeRegistry = NodeIdRegistry()
+def get_csv_path(csv_file):
+    """Determine which directory to read from"""
+    # Original files (clients.csv, merchants.csv) are in raw/, unless src/gen_features.py
+    # wrote them with their feature columns to processed/
+    # All processed files are in processed/
+    csv_filename = os.path.basename(csv_file) if os.path.isabs(csv_file) or os.path.sep in csv_file else csv_file
+    if csv_filename in ['clients.csv', 'merchants.csv'] and not os.path.exists(os.path.join(processed_data_dir, csv_filename)):
+        return os.path.join(raw_data_dir, csv_filename)
+    return os.path.join(processed_data_dir, csv_filename)
+
 def prepare_data(csv_file, labelName , is_relationship=False):
     """Prepare data by normalizing column names and creating IDs"""
+    # Read CSV file
+    df = pd.read_csv(get_csv_path(csv_file),  sep=',')
+    print(f"Read {len(df)} rows from {csv_file}")
+    return prepare_frame(df, csv_file, labelName, is_relationship)
+
+def prepare_frame(df, csv_file, labelName, is_relationship=False):
+    """Prefix ids, encode JSON properties and filter against the node registry for one frame or chunk"""
     try:
         labelName = labelName.lower().strip()
-        # Determine which directory to read from
-        # Original files (clients.csv, merchants.csv) are in raw/
-        # All processed files are in processed/
-        csv_filename = os.path.basename(csv_file) if os.path.isabs(csv_file) or os.path.sep in csv_file else csv_file
-        if csv_filename in ['clients.csv', 'merchants.csv']:
-            file_path = os.path.join(raw_data_dir, csv_filename)
-        else:
-            file_path = os.path.join(processed_data_dir, csv_filename)
-        
-        # Read CSV file
-        df = pd.read_csv(file_path,  sep=',')
-        print(f"Read {len(df)} rows from {csv_file}")
         
         # Convert column names to lowercase
         df.columns = [col.lower().strip() for col in df.columns]
@@ -242,19 +261,26 @@ def prepare_data(csv_file, labelName , is_relationship=False):
             df["dest_id"] = df[id_columns[1]].astype('string')
             df["dest_id"] = startEndLabelNames[-1] + "_" + df["dest_id"]
 
-            ## randomly generate id string as primary key, length 24
-            df["edge_id"] = [''.join(random.choices(string.ascii_letters + string.digits, k=24)) for _ in range(len(df))]
-            df["edge_id"] = df["edge_id"].astype('string')
+            # Convert all columns except id, dest_id to JSON string and store in properties
+            property_columns = [col for col in df.columns if col not in ["id", "label", "dest_id"] + id_columns]
+            df["properties"] = to_json_column(df[property_columns])
 
-            # Convert all columns except id, edge_id, dest_id to JSON string and store in properties
-            df["properties"] = df.apply(lambda x: safe_json(x, ["id", "label", "edge_id", "dest_id"] + id_columns) , axis=1)
+            ## derive edge_id from the edge content, so reloading the same edge upserts it instead of adding a copy
+            df["edge_id"] = content_edge_ids(df[["label", "id", "dest_id"] + property_columns])
 
             # Keep only id, edge_id, dest_id, label, properties columns
             df = df[["id", "dest_id", "label", "edge_id", "properties"]]
             # edge_id unique
             df = df.drop_duplicates(subset=['edge_id'])
-            # Skip IDs not in g_allNodeIdsSet
-            df = df[df["id"].isin(g_allNodeIdsSet)]
+            # Skip edges whose source or destination node was not loaded
+            has_source = g_nodeRegistry.contains(startEndLabelNames[0], df["id"])
+            has_dest = g_nodeRegistry.contains(startEndLabelNames[-1], df["dest_id"])
+            if not (has_source & has_dest).all():
+                print(f"Skipping {(~has_source).sum()} edges with unknown source and "
+                      f"{(has_source & ~has_dest).sum()} edges with unknown destination")
+            df = df[has_source & has_dest]
+            # Group edges by their parent node, so batches can be cut on parent key ranges
+            df = df.sort_values(by=["id", "dest_id", "edge_id"], ignore_index=True)
 
         else:
             ## first id column is the primary key
@@ -264,14 +290,14 @@ def prepare_data(csv_file, labelName , is_relationship=False):
             df["id"] = df[id_columns[0]].astype('string')
             ## Give id a prefix with label to avoid id collision between different entity types
             df["id"] = labelName + "_" + df["id"]
-            df["properties"] = df.apply(lambda x: safe_json(x, ["id", "label"] + id_columns) , axis=1)
+            df["properties"] = to_json_column(df.drop(columns=list(dict.fromkeys(["id", "label"] + id_columns))))
             # Keep only id, label, properties columns
             df = df[["id", "label", "properties"]]
             # id unique 
             df = df.drop_duplicates(subset=['id'])
 
-            df = df[df["id"].isin(g_allNodeIdsSet) == False]
-            g_allNodeIdsSet.update(df["id"].values)
+            # Skip nodes already loaded and register the new ones
+            df = df[g_nodeRegistry.add(labelName, df["id"])]
 
         print(f"Prepared data columns: {', '.join(df.columns)}")
         return df
@@ -282,6 +308,94 @@ def prepare_data(csv_file, labelName , is_relationship=False):
     
 
 
+def encode_rows(df):
+    """Convert DataFrame rows to the list format required by Spanner mutations"""
+    columns = list(df.columns)
+    data = []
+    for _, row in df.iterrows():
+        row_data = []
+        for col in columns:
+            val = row[col]
+            row_data.append(val)
+        data.append(row_data)
+    return data
+
+def get_batch_size(columns):
+    """Rows per commit so a batch stays under the Spanner mutation limit"""
+    # Calculate number of changes per record (number of columns)
+    mutations_per_row = len(columns)
+    # Spanner limit each transaction to at most 80000 changes
+    max_mutations = 80000
+    # Calculate maximum batch size
+    return max(1, max_mutations // mutations_per_row)
+
+def batch_bounds(data, batch_size, parent_ids=None):
+    """(start, end) row ranges of at most batch_size rows. When parent_ids (sorted) is given,
+    cuts are moved back to the start of a parent group, so each batch covers a contiguous
+    range of parent keys and no parent is split unless it alone exceeds batch_size."""
+    total_rows = len(data)
+    if parent_ids is None:
+        return [(i, min(i + batch_size, total_rows)) for i in range(0, total_rows, batch_size)]
+    parent_ids = np.asarray(parent_ids, dtype=object)
+    group_starts = np.flatnonzero(np.r_[True, parent_ids[1:] != parent_ids[:-1]]) if total_rows else []
+    bounds = []
+    start = 0
+    while start < total_rows:
+        end = start + batch_size
+        if end < total_rows:
+            cut = group_starts[np.searchsorted(group_starts, end, side='right') - 1]
+            if cut > start:
+                end = int(cut)
+        else:
+            end = total_rows
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def edge_parent_ids(table_name, columns, data):
+    """Parent keys of GraphEdge rows (interleaved in GraphNode), None for other tables"""
+    if table_name != "GraphEdge":
+        return None
+    id_index = columns.index("id")
+    return [row[id_index] for row in data]
+
+def commit_batch(database, table_name, columns, batch_data, latencies=None):
+    """Commit one batch of rows with insert_or_update"""
+    start = time.perf_counter()
+    with database.batch() as batch:
+        batch.insert_or_update(
+            table=table_name,
+            columns=columns,
+            values=batch_data
+        )
+    if latencies is not None:
+        latencies.append(time.perf_counter() - start)
+
+def commit_batches(database, table_name, columns, data, batch_size=None, concurrency=None, latencies=None):
+    """Commit rows with insert_or_update in batches, optionally several batches in parallel.
+    Commit latencies in seconds are appended to latencies if given."""
+    batch_size = batch_size or get_batch_size(columns)
+    concurrency = concurrency or loadConcurrency
+    total_rows = len(data)
+    # Edge batches follow parent key ranges, so parallel commits touch disjoint splits
+    bounds = batch_bounds(data, batch_size, edge_parent_ids(table_name, columns, data))
+    total_batches = len(bounds)
+
+    def commit(batch_number, i, end_idx):
+        batch_data = data[i:end_idx]
+        
+        print(f"Inserting batch {batch_number}/{total_batches} " 
+              f"({i} to {end_idx-1} of {total_rows} rows)")
+        commit_batch(database, table_name, columns, batch_data, latencies)
+
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(commit, range(1, total_batches + 1),
+                              [i for i, _ in bounds], [end_idx for _, end_idx in bounds]))
+    else:
+        for n, (i, end_idx) in enumerate(bounds):
+            commit(n + 1, i, end_idx)
+
 def load_csv_to_spanner(database, df, labelName, is_relationship=False):
     """Load a DataFrame into a Spanner table"""
     try:
@@ -295,36 +409,10 @@ def load_csv_to_spanner(database, df, labelName, is_relationship=False):
         # Prepare data for insertion
         # Spanner requires data in list format
         columns = list(df.columns)
-        data = []
-        for _, row in df.iterrows():
-            row_data = []
-            for col in columns:
-                val = row[col]
-                row_data.append(val)
-            data.append(row_data)
+        data = encode_rows(df)
         
         # Insert data in batches to avoid exceeding Spanner limit
-        # Calculate number of changes per record (number of columns)
-        mutations_per_row = len(columns)
-        # Spanner limit each transaction to at most 80000 changes
-        max_mutations = 80000
-        # Calculate maximum batch size
-        batch_size = max(1, max_mutations // mutations_per_row)
-        
-        total_rows = len(data)
-        for i in range(0, total_rows, batch_size):
-            end_idx = min(i + batch_size, total_rows)
-            batch_data = data[i:end_idx]
-            
-            print(f"Inserting batch {i//batch_size + 1}/{(total_rows + batch_size - 1)//batch_size} " 
-                  f"({i} to {end_idx-1} of {total_rows} rows)")
-
-            with database.batch() as batch:
-                batch.insert_or_update(
-                    table=table_name,
-                    columns=columns,
-                    values=batch_data
-                )
+        commit_batches(database, table_name, columns, data)
         
         print(f"Loaded {len(df)} rows into {table_name}")
         print(f"Table schema for {table_name}:")
@@ -335,6 +423,93 @@ def load_csv_to_spanner(database, df, labelName, is_relationship=False):
         print(f"Error loading data to {table_name}: {e}")
         raise e
 
+# Marks the end of a pipeline queue
+_END_OF_STREAM = object()
+
+def stream_csv_to_spanner(database, csv_file, labelName, is_relationship=False,
+                          chunk_size=None, batch_size=None, concurrency=None, latencies=None):
+    """Load a CSV file through overlapping stages connected by bounded queues:
+    read chunk -> prefix ids and encode JSON -> filter against the node registry
+    -> build mutation batches -> commit (concurrency parallel committers).
+    Memory is bounded by the queue sizes instead of the file size. Returns rows committed."""
+    chunk_size = chunk_size or loadChunkSize
+    concurrency = concurrency or loadConcurrency
+    table_name = "GraphEdge" if is_relationship else "GraphNode"
+    chunks = queue.Queue(maxsize=loadQueueSize)
+    frames = queue.Queue(maxsize=loadQueueSize)
+    batches = queue.Queue(maxsize=max(loadQueueSize, 2 * concurrency))
+    errors = []
+    committed = {"rows": 0, "batches": 0}
+    committed_lock = threading.Lock()
+
+    # After an error every stage keeps draining its input, so no upstream stage blocks on a full queue
+    def read_chunks():
+        try:
+            for chunk in pd.read_csv(get_csv_path(csv_file), sep=',', chunksize=chunk_size):
+                if errors:
+                    break
+                chunks.put(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            chunks.put(_END_OF_STREAM)
+
+    def prepare_chunks():
+        while (chunk := chunks.get()) is not _END_OF_STREAM:
+            if errors:
+                continue
+            try:
+                # Runs in a single thread, so node registry updates stay ordered
+                frames.put(prepare_frame(chunk, csv_file, labelName, is_relationship))
+            except Exception as e:
+                errors.append(e)
+        frames.put(_END_OF_STREAM)
+
+    def build_batches():
+        while (df := frames.get()) is not _END_OF_STREAM:
+            if errors:
+                continue
+            try:
+                columns = list(df.columns)
+                rows_per_batch = batch_size or get_batch_size(columns)
+                data = encode_rows(df)
+                for i, end_idx in batch_bounds(data, rows_per_batch, edge_parent_ids(table_name, columns, data)):
+                    batches.put((columns, data[i:end_idx]))
+            except Exception as e:
+                errors.append(e)
+        for _ in range(concurrency):
+            batches.put(_END_OF_STREAM)
+
+    def commit_worker():
+        while (item := batches.get()) is not _END_OF_STREAM:
+            if errors:
+                continue
+            columns, batch_data = item
+            try:
+                commit_batch(database, table_name, columns, batch_data, latencies)
+                with committed_lock:
+                    committed["rows"] += len(batch_data)
+                    committed["batches"] += 1
+                    print(f"Committed batch {committed['batches']} ({committed['rows']} rows) into {table_name}")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [
+        threading.Thread(target=read_chunks, name="read-chunks"),
+        threading.Thread(target=prepare_chunks, name="prepare-chunks"),
+        threading.Thread(target=build_batches, name="build-batches"),
+    ] + [threading.Thread(target=commit_worker, name=f"commit-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        print(f"Error loading {csv_file} into {table_name}: {errors[0]}")
+        raise errors[0]
+    print(f"Loaded {committed['rows']} rows from {csv_file} into {table_name}")
+    return committed["rows"]
+
 def import_data(database):
         # Define files to load
     ## schemaless all name to lower case
@@ -347,6 +522,8 @@ def import_data(database):
         ("emails.csv", "email" , False),
         ("phonenumbers.csv", "phonenumber", False),
         ("ssns.csv", "ssn", False),
+        ("rings.csv", "ring", False),
+        ("flow_patterns.csv", "flowpattern", False),
         
         # Relationship tables
         ("Client_Perform_Transaction.csv", "performs", True),
@@ -355,33 +532,47 @@ def import_data(database):
         ("Transaction_To_Bank.csv", "to_bank" , True),
         ("Has_Email.csv", "has_email" , True),
         ("Has_Phonenumber.csv", "has_phone", True),
-        ("Has_SSN.csv", "has_ssn", True)
+        ("Has_SSN.csv", "has_ssn", True),
+        ("In_Ring.csv", "in_ring", True),
+        ("In_Flow.csv", "in_flow", True)
     ]
 
     # Process and load all files
     for csv_file, table_name, is_relationship in files_to_load:
         print(f"\nProcessing {csv_file} -> {table_name} (is_relationship={is_relationship})")
-        df = prepare_data(csv_file, table_name, is_relationship)
-        if df is not None:
-            load_csv_to_spanner(database, df, table_name, is_relationship)
+        stream_csv_to_spanner(database, csv_file, table_name, is_relationship)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import PaySim data to Spanner as a schemaless graph")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep existing data and the saved node registry, only add new nodes and upsert edges")
+    return parser.parse_args()
 
 def main():
+    global g_nodeRegistry
+    args = parse_args()
     try:
         print(f"""Starting import {databaseName} data to Spanner...""")
-        client = get_spanner_client()
+        client = get_spanner_client(os.path.join(os.path.dirname(__file__), google_auth_keyfile))
   
         print("1. Setting up Spanner instance and database...")
         database = create_database(client, instanceName, databaseName)
 
-        print("2. Deleting all existing tables and views...")
-        database = delete_all_tables(database)
+        if args.incremental:
+            print("2. Keeping existing tables, loading node registry...")
+            g_nodeRegistry = NodeIdRegistry.load(registry_path)
+            print(f"Node registry has {g_nodeRegistry.size()} ids")
+        else:
+            print("2. Deleting all existing tables and views...")
+            database = delete_all_tables(database)
 
-        print("3. Creating schemaless graph structure...")
-        create_schemaless_graph(database)
+            print("3. Creating schemaless graph structure...")
+            create_schemaless_graph(database)
 
         print("4. Importing CSV data into Spanner...")
 
         import_data(database)
+        g_nodeRegistry.save(registry_path)
         
         print("\nAll data successfully imported to Spanner!")
 
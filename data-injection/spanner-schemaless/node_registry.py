@@ -0,0 +1,71 @@
+# Compact registry of the node ids loaded into the schemaless graph
+import os
+import numpy as np
+import pandas as pd
+
+class NodeIdRegistry:
+    """Node ids per label, kept as sorted arrays of 64-bit hashes of the prefixed id strings.
+
+    Each id costs 8 bytes instead of a Python string in a set, membership is a vectorized
+    binary search, and the arrays can be saved to disk so incremental imports reuse them.
+    Two different ids sharing a 64-bit hash is possible in theory but negligible at PaySim scale.
+    """
+
+    def __init__(self):
+        self._ids = {}
+
+    @staticmethod
+    def hash_ids(ids):
+        """64-bit hash of each id string"""
+        return pd.util.hash_array(np.asarray(ids, dtype=object), categorize=False)
+
+    def _contains_hashes(self, label, hashes):
+        registered = self._ids.get(label)
+        if registered is None or len(registered) == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(registered, hashes)
+        positions[positions == len(registered)] = 0
+        return registered[positions] == hashes
+
+    def contains(self, label, ids):
+        """Boolean mask of the ids registered under label"""
+        return self._contains_hashes(label, self.hash_ids(ids))
+
+    def add(self, label, ids):
+        """Register ids under label; returns a mask of the ids that were not registered before"""
+        hashes = self.hash_ids(ids)
+        # Only the first occurrence of an id repeated within ids counts as new
+        _, first_positions = np.unique(hashes, return_index=True)
+        is_new = np.zeros(len(hashes), dtype=bool)
+        is_new[first_positions] = True
+        is_new &= ~self._contains_hashes(label, hashes)
+        if is_new.any():
+            registered = self._ids.get(label, np.empty(0, dtype=np.uint64))
+            self._ids[label] = np.union1d(registered, hashes[is_new])
+        return is_new
+
+    def labels(self):
+        return list(self._ids)
+
+    def size(self, label=None):
+        if label is not None:
+            return len(self._ids.get(label, []))
+        return sum(len(registered) for registered in self._ids.values())
+
+    def clear(self):
+        self._ids = {}
+
+    def save(self, path):
+        """Write all label arrays to a single .npz file"""
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **self._ids)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a registry saved with save(), or an empty one if the file does not exist"""
+        registry = cls()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                registry._ids = {label: data[label] for label in data.files}
+        return registry
@@ -1,12 +1,12 @@
-import json
 import os
 import sys
-from pathlib import Path
-from google.cloud import spanner
-from google.oauth2 import service_account
-from google.auth.credentials import AnonymousCredentials
 from dotenv import load_dotenv
 
+# Shared Spanner client and session pool setup
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+from spanner_connection import get_spanner_client, get_database
+from fraud_queries import GraphDialect, run_spanner_query, run_workloads
+
 #automatically load .env file
 load_dotenv()
 
@@ -38,25 +38,10 @@ def run_test_query(query, database):
 def main():
     try:
         # Initialize Spanner client
-        auth_keyfile_path =  os.path.join(os.path.dirname(__file__), 'google_auth_keyfile.json')
-        authJSON = json.load(open(auth_keyfile_path))
-        project_id = authJSON.get("project_id")
-        emulator_host = os.getenv("SPANNER_EMULATOR_HOST") or authJSON.get("emulator_host")
-        if emulator_host:
-            print(f"Connecting to Spanner emulator at {emulator_host} for project: {project_id}")
-            client = spanner.Client(project=project_id, 
-                                    credentials=AnonymousCredentials(),
-                                    client_options={"api_endpoint": emulator_host}
-                                    )
-            print(f"Connected to Spanner emulator: {client.project}")
-        else:
-            print(f"Connecting to GCP Spanner project: {project_id}")
-            credentials = service_account.Credentials.from_service_account_file(auth_keyfile_path)
-            client = spanner.Client(credentials=credentials)
-            print(f"Connected to GCP project: {client.project}")
+        client = get_spanner_client(os.path.join(os.path.dirname(__file__), google_auth_keyfile))
         
         instance = client.instance(instanceName)
-        database = instance.database(databaseName)
+        database = get_database(instance, databaseName)
         
         success = run_test_query(f'''
 GRAPH {graphName}
@@ -78,6 +63,10 @@ SELECT count(*) as node_count
 FROM GraphNode 
 ''', database)
         
+        # Fraud workloads of the query benchmark (data-injection/benchmark/benchmark_queries.py), run once
+        print("\nFraud workload queries:")
+        success = run_workloads(lambda query: run_spanner_query(database, query), GraphDialect("schemaless"), graphName) and success
+
         sys.exit(0 if success else 1)
         
     except Exception as e:
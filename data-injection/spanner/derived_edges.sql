@@ -0,0 +1,18 @@
+CREATE OR REPLACE VIEW Client_Perform_Transaction SQL SECURITY INVOKER AS
+    SELECT t.idorig AS client_id, t.id AS transaction_id, t.timestamp AS timestamp
+    FROM Transaction AS t;
+
+CREATE OR REPLACE VIEW Transaction_To_Client SQL SECURITY INVOKER AS
+    SELECT t.id AS transaction_id, t.iddest AS client_id, t.timestamp AS timestamp
+    FROM Transaction AS t
+    WHERE t.typedest IN ('CLIENT', 'MULE');
+
+CREATE OR REPLACE VIEW Transaction_To_Merchant SQL SECURITY INVOKER AS
+    SELECT t.id AS transaction_id, t.iddest AS merchant_id, t.timestamp AS timestamp
+    FROM Transaction AS t
+    WHERE t.typedest = 'MERCHANT';
+
+CREATE OR REPLACE VIEW Transaction_To_Bank SQL SECURITY INVOKER AS
+    SELECT t.id AS transaction_id, t.iddest AS bank_id, t.timestamp AS timestamp
+    FROM Transaction AS t
+    WHERE t.typedest = 'BANK';
@@ -0,0 +1,29 @@
+CREATE OR REPLACE VIEW Email SQL SECURITY INVOKER AS
+    SELECT DISTINCT c.email AS id, c.email AS name
+    FROM Client AS c
+    WHERE c.email IS NOT NULL;
+
+CREATE OR REPLACE VIEW PhoneNumber SQL SECURITY INVOKER AS
+    SELECT DISTINCT c.phonenumber AS id, c.phonenumber AS name
+    FROM Client AS c
+    WHERE c.phonenumber IS NOT NULL;
+
+CREATE OR REPLACE VIEW SSN SQL SECURITY INVOKER AS
+    SELECT DISTINCT c.ssn AS id, c.ssn AS name
+    FROM Client AS c
+    WHERE c.ssn IS NOT NULL;
+
+CREATE OR REPLACE VIEW Has_Email SQL SECURITY INVOKER AS
+    SELECT c.id AS client_id, c.email AS email_id
+    FROM Client AS c
+    WHERE c.email IS NOT NULL;
+
+CREATE OR REPLACE VIEW Has_PhoneNumber SQL SECURITY INVOKER AS
+    SELECT c.id AS client_id, c.phonenumber AS phonenumber_id
+    FROM Client AS c
+    WHERE c.phonenumber IS NOT NULL;
+
+CREATE OR REPLACE VIEW Has_SSN SQL SECURITY INVOKER AS
+    SELECT c.id AS client_id, c.ssn AS ssn_id
+    FROM Client AS c
+    WHERE c.ssn IS NOT NULL;
@@ -3,11 +3,11 @@ NODE TABLES (
     Client
         KEY (id)
         LABEL Client
-        PROPERTIES (id, name, isfraud),
+        PROPERTIES (id, name, isfraud, out_transactions, in_transactions, outflow_amount, inflow_amount, out_counterparties, in_counterparties, max_hourly_transactions, shared_email_clients, shared_phone_clients, shared_ssn_clients),
     Merchant
         KEY (id)
         LABEL Merchant
-        PROPERTIES (id, name, highrisk),
+        PROPERTIES (id, name, highrisk, in_transactions, inflow_amount, distinct_clients, max_hourly_transactions),
     Bank
         KEY (id)
         LABEL Bank
@@ -27,29 +27,37 @@ NODE TABLES (
     SSN
         KEY (id)
         LABEL SSN
-        PROPERTIES (id, name)
+        PROPERTIES (id, name),
+    Ring
+        KEY (id)
+        LABEL Ring
+        PROPERTIES (id, client_count, fraud_clients, fraud_ratio, identifier_count),
+    FlowPattern
+        KEY (id)
+        LABEL FlowPattern
+        PROPERTIES (id, pattern, hops, total_amount, last_amount, start_time, end_time, duration_seconds)
 )
 EDGE TABLES(
     Client_Perform_Transaction
-        KEY (client_id, transaction_id, timestamp)
+        KEY (client_id, transaction_id)
         SOURCE KEY (client_id) REFERENCES Client (id)
         DESTINATION KEY (transaction_id) REFERENCES Transaction (id)
         LABEL PERFORMS
         PROPERTIES (timestamp, client_id, transaction_id),
     Transaction_To_Client
-        KEY (transaction_id, client_id, timestamp)
+        KEY (transaction_id, client_id)
         SOURCE KEY (transaction_id) REFERENCES Transaction (id)
         DESTINATION KEY (client_id) REFERENCES Client (id)
         LABEL TO_CLIENT
         PROPERTIES (timestamp, transaction_id, client_id),
     Transaction_To_Merchant
-        KEY (transaction_id, merchant_id, timestamp)
+        KEY (transaction_id, merchant_id)
         SOURCE KEY (transaction_id) REFERENCES Transaction (id)
         DESTINATION KEY (merchant_id) REFERENCES Merchant (id)
         LABEL TO_MERCHANT
         PROPERTIES (timestamp, transaction_id, merchant_id),
     Transaction_To_Bank
-        KEY (transaction_id, bank_id, timestamp)
+        KEY (transaction_id, bank_id)
         SOURCE KEY (transaction_id) REFERENCES Transaction (id)
         DESTINATION KEY (bank_id) REFERENCES Bank (id)
         LABEL TO_BANK
@@ -71,5 +79,17 @@ EDGE TABLES(
         SOURCE KEY (client_id) REFERENCES Client (id)
         DESTINATION KEY (ssn_id) REFERENCES SSN (id)
         LABEL HAS_SSN
-        PROPERTIES (client_id, ssn_id)
+        PROPERTIES (client_id, ssn_id),
+    In_Ring
+        KEY (client_id, ring_id)
+        SOURCE KEY (client_id) REFERENCES Client (id)
+        DESTINATION KEY (ring_id) REFERENCES Ring (id)
+        LABEL IN_RING
+        PROPERTIES (client_id, ring_id),
+    In_Flow
+        KEY (client_id, flowpattern_id)
+        SOURCE KEY (client_id) REFERENCES Client (id)
+        DESTINATION KEY (flowpattern_id) REFERENCES FlowPattern (id)
+        LABEL IN_FLOW
+        PROPERTIES (client_id, flowpattern_id, position)
 )
\ No newline at end of file
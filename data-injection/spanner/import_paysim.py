@@ -1,13 +1,21 @@
 # Import required libraries
 import sys
 import os
+import re
 import json
+import decimal
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd 
 from google.cloud import spanner
-from google.oauth2 import service_account
-from google.auth.credentials import AnonymousCredentials
 from dotenv import load_dotenv
 
+# Shared Spanner client and session pool setup
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+from spanner_connection import get_spanner_client, get_database
+
 #automatically load .env file
 load_dotenv()
 
@@ -19,11 +27,56 @@ if not instanceName:
 databaseName = os.getenv('DATABASE_NAME') or "paysim"
 graphName = os.getenv('GRAPH_NAME') or "graph_view"
 google_auth_keyfile = os.getenv('GOOGLE_AUTH_KEYFILE') or 'google_auth_keyfile.json'
+# Typed schema: TIMESTAMP timestamps, INT64 step counters and NUMERIC amounts instead of STRING/FLOAT64
+typedSchema = (os.getenv('TYPED_SCHEMA') or 'false').strip().lower() in ['1', 'true', 'yes']
+# Derived edges: the transaction edges are views over the Transaction table instead of loaded tables
+derivedEdges = (os.getenv('DERIVED_EDGES') or 'false').strip().lower() in ['1', 'true', 'yes']
+derived_edge_tables = ['Client_Perform_Transaction', 'Transaction_To_Client', 'Transaction_To_Merchant', 'Transaction_To_Bank']
+# Derived PII: Email, PhoneNumber, SSN and their HAS_* edges are views over the Client table
+derivedPii = (os.getenv('DERIVED_PII') or 'false').strip().lower() in ['1', 'true', 'yes']
+derived_pii_tables = ['Email', 'PhoneNumber', 'SSN', 'Has_Email', 'Has_PhoneNumber', 'Has_SSN']
+
+# Step counters stored as INT64 in typed schema mode
+step_columns = ['step', 'globalstep']
     
-data_dir = os.path.join(os.path.dirname(__file__), './../../', 'data')
+# DATA_DIR points the import at another copy of the data, e.g. a subgraph written by src/extract_subgraph.py
+data_dir = os.getenv('DATA_DIR') or os.path.join(os.path.dirname(__file__), './../../', 'data')
 raw_data_dir = os.path.join(data_dir, 'raw')
 processed_data_dir = os.path.join(data_dir, 'processed')
 
+# Records committed batches per table so an interrupted import can be resumed
+checkpoint_path = os.path.join(os.path.dirname(__file__), '.import_checkpoint.json')
+
+def new_checkpoint():
+    """Empty checkpoint of the configured instance and database"""
+    return {"instance": instanceName, "database": databaseName, "tables": {}}
+
+def load_checkpoint():
+    """Load the import checkpoint, or an empty one if there is none or it belongs to another database"""
+    if not os.path.exists(checkpoint_path):
+        return new_checkpoint()
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("instance") != instanceName or checkpoint.get("database") != databaseName:
+        print(f"Checkpoint is for database '{checkpoint.get('database')}' on instance '{checkpoint.get('instance')}', "
+              f"not '{databaseName}' on '{instanceName}', ignoring it")
+        return new_checkpoint()
+    return checkpoint
+
+def save_checkpoint(checkpoint):
+    """Write the checkpoint atomically so a crash never leaves a partial file"""
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+def data_fingerprint(df):
+    """Fingerprint prepared data (columns, types and row contents)"""
+    digest = hashlib.sha256()
+    digest.update(repr([(col, str(dtype)) for col, dtype in df.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
 def delete_all_tables(database):
     """Delete all tables in the specified database"""
     try:
@@ -116,7 +169,7 @@ def create_dataset(spanner_client, instance_name, database_name):
         try:
             database.reload()
             print(f"Using existing database {database_id}")
-            return database
+            return get_database(instance, database_id)
         except Exception:
             print(f"Database {database_id} in instance {instance_id} does not exist")
 
@@ -126,7 +179,8 @@ def create_dataset(spanner_client, instance_name, database_name):
         operation.result()
         print(f"Created database {database_id}")
         
-        return database
+        # Bind the session pool only once the database exists
+        return get_database(instance, database_id)
     except Exception as e:
         print(f"Error creating dataset: {e}")
         raise
@@ -135,9 +189,10 @@ def prepare_data(csv_file, is_transaction=False):
     """Prepare data by normalizing column names and creating IDs"""
     try:
         # Determine which directory to read from
-        # Original files (clients.csv, merchants.csv) are in raw/
+        # Original files (clients.csv, merchants.csv) are in raw/, unless src/gen_features.py
+        # wrote them with their feature columns to processed/
         # All processed files are in processed/
-        if csv_file in ['clients.csv', 'merchants.csv']:
+        if csv_file in ['clients.csv', 'merchants.csv'] and not os.path.exists(os.path.join(processed_data_dir, csv_file)):
             file_path = os.path.join(raw_data_dir, csv_file)
         else:
             file_path = os.path.join(processed_data_dir, csv_file)
@@ -151,7 +206,7 @@ def prepare_data(csv_file, is_transaction=False):
         
         # Check if this is a relationship table
         is_relationship = any(csv_file.startswith(prefix) for prefix in 
-                            ['Has_', 'Client_Perform_', 'Transaction_To_'])
+                            ['Has_', 'Client_Perform_', 'Transaction_To_', 'In_', 'Rollup_'])
         
         # Handle IDs based on table type
         if is_relationship:
@@ -162,6 +217,10 @@ def prepare_data(csv_file, is_transaction=False):
         elif is_transaction:
             # For transactions, convert globalstep to string id
             df['id'] = df['globalstep'].astype('string')
+            if derivedEdges:
+                # The edge views join these to the Client, Merchant and Bank ids
+                df['idorig'] = df['idorig'].astype('string')
+                df['iddest'] = df['iddest'].astype('string')
         else:
             # For other entity tables, ensure id exists and convert to string
             if 'id' not in df.columns:
@@ -175,6 +234,17 @@ def prepare_data(csv_file, is_transaction=False):
             df['isflaggedfraud'] = df['isflaggedfraud'].astype('bool')
         if 'highrisk' in df.columns:
             df['highrisk'] = df['highrisk'].astype('bool')
+
+        # Convert to native types for typed schema mode
+        if typedSchema:
+            if 'timestamp' in df.columns:
+                df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+            for col in step_columns:
+                if col in df.columns:
+                    df[col] = df[col].astype('int64')
+            if 'amount' in df.columns:
+                # NUMERIC values are sent as Decimal to keep exact cents
+                df['amount'] = df['amount'].round(2).astype('string').map(decimal.Decimal)
         
         print(f"Prepared data columns: {', '.join(df.columns)}")
         if not is_relationship:
@@ -187,144 +257,232 @@ def prepare_data(csv_file, is_transaction=False):
         print(f"Error preparing data from {csv_file}: {e}")
         return None
 
-def load_csv_to_spanner(database, df, table_name):
-    """Load a DataFrame into a Spanner table"""
+def table_exists(database, table_name):
+    """Check whether a table exists in the database"""
+    with database.snapshot() as snapshot:
+        # Use INFORMATION_SCHEMA.TABLES to check if table exists
+        results = snapshot.execute_sql(
+            f"SELECT table_name FROM INFORMATION_SCHEMA.TABLES WHERE table_name = '{table_name}'"
+        )
+        # Convert results to list, check if table exists
+        return len(list(results)) > 0
+
+def get_table_schema(df, table_name):
+    """Derive the Spanner column types and primary key for a prepared DataFrame"""
+    # Check if this is a relationship table
+    # Rollup tables (src/gen_rollups.py) are keyed the same way, plus their timestamp bucket
+    is_relationship = any(table_name.startswith(prefix) for prefix in 
+                        ['Has_', 'Client_Perform_', 'Transaction_To_', 'In_', 'Rollup_'])
+    is_rollup = table_name.startswith('Rollup_')
+
+    # Create column definitions as (name, Spanner type, constraint)
+    column_defs = []
+    key_columns = []
+    
+    if is_relationship:
+        # For relationship tables, set all ID columns to STRING
+        for col in df.columns:
+            if col.endswith('_id'):
+                column_defs.append((col, "STRING(36)", "NOT NULL"))
+            elif col == "timestamp" and typedSchema:
+                column_defs.append((col, "TIMESTAMP", "NOT NULL" if is_rollup else ""))
+            elif col == "timestamp":
+                column_defs.append((col, "STRING(30)", "NOT NULL" if is_rollup else ""))
+            elif col.endswith('_count'):
+                column_defs.append((col, "INT64", ""))
+            else:
+                column_defs.append((col, "FLOAT64", ""))
+        
+        # For relationship tables, we can use the combination of ID columns as the primary key
+        key_columns = [col for col in df.columns if col.endswith('_id')]
+        if is_rollup:
+            # (entity, bucket) keys make the time series of one entity a primary key range read
+            key_columns.append('timestamp')
+        
+    else:
+        # For entity tables, set id as primary key
+        column_defs.append(("id", "STRING(36)", "NOT NULL"))
+        
+        # Add other columns
+        for col in df.columns:
+            if col != 'id':
+                if col in ['isfraud', 'isflaggedfraud', 'highrisk']:
+                    # Boolean type field defined as BOOL, default to false
+                    column_defs.append((col, "BOOL", "NOT NULL DEFAULT (false)"))
+                elif typedSchema and col == 'timestamp':
+                    column_defs.append((col, "TIMESTAMP", ""))
+                elif typedSchema and col in step_columns:
+                    column_defs.append((col, "INT64", ""))
+                elif typedSchema and col == 'amount':
+                    column_defs.append((col, "NUMERIC", ""))
+                elif df[col].dtype == 'float64' or df[col].dtype == 'int64':
+                    column_defs.append((col, "FLOAT64", ""))
+                else:
+                    column_defs.append((col, "STRING(255)", ""))
+        
+        # Add primary key constraint
+        key_columns = ["id"]
+
+    # Create column mapping, record base data type for each field (STRING(36) -> STRING)
+    column_types = {col: col_type.split('(')[0] for col, col_type, _ in column_defs}
+    
+    # Create DDL statement
+    columns_str = ", ".join(f"{col} {col_type} {constraint}".strip() for col, col_type, constraint in column_defs)
+    primary_key = f") PRIMARY KEY ({', '.join(key_columns)}" if key_columns else ""
+    create_table_ddl = f"CREATE TABLE {table_name} ({columns_str}{primary_key})"
+    return column_defs, column_types, key_columns, create_table_ddl
+
+def coerce_column_types(df, column_types):
+    """Ensure data type matches table definition"""
+    for col in df.columns:
+        if column_types.get(col) == "STRING":
+            df[col] = df[col].astype('string')
+        elif column_types.get(col) == "FLOAT64":
+            try:
+                df[col] = df[col].astype('float64')
+            except:
+                pass
+        elif column_types.get(col) == "BOOL":
+            try:
+                df[col] = df[col].astype('bool')
+            except:
+                # If conversion fails, use 0 and non-0 values
+                df[col] = df[col].astype('int64').astype('bool')
+    return df
+
+def encode_rows(df, column_types):
+    """Convert DataFrame rows to the list format required by Spanner mutations"""
+    columns = list(df.columns)
+    data = []
+    for _, row in df.iterrows():
+        row_data = []
+        for col in columns:
+            val = row[col]
+            # Ensure value matches column type
+            if column_types.get(col) == "STRING" and not isinstance(val, str):
+                val = str(val)
+            elif column_types.get(col) == "INT64":
+                val = int(val)
+            elif column_types.get(col) == "TIMESTAMP":
+                val = val.to_pydatetime()
+            # Boolean values remain unchanged, Spanner API will handle correctly
+            row_data.append(val)
+        data.append(row_data)
+    return data
+
+def get_batch_size(columns):
+    """Rows per commit so a batch stays under the Spanner mutation limit"""
+    # Calculate number of changes per record (number of columns)
+    mutations_per_row = len(columns)
+    # Spanner limit each transaction to at most 80000 changes
+    max_mutations = 80000
+    # Calculate maximum batch size
+    return max(1, max_mutations // mutations_per_row)
+
+def load_csv_to_spanner(database, df, table_name, checkpoint=None, batch_size=None, latencies=None):
+    """Load a DataFrame into a Spanner table, recording progress in checkpoint if given.
+    Commit latencies in seconds are appended to latencies if given."""
     try:
         if df is None:
             raise ValueError("DataFrame is None")
-            
-        # Check if this is a relationship table
-        is_relationship = any(table_name.startswith(prefix) for prefix in 
-                            ['Has_', 'Client_Perform_', 'Transaction_To_'])
-        
+
+        # Insert data in batches to avoid exceeding Spanner limit
+        batch_size = batch_size or get_batch_size(df.columns)
+        total_rows = len(df)
+        total_batches = (total_rows + batch_size - 1) // batch_size
+
+        # Resume from the checkpoint only if the prepared data and batching are unchanged
+        table_state = None
+        start_batch = 0
+        resuming = False
+        if checkpoint is not None:
+            fingerprint = data_fingerprint(df)
+            table_state = checkpoint["tables"].get(table_name)
+            if (table_state and table_state.get("fingerprint") == fingerprint
+                    and table_state.get("batch_size") == batch_size
+                    and table_exists(database, table_name)):
+                if table_state.get("completed"):
+                    print(f"Table {table_name} already loaded, skipping")
+                    return
+                start_batch = table_state["last_committed_batch"] + 1
+                resuming = True
+                print(f"Resuming {table_name} at batch {start_batch + 1}/{total_batches}")
+            else:
+                table_state = None
+
         # Check if table exists, delete if it does
-        try:
-            with database.snapshot() as snapshot:
-                # Use INFORMATION_SCHEMA.TABLES to check if table exists
-                results = snapshot.execute_sql(
-                    f"SELECT table_name FROM INFORMATION_SCHEMA.TABLES WHERE table_name = '{table_name}'"
-                )
-                # Convert results to list, check if table exists
-                table_exists = len(list(results)) > 0
-                
-            if table_exists:
-                print(f"Table {table_name} exists, deleting...")
-                ddl_statement = f"DROP TABLE {table_name}"
-                operation = database.update_ddl([ddl_statement])
-                operation.result()
-                print(f"Table {table_name} deleted")
-        except Exception as e:
-            print(f"Error checking or deleting table {table_name}: {e}")
-        
-        # Create column definitions
-        column_defs = []
-        primary_key = ""
-        
-        # Create column mapping, record data type for each field
-        column_types = {}
-        
-        if is_relationship:
-            # For relationship tables, set all ID columns to STRING
-            for col in df.columns:
-                if col.endswith('_id'):
-                    column_defs.append(f"{col} STRING(36) NOT NULL")
-                    column_types[col] = "STRING"
-                elif col == "timestamp":
-                    column_defs.append(f"{col} STRING(30)")
-                    column_types[col] = "STRING"
-                else:
-                    column_defs.append(f"{col} FLOAT64")
-                    column_types[col] = "FLOAT64"
-            
-            # For relationship tables, we can use the combination of ID columns as the primary key
-            id_columns = [col for col in df.columns if col.endswith('_id')]
-            if id_columns:
-                primary_key = f") PRIMARY KEY ({', '.join(id_columns)}"
-            
-        else:
-            # For entity tables, set id as primary key
-            column_defs.append("id STRING(36) NOT NULL")
-            column_types["id"] = "STRING"
-            
-            # Add other columns
-            for col in df.columns:
-                if col != 'id':
-                    if col in ['isfraud', 'isflaggedfraud', 'highrisk']:
-                        # Boolean type field defined as BOOL, default to false
-                        column_defs.append(f"{col} BOOL NOT NULL DEFAULT (false)")
-                        column_types[col] = "BOOL"
-                    elif df[col].dtype == 'float64' or df[col].dtype == 'int64':
-                        column_defs.append(f"{col} FLOAT64")
-                        column_types[col] = "FLOAT64"
-                    else:
-                        column_defs.append(f"{col} STRING(255)")
-                        column_types[col] = "STRING"
-            
-            # Add primary key constraint
-            primary_key = ") PRIMARY KEY (id"
-        
-        # Create DDL statement
-        columns_str = ", ".join(column_defs)
-        create_table_ddl = f"CREATE TABLE {table_name} ({columns_str}{primary_key})"
+        if table_state is None:
+            try:
+                if table_exists(database, table_name):
+                    print(f"Table {table_name} exists, deleting...")
+                    ddl_statement = f"DROP TABLE {table_name}"
+                    operation = database.update_ddl([ddl_statement])
+                    operation.result()
+                    print(f"Table {table_name} deleted")
+            except Exception as e:
+                print(f"Error checking or deleting table {table_name}: {e}")
         
-        # Use database object directly to execute DDL
-        operation = database.update_ddl([create_table_ddl])
-        operation.result()
-        print(f"Created table {table_name}")
+        _, column_types, _, create_table_ddl = get_table_schema(df, table_name)
         
-        # Ensure data type matches table definition
-        for col in df.columns:
-            if column_types.get(col) == "STRING":
-                df[col] = df[col].astype('string')
-            elif column_types.get(col) == "FLOAT64":
-                try:
-                    df[col] = df[col].astype('float64')
-                except:
-                    pass
-            elif column_types.get(col) == "BOOL":
-                try:
-                    df[col] = df[col].astype('bool')
-                except:
-                    # If conversion fails, use 0 and non-0 values
-                    df[col] = df[col].astype('int64').astype('bool')
+        if table_state is None:
+            # Use database object directly to execute DDL
+            operation = database.update_ddl([create_table_ddl])
+            operation.result()
+            print(f"Created table {table_name}")
+
+            if checkpoint is not None:
+                table_state = {
+                    "fingerprint": fingerprint,
+                    "batch_size": batch_size,
+                    "total_batches": total_batches,
+                    "last_committed_batch": -1,
+                    "completed": False
+                }
+                checkpoint["tables"][table_name] = table_state
+                save_checkpoint(checkpoint)
+        
+        df = coerce_column_types(df, column_types)
         
         # Prepare data for insertion
-        # Spanner requires data in list format
+        # Rows of already committed batches are not encoded again
         columns = list(df.columns)
-        data = []
-        for _, row in df.iterrows():
-            row_data = []
-            for col in columns:
-                val = row[col]
-                # Ensure value matches column type
-                if column_types.get(col) == "STRING" and not isinstance(val, str):
-                    val = str(val)
-                # Boolean values remain unchanged, Spanner API will handle correctly
-                row_data.append(val)
-            data.append(row_data)
+        start_row = start_batch * batch_size
+        data = encode_rows(df.iloc[start_row:], column_types)
         
-        # Insert data in batches to avoid exceeding Spanner limit
-        # Calculate number of changes per record (number of columns)
-        mutations_per_row = len(columns)
-        # Spanner limit each transaction to at most 80000 changes
-        max_mutations = 80000
-        # Calculate maximum batch size
-        batch_size = max(1, max_mutations // mutations_per_row)
-        
-        total_rows = len(data)
-        for i in range(0, total_rows, batch_size):
+        for batch_index in range(start_batch, total_batches):
+            i = batch_index * batch_size
             end_idx = min(i + batch_size, total_rows)
-            batch_data = data[i:end_idx]
+            batch_data = data[i - start_row:end_idx - start_row]
             
-            print(f"Inserting batch {i//batch_size + 1}/{(total_rows + batch_size - 1)//batch_size} " 
+            print(f"Inserting batch {batch_index + 1}/{total_batches} " 
                   f"({i} to {end_idx-1} of {total_rows} rows)")
             
+            start = time.perf_counter()
             with database.batch() as batch:
-                batch.insert(
-                    table=table_name,
-                    columns=columns,
-                    values=batch_data
-                )
+                if resuming and batch_index == start_batch:
+                    # The boundary batch may have been committed before the checkpoint
+                    # was written, so it is replayed idempotently
+                    batch.insert_or_update(
+                        table=table_name,
+                        columns=columns,
+                        values=batch_data
+                    )
+                else:
+                    batch.insert(
+                        table=table_name,
+                        columns=columns,
+                        values=batch_data
+                    )
+            if latencies is not None:
+                latencies.append(time.perf_counter() - start)
+
+            if checkpoint is not None:
+                table_state["last_committed_batch"] = batch_index
+                save_checkpoint(checkpoint)
+
+        if checkpoint is not None:
+            table_state["completed"] = True
+            save_checkpoint(checkpoint)
         
         print(f"Loaded {len(df)} rows into {table_name}")
         print(f"Table schema for {table_name}:")
@@ -336,7 +494,199 @@ def load_csv_to_spanner(database, df, table_name):
         raise
 
 
-def create_graph(database):
+def get_existing_columns(database, table_name):
+    """Read column types of an existing table, empty if the table does not exist"""
+    with database.snapshot() as snapshot:
+        results = snapshot.execute_sql(
+            f"SELECT column_name, spanner_type FROM INFORMATION_SCHEMA.COLUMNS "
+            f"WHERE table_schema = '' AND table_name = '{table_name}'"
+        )
+        return {row[0]: row[1] for row in results}
+
+def read_table(database, table_name, columns):
+    """Read all rows of a table in bulk through a read-only snapshot"""
+    with database.snapshot() as snapshot:
+        results = snapshot.read(table=table_name, columns=columns, keyset=spanner.KeySet(all_=True))
+        return pd.DataFrame([list(row) for row in results], columns=columns)
+
+def row_hashes(df, column_types):
+    """Vectorized row fingerprints, normalized so local and Spanner values hash alike"""
+    normalized = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        col_type = column_types.get(col)
+        if col_type == "TIMESTAMP":
+            normalized[col] = pd.to_datetime(df[col], utc=True).astype('datetime64[ns, UTC]')
+        elif col_type in ["NUMERIC", "FLOAT64"]:
+            normalized[col] = df[col].astype('float64')
+        elif col_type == "INT64":
+            normalized[col] = df[col].astype('int64')
+        elif col_type == "BOOL":
+            normalized[col] = df[col].astype('bool')
+        else:
+            normalized[col] = df[col].astype('string')
+    return pd.util.hash_pandas_object(normalized, index=False).values
+
+def commit_mutations(database, table_name, columns, rows, batch_size, operation, concurrency=1, latencies=None):
+    """Commit insert/update rows or delete keys in batches below the mutation limit.
+    Batches are independent, so several can be committed in parallel. Commit latencies
+    in seconds are appended to latencies if given."""
+    total_rows = len(rows)
+
+    def commit(i):
+        batch_data = rows[i:i + batch_size]
+        print(f"{operation.capitalize()} batch {i//batch_size + 1}/{(total_rows + batch_size - 1)//batch_size} "
+              f"({len(batch_data)} rows) in {table_name}")
+        start = time.perf_counter()
+        with database.batch() as batch:
+            if operation == "delete":
+                batch.delete(table=table_name, keyset=spanner.KeySet(keys=batch_data))
+            elif operation == "update":
+                batch.update(table=table_name, columns=columns, values=batch_data)
+            else:
+                batch.insert(table=table_name, columns=columns, values=batch_data)
+        if latencies is not None:
+            latencies.append(time.perf_counter() - start)
+
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(commit, range(0, total_rows, batch_size)))
+    else:
+        for i in range(0, total_rows, batch_size):
+            commit(i)
+
+def sync_table(database, df, table_name):
+    """Apply only the inserts, updates and deletes that make a table match df.
+    Returns False when the table is missing or its schema changed and it must be reloaded."""
+    try:
+        column_defs, column_types, key_columns, _ = get_table_schema(df, table_name)
+        expected_columns = {col: col_type for col, col_type, _ in column_defs}
+        if get_existing_columns(database, table_name) != expected_columns:
+            print(f"Schema of {table_name} changed or table missing, reloading")
+            return False
+
+        df = coerce_column_types(df, column_types)
+        columns = list(df.columns)
+        existing = coerce_column_types(read_table(database, table_name, columns), column_types)
+        print(f"Read {len(existing)} existing rows from {table_name}")
+
+        # Compare key and row fingerprints of local and existing rows
+        local = df[key_columns].copy()
+        local['row_hash'] = row_hashes(df, column_types)
+        local['row_position'] = range(len(df))
+        remote = existing[key_columns].copy()
+        remote['row_hash'] = row_hashes(existing, column_types)
+        diff = local.merge(remote, on=key_columns, how='outer', suffixes=('', '_existing'), indicator=True)
+
+        inserted = diff[diff['_merge'] == 'left_only']
+        updated = diff[(diff['_merge'] == 'both') & (diff['row_hash'] != diff['row_hash_existing'])]
+        deleted = diff[diff['_merge'] == 'right_only']
+        print(f"Sync {table_name}: {len(inserted)} inserts, {len(updated)} updates, {len(deleted)} deletes")
+
+        batch_size = get_batch_size(columns)
+        insert_rows = encode_rows(df.iloc[inserted['row_position'].astype('int64')], column_types)
+        update_rows = encode_rows(df.iloc[updated['row_position'].astype('int64')], column_types)
+        delete_keys = deleted[key_columns].astype(object).values.tolist()
+        commit_mutations(database, table_name, columns, delete_keys, batch_size, "delete")
+        commit_mutations(database, table_name, columns, update_rows, batch_size, "update")
+        commit_mutations(database, table_name, columns, insert_rows, batch_size, "insert")
+        return True
+    except Exception as e:
+        print(f"Error syncing data to {table_name}: {e}")
+        raise
+
+def get_rollup_files():
+    """Rollup tables written by src/gen_rollups.py, one per entity and granularity"""
+    if not os.path.isdir(processed_data_dir):
+        return []
+    return sorted(name for name in os.listdir(processed_data_dir) if name.startswith('Rollup_') and name.endswith('.csv'))
+
+def get_derived_views():
+    """SQL file and replaced tables of each enabled derived mode"""
+    derived_views = []
+    if derivedEdges:
+        derived_views.append(('derived_edges.sql', derived_edge_tables))
+    if derivedPii:
+        derived_views.append(('derived_pii.sql', derived_pii_tables))
+    return derived_views
+
+def create_derived_views(database):
+    """Create the views of the derived modes (derived_edges.sql, derived_pii.sql) in place of their tables"""
+    for sql_file, table_names in get_derived_views():
+        sql_path = os.path.join(os.path.dirname(__file__), sql_file)
+        with open(sql_path, 'r', encoding='utf-8', newline='\n') as file:
+            statements = [statement.strip() for statement in file.read().split(';') if statement.strip()]
+        operation = database.update_ddl(statements)
+        operation.result()
+        print(f"Created derived views: {', '.join(table_names)}")
+
+def drop_derived_views(database):
+    """Drop the views of the derived modes, so the tables they read can be recreated"""
+    derived_tables = [table for _, table_names in get_derived_views() for table in table_names]
+    with database.snapshot() as snapshot:
+        results = snapshot.execute_sql(
+            "SELECT table_name FROM information_schema.views WHERE table_schema = ''"
+        )
+        views = [row[0] for row in results if row[0] in derived_tables]
+    if views:
+        operation = database.update_ddl([f"DROP VIEW {view}" for view in views])
+        operation.result()
+        print(f"Dropped derived views: {', '.join(views)}")
+
+def graph_exists(database):
+    """Check whether the property graph is defined"""
+    with database.snapshot() as snapshot:
+        results = snapshot.execute_sql(
+            f"SELECT property_graph_name FROM INFORMATION_SCHEMA.PROPERTY_GRAPHS "
+            f"WHERE property_graph_name = '{graphName}'"
+        )
+        return len(list(results)) > 0
+
+def drop_missing_elements(sql, tables):
+    """Remove the node and edge tables that were not loaded from the graph, and the edge tables
+    that reference a removed node table (e.g. Ring and In_Ring before src/gen_rings.py has run)"""
+    output, elements = [], None
+    for line in sql.split('\n'):
+        if elements is None:
+            output.append(line)
+            if 'TABLES' in line:
+                elements = []
+        elif line.strip().startswith(')'):
+            kept = [element for element in elements
+                    if element[0].strip().split('.')[-1] in tables
+                    and all(table in tables for table in re.findall(r'REFERENCES (\w+)', '\n'.join(element)))]
+            for i, element in enumerate(kept):
+                element[-1] = element[-1].rstrip(',') + (',' if i < len(kept) - 1 else '')
+                output.extend(element)
+            output.append(line)
+            elements = None
+        elif re.fullmatch(r'[\w.]+', line.strip()):
+            # An element starts with its table name, its clauses follow on their own lines
+            elements.append([line])
+        else:
+            elements[-1].append(line)
+    return '\n'.join(output)
+
+def get_graph_sql(sql, tables):
+    """Fit graph_view.sql to the loaded tables, and drop the properties the loaded clients.csv/merchants.csv
+    lack from the Client and Merchant property lists: the feature columns of src/gen_features.py are
+    only there after it has run"""
+    sql = drop_missing_elements(sql, tables)
+    for label, csv_file in [('Client', 'clients.csv'), ('Merchant', 'merchants.csv')]:
+        if label not in tables:
+            continue
+        file_path = os.path.join(processed_data_dir, csv_file)
+        if not os.path.exists(file_path):
+            file_path = os.path.join(raw_data_dir, csv_file)
+        columns = {col.lower() for col in pd.read_csv(file_path, nrows=0).columns}
+
+        def keep_loaded(match):
+            properties = [prop.strip() for prop in match.group(2).split(',')]
+            return match.group(1) + ', '.join(prop for prop in properties if prop in columns) + ')'
+
+        sql = re.sub(rf'(LABEL {label}\s+PROPERTIES \()([^)]*)\)', keep_loaded, sql)
+    return sql
+
+def create_graph(database, tables):
     """Create property graph view in Spanner database"""
     try:
 
@@ -354,6 +704,7 @@ def create_graph(database):
 
         ## replace GRAPH graph_view name to the variable
         sql = sql.replace('graph_view', f'{graphName}')
+        sql = get_graph_sql(sql, tables)
 
         ## remove last ;
         if sql.strip().endswith(';'):
@@ -369,33 +720,23 @@ def create_graph(database):
         print(f"Error creating Property Graph({graphName}): {e}", file=sys.stderr)
         raise
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import PaySim data to Spanner")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--resume', action='store_true',
+                      help="Resume an interrupted import from the checkpoint file instead of reloading all tables")
+    mode.add_argument('--sync', action='store_true',
+                      help="Apply only inserted, updated and deleted rows and keep the property graph in place")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     try:
         print("Starting import PaySim data to Spanner...")
         
         # Initialize Spanner client
         print("1. Initializing Spanner client...")
-        auth_keyfile_path = os.path.join(os.path.dirname(__file__), google_auth_keyfile)
-        if not os.path.exists(auth_keyfile_path):
-            raise FileNotFoundError(
-                f"Service account key file not found: {auth_keyfile_path}\n"
-                "Please ensure the google_auth_keyfile path in config.json is correct."
-            )
-        authJSON = json.load(open(auth_keyfile_path))
-        project_id = authJSON.get("project_id")
-        emulator_host = os.getenv("SPANNER_EMULATOR_HOST") or authJSON.get("emulator_host")
-        if emulator_host:
-            print(f"Connecting to Spanner emulator at {emulator_host} for project: {project_id}")
-            client = spanner.Client(project=project_id, 
-                                    credentials=AnonymousCredentials(),
-                                    client_options={"api_endpoint": emulator_host}
-                                    )
-            print(f"Connected to Spanner emulator: {client.project}")
-        else:
-            print(f"Connecting to GCP Spanner project: {project_id}")
-            credentials = service_account.Credentials.from_service_account_file(auth_keyfile_path)
-            client = spanner.Client(credentials=credentials)
-            print(f"Connected to GCP project: {client.project}")
+        client = get_spanner_client(os.path.join(os.path.dirname(__file__), google_auth_keyfile))
 
         # Create Spanner instance and database
         print("2. Setting up Spanner instance and database...")
@@ -406,14 +747,28 @@ def main():
             print(f"Error setting up Spanner instance and database: {e}")
             raise
 
-        # First delete all existing tables
-        print("3. Deleting all existing tables and views...")
-        try:
-            database = delete_all_tables(database)
-            print("Database cleanup completed")
-        except Exception as e:
-            print(f"Error cleaning database: {e}")
-            print("Continuing with data import...")
+        if args.sync:
+            # Tables and graph stay available, only changed rows are written
+            print("3. Syncing existing tables in place...")
+            checkpoint = None
+        elif args.resume:
+            # Keep loaded tables, only the graph is dropped so changed tables can be recreated
+            print("3. Resuming import from checkpoint...")
+            checkpoint = load_checkpoint()
+            operation = database.update_ddl([f'''DROP PROPERTY GRAPH IF EXISTS `{graphName}`'''])
+            operation.result()
+            drop_derived_views(database)
+        else:
+            # First delete all existing tables
+            print("3. Deleting all existing tables and views...")
+            try:
+                database = delete_all_tables(database)
+                print("Database cleanup completed")
+            except Exception as e:
+                print(f"Error cleaning database: {e}")
+                print("Continuing with data import...")
+            checkpoint = new_checkpoint()
+            save_checkpoint(checkpoint)
 
         # Define files to load
         files_to_load = [
@@ -425,6 +780,8 @@ def main():
             ("emails.csv", "Email", False),
             ("phonenumbers.csv", "PhoneNumber", False),
             ("ssns.csv", "SSN", False),
+            ("rings.csv", "Ring", False),
+            ("flow_patterns.csv", "FlowPattern", False),
             
             # Relationship tables
             ("Client_Perform_Transaction.csv", "Client_Perform_Transaction", False),
@@ -433,26 +790,49 @@ def main():
             ("Transaction_To_Bank.csv", "Transaction_To_Bank", False),
             ("Has_Email.csv", "Has_Email", False),
             ("Has_Phonenumber.csv", "Has_PhoneNumber", False),
-            ("Has_SSN.csv", "Has_SSN", False)
+            ("Has_SSN.csv", "Has_SSN", False),
+            ("In_Ring.csv", "In_Ring", False),
+            ("In_Flow.csv", "In_Flow", False)
         ]
+        # Time-bucketed aggregates, loaded when src/gen_rollups.py has written them
+        files_to_load += [(csv_file, os.path.splitext(csv_file)[0], False) for csv_file in get_rollup_files()]
+        # Views over Transaction and Client replace the tables of the derived modes
+        derived_tables = [table for _, table_names in get_derived_views() for table in table_names]
+        files_to_load = [entry for entry in files_to_load if entry[1] not in derived_tables]
 
         print("4. Importing data files into Spanner...")
 
-        # Process and load all files
+        # Process and load all files, the graph covers the loaded tables and the derived views
+        graph_dropped = False
+        loaded_tables = list(derived_tables)
         for csv_file, table_name, is_transaction in files_to_load:
             print(f"\nProcessing {csv_file} -> {table_name}")
             # Prepare data
             df = prepare_data(csv_file, is_transaction)
             if df is not None:
+                loaded_tables.append(table_name)
+                if args.sync:
+                    if sync_table(database, df.copy(), table_name):
+                        continue
+                    # A table with a changed schema is rebuilt, which needs the graph dropped first
+                    if not graph_dropped:
+                        operation = database.update_ddl([f'''DROP PROPERTY GRAPH IF EXISTS `{graphName}`'''])
+                        operation.result()
+                        drop_derived_views(database)
+                        graph_dropped = True
                 # Load to Spanner
-                load_csv_to_spanner(database, df, table_name)
+                load_csv_to_spanner(database, df, table_name, checkpoint)
                 
         print("\n All data successfully imported to Spanner!")
 
-        print("5. Creating Property Graph view...")
-        
-        # # Create property graph 
-        create_graph(database)
+        if args.sync and not graph_dropped and graph_exists(database):
+            print("5. Schema unchanged, keeping existing Property Graph")
+        else:
+            create_derived_views(database)
+            print("5. Creating Property Graph view...")
+            
+            # # Create property graph 
+            create_graph(database, loaded_tables)
 
         print("\n PaySim data import and graph creation completed successfully!")
 
@@ -0,0 +1,209 @@
+# Replay prepared transactions into an imported Spanner graph as live single-event writes, for write-load testing
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+import import_paysim
+from import_paysim import instanceName, databaseName, google_auth_keyfile, typedSchema, derivedEdges
+from spanner_connection import get_spanner_client, get_database
+
+# Edge tables written with every transaction: (table, destination types, destination key column)
+edge_tables = [
+    ("Transaction_To_Client", ['CLIENT', 'MULE'], 'client_id'),
+    ("Transaction_To_Merchant", ['MERCHANT'], 'merchant_id'),
+    ("Transaction_To_Bank", ['BANK'], 'bank_id'),
+]
+
+def encode_table(df, table_name):
+    """Columns and mutation rows of a prepared frame, typed like import_paysim.py loads them"""
+    _, column_types, _, _ = import_paysim.get_table_schema(df, table_name)
+    df = import_paysim.coerce_column_types(df, column_types)
+    return list(df.columns), import_paysim.encode_rows(df, column_types)
+
+def prepare_events(start_step=None, limit=None):
+    """Mutations of every transaction in globalstep order: its Transaction row and, unless the edges
+    are derived views, its PERFORMS and TO_* edge rows. Returns (events, event times in seconds)."""
+    df = import_paysim.prepare_data('transactions_cleaned.csv', is_transaction=True)
+    if df is None:
+        raise ValueError("Could not prepare transactions_cleaned.csv")
+    df = df.sort_values(by=['globalstep']).reset_index(drop=True)
+    if start_step is not None:
+        df = df[df['globalstep'] >= start_step].reset_index(drop=True)
+    if limit:
+        df = df.head(limit)
+
+    columns, rows = encode_table(df.copy(), "Transaction")
+    events = [[("Transaction", columns, [row])] for row in rows]
+    if not derivedEdges:
+        performs = pd.DataFrame({
+            'client_id': df['idorig'].astype('string'),
+            'transaction_id': df['id'],
+            'timestamp': df['timestamp'],
+        })
+        edge_frames = [("Client_Perform_Transaction", performs, np.arange(len(df)))]
+        for table_name, types, id_column in edge_tables:
+            positions = np.flatnonzero(df['typedest'].isin(types).to_numpy())
+            destinations = df.iloc[positions].reset_index(drop=True)
+            edge = pd.DataFrame({
+                'transaction_id': destinations['id'],
+                id_column: destinations['iddest'].astype('string'),
+                'timestamp': destinations['timestamp'],
+            })
+            edge_frames.append((table_name, edge, positions))
+        for table_name, edge, positions in edge_frames:
+            columns, rows = encode_table(edge, table_name)
+            for position, row in zip(positions, rows):
+                events[position].append((table_name, columns, [row]))
+
+    times = pd.to_datetime(df['timestamp'], utc=True)
+    seconds = (times - times.iloc[0]).dt.total_seconds().to_numpy() if len(df) else np.array([])
+    print(f"Prepared {len(events)} transaction events from globalstep "
+          f"{df['globalstep'].iloc[0] if len(df) else '-'} to {df['globalstep'].iloc[-1] if len(df) else '-'}")
+    return events, seconds
+
+def get_schedule(seconds, rate=None, speedup=None):
+    """Due time of every event after the start: a fixed rate, the original spacing compressed by
+    speedup, or all at once (as fast as the writers go)"""
+    if rate:
+        return np.arange(len(seconds)) / rate
+    if speedup:
+        return seconds / speedup
+    return np.zeros(len(seconds))
+
+def write_event(database, mutations, mode):
+    """Commit one transaction event in its own read-write transaction. Returns the commit latency."""
+    def write(transaction):
+        for table_name, columns, rows in mutations:
+            getattr(transaction, mode)(table=table_name, columns=columns, values=rows)
+
+    start = time.perf_counter()
+    database.run_in_transaction(write)
+    return time.perf_counter() - start
+
+def latency_summary(latencies):
+    """Percentiles in milliseconds"""
+    latencies_ms = np.array(latencies) * 1000 if len(latencies) else np.zeros(1)
+    return {
+        "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max": round(float(latencies_ms.max()), 3),
+    }
+
+def replay(database, events, schedule, workers=8, mode="insert_or_update", report_interval=5.0):
+    """Dispatch the events at their due times to a pool of writer threads and measure the commits.
+    At most 2 * workers events are in flight; when the writers fall behind, the dispatcher waits
+    and the schedule lag grows instead of an unbounded queue."""
+    latencies = []
+    errors = []
+    lags = np.zeros(len(events))
+    slots = threading.Semaphore(workers * 2)
+    lock = threading.Lock()
+
+    def on_done(future):
+        slots.release()
+        try:
+            latency = future.result()
+            with lock:
+                latencies.append(latency)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    print(f"Replaying {len(events)} events with {workers} writers ({mode})")
+    start = time.perf_counter()
+    next_report = start + report_interval
+    reported = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, mutations in enumerate(events):
+            delay = start + schedule[i] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            slots.acquire()
+            now = time.perf_counter()
+            lags[i] = now - start - schedule[i]
+            executor.submit(write_event, database, mutations, mode).add_done_callback(on_done)
+
+            if now >= next_report:
+                with lock:
+                    recent = latencies[reported:]
+                    reported = len(latencies)
+                summary = latency_summary(recent)
+                print(f"  {now - start:.0f}s: {len(latencies)} committed, {len(recent) / report_interval:.1f} TPS, "
+                      f"p50 {summary['p50']}ms, p99 {summary['p99']}ms, lag {lags[i] * 1000:.0f}ms, "
+                      f"{len(errors)} errors")
+                next_report = now + report_interval
+    elapsed = time.perf_counter() - start
+
+    target_seconds = float(schedule[-1]) if len(schedule) else 0.0
+    report = {
+        "events": len(events),
+        "committed": len(latencies),
+        "errors": len(errors),
+        "workers": workers,
+        "mode": mode,
+        "elapsed_seconds": round(elapsed, 3),
+        "target_tps": round(len(events) / target_seconds, 1) if target_seconds else None,
+        "achieved_tps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "commit_latency_ms": latency_summary(latencies),
+        "schedule_lag_ms": latency_summary(np.maximum(lags, 0)),
+    }
+    if errors:
+        print(f"First error: {errors[0]}")
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay transactions_cleaned.csv into the imported Spanner graph, "
+                                                 "one small read-write transaction per event")
+    parser.add_argument('--rate', type=float, help="Events per second")
+    parser.add_argument('--speedup', type=float,
+                        help="Replay at the original event spacing compressed by this factor, e.g. 60 for 1 hour per minute")
+    parser.add_argument('--workers', type=int, default=8, help="Writer threads (and session pool size)")
+    parser.add_argument('--start-step', type=int, help="First globalstep to replay")
+    parser.add_argument('--limit', type=int, help="Number of events to replay")
+    parser.add_argument('--mode', choices=['insert_or_update', 'insert'], default='insert_or_update',
+                        help="insert_or_update can replay transactions the import already loaded; "
+                             "insert fails on existing keys")
+    parser.add_argument('--report-interval', type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--fake', action='store_true', help="Write to an in-memory fake database instead of Spanner")
+    parser.add_argument('--fake-commit-latency-ms', type=float, default=5.0,
+                        help="Simulated commit latency of the fake database")
+    args = parser.parse_args()
+    if args.rate and args.speedup:
+        parser.error("--rate and --speedup are mutually exclusive")
+    return args
+
+def main():
+    args = parse_args()
+    events, seconds = prepare_events(args.start_step, args.limit)
+    schedule = get_schedule(seconds, args.rate, args.speedup)
+
+    if args.fake:
+        from fake_spanner import FakeDatabase
+        database = FakeDatabase(commit_latency=args.fake_commit_latency_ms / 1000)
+    else:
+        # SPANNER_EMULATOR_HOST points the client at the local emulator
+        client = get_spanner_client(os.path.join(os.path.dirname(__file__), google_auth_keyfile))
+        database = get_database(client.instance(instanceName), databaseName, pool_size=args.workers)
+
+    print(f"Replaying into database '{databaseName}' ({'typed' if typedSchema else 'string'} schema"
+          f"{', derived edges' if derivedEdges else ''})")
+    report = replay(database, events, schedule, args.workers, args.mode, args.report_interval)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.output}")
+    sys.exit(1 if report["errors"] else 0)
+
+if __name__ == "__main__":
+    main()
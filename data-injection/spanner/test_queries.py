@@ -1,12 +1,12 @@
-import json
 import os
 import sys
-from pathlib import Path
-from google.cloud import spanner
-from google.oauth2 import service_account
-from google.auth.credentials import AnonymousCredentials
 from dotenv import load_dotenv
 
+# Shared Spanner client and session pool setup
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+from spanner_connection import get_spanner_client, get_database
+from fraud_queries import GraphDialect, run_spanner_query, run_workloads
+
 #automatically load .env file
 load_dotenv()
 
@@ -18,6 +18,13 @@ if not instanceName:
 databaseName = os.getenv('DATABASE_NAME') or "paysim"
 graphName = os.getenv('GRAPH_NAME') or "graph_view"
 google_auth_keyfile = os.getenv('GOOGLE_AUTH_KEYFILE') or 'google_auth_keyfile.json'
+typedSchema = (os.getenv('TYPED_SCHEMA') or 'false').strip().lower() in ['1', 'true', 'yes']
+
+# Time-range literals must match the timestamp column type
+if typedSchema:
+    windowStart, windowEnd = "TIMESTAMP '2024-01-01T00:00:00Z'", "TIMESTAMP '2024-01-02T00:00:00Z'"
+else:
+    windowStart, windowEnd = "'2024-01-01T00:00:00'", "'2024-01-02T00:00:00'"
 
 
 def run_test_query(query, database):
@@ -38,25 +45,10 @@ def run_test_query(query, database):
 def main():
     try:
         # Initialize Spanner client
-        auth_keyfile_path =  os.path.join(os.path.dirname(__file__), 'google_auth_keyfile.json')
-        authJSON = json.load(open(auth_keyfile_path))
-        project_id = authJSON.get("project_id")
-        emulator_host = os.getenv("SPANNER_EMULATOR_HOST") or authJSON.get("emulator_host")
-        if emulator_host:
-            print(f"Connecting to Spanner emulator at {emulator_host} for project: {project_id}")
-            client = spanner.Client(project=project_id, 
-                                    credentials=AnonymousCredentials(),
-                                    client_options={"api_endpoint": emulator_host}
-                                    )
-            print(f"Connected to Spanner emulator: {client.project}")
-        else:
-            print(f"Connecting to GCP Spanner project: {project_id}")
-            credentials = service_account.Credentials.from_service_account_file(auth_keyfile_path)
-            client = spanner.Client(credentials=credentials)
-            print(f"Connected to GCP project: {client.project}")
+        client = get_spanner_client(os.path.join(os.path.dirname(__file__), google_auth_keyfile))
         
         instance = client.instance(instanceName)
-        database = instance.database(databaseName)
+        database = get_database(instance, databaseName)
         
         success = run_test_query(f'''
 GRAPH {graphName}
@@ -74,11 +66,23 @@ RETURN TO_JSON(n) as n_node, TO_JSON(r) as r_relationship, TO_JSON(m) as m_node
 LIMIT 1
 ''', database)
         
+        success = run_test_query(f'''
+GRAPH {graphName}
+MATCH
+  (n:Client)-[r:PERFORMS]->(m:Transaction)
+WHERE r.timestamp >= {windowStart} AND r.timestamp < {windowEnd}
+RETURN COUNT(m) as first_day_transactions
+''', database)
+
         success = run_test_query(f'''
 SELECT count(*) as client_count
 FROM Client 
 ''', database)
         
+        # Fraud workloads of the query benchmark (data-injection/benchmark/benchmark_queries.py), run once
+        print("\nFraud workload queries:")
+        success = run_workloads(lambda query: run_spanner_query(database, query), GraphDialect("typed", typedSchema), graphName) and success
+
         sys.exit(0 if success else 1)
         
     except Exception as e:
@@ -0,0 +1,154 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+import time
+
+from validate_data import node_tables, relationship_files, read_table, data_dir, raw_data_dir, processed_data_dir
+from graph_csr import open_graph, csr_dir
+
+# Node label of each transaction destination type
+destination_labels = {'CLIENT': 'client', 'MULE': 'client', 'MERCHANT': 'merchant', 'BANK': 'bank'}
+
+def client_file_path(file_name):
+    """clients.csv/merchants.csv with the feature columns of gen_features.py if present, else the raw file"""
+    processed_path = os.path.join(processed_data_dir, file_name)
+    return processed_path if os.path.exists(processed_path) else os.path.join(raw_data_dir, file_name)
+
+def seed_nodes(graph, fraud=False, client_ids=None, start_time=None, end_time=None):
+    """Node ids of the seed clients and transactions"""
+    seeds = []
+    if fraud:
+        clients = read_table(client_file_path('clients.csv'))
+        fraud_ids = clients.loc[clients['isfraud'].str.lower().isin(['true', '1']), 'id']
+        seeds.append(node_ids(graph, 'client', fraud_ids))
+        print(f"Seeds: {len(seeds[-1])} fraudulent clients")
+    if client_ids:
+        seeds.append(node_ids(graph, 'client', pd.Series(client_ids)))
+        print(f"Seeds: {len(seeds[-1])} of {len(client_ids)} listed clients")
+    if start_time or end_time:
+        transactions = read_table(os.path.join(processed_data_dir, 'transactions_cleaned.csv'))
+        timestamps = pd.to_datetime(transactions['timestamp'])
+        in_window = pd.Series(True, index=transactions.index)
+        if start_time:
+            in_window &= timestamps >= pd.Timestamp(start_time)
+        if end_time:
+            in_window &= timestamps < pd.Timestamp(end_time)
+        seeds.append(node_ids(graph, 'transaction', transactions.loc[in_window, 'globalstep']))
+        print(f"Seeds: {len(seeds[-1])} transactions in the time window")
+    if not seeds:
+        raise SystemExit("No seeds: pass --fraud, --clients, --clients-file, --start or --end")
+    return np.unique(np.concatenate(seeds))
+
+def node_ids(graph, label, keys):
+    """Node ids of the keys that are in the graph"""
+    if label not in graph.labels:
+        return np.array([], dtype=np.int64)
+    label_keys = graph.keys[label]
+    keys = keys.astype(str).to_numpy(dtype=str)
+    positions = np.searchsorted(label_keys, keys)
+    found = positions < len(label_keys)
+    found[found] = label_keys[positions[found]] == keys[found]
+    return positions[found].astype(np.int64) + graph.label_ranges[label][0]
+
+def kept_keys(graph, nodes):
+    """Keys of the kept nodes per label"""
+    keys = {}
+    for label in graph.labels:
+        start, end = graph.label_ranges[label]
+        label_nodes = nodes[(nodes >= start) & (nodes < end)]
+        keys[label] = pd.Index(np.asarray(graph.keys[label])[label_nodes - start])
+    return keys
+
+def close_transactions(keys):
+    """Add the sender and receiver of every kept transaction, so no transaction edge, written or derived
+    from the transaction columns under --derived-edges, points at a node outside the subgraph"""
+    transactions = read_table(os.path.join(processed_data_dir, 'transactions_cleaned.csv'))
+    transactions = transactions[transactions['globalstep'].isin(keys.get('transaction', pd.Index([])))]
+    endpoints = {'client': [transactions['idorig']]}
+    for typedest, label in destination_labels.items():
+        endpoints.setdefault(label, []).append(transactions.loc[transactions['typedest'] == typedest, 'iddest'])
+    for label, columns in endpoints.items():
+        before = len(keys.get(label, []))
+        keys[label] = keys.get(label, pd.Index([])).union(pd.Index(pd.concat(columns).unique()))
+        if len(keys[label]) > before:
+            print(f"Added {len(keys[label]) - before} {label} nodes at the ends of kept transactions")
+    return keys
+
+def write_table(df, source_path, output_dir):
+    """Write the rows to the same path relative to output_dir as the source file has to data/"""
+    output_path = os.path.join(output_dir, os.path.relpath(source_path, data_dir))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    df.to_csv(output_path, index=False)
+    return output_path
+
+def write_subgraph(keys, output_dir):
+    """Write the kept rows of every node and relationship table. Relationships are kept only when
+    both of their nodes are, so the subgraph has the referential integrity of the full data."""
+    node_files = [(label, os.path.join(table_dir, file_name), key_column)
+                  for label, (table_dir, file_name, key_column) in node_tables.items()]
+    # Feature-enriched copies are loaded instead of the raw files when they exist
+    for label, file_name in [('client', 'clients.csv'), ('merchant', 'merchants.csv')]:
+        if os.path.exists(os.path.join(processed_data_dir, file_name)):
+            node_files.append((label, os.path.join(processed_data_dir, file_name), 'id'))
+
+    for label, file_path, key_column in node_files:
+        if not os.path.exists(file_path):
+            continue
+        df = read_table(file_path)
+        kept = df[df[key_column].isin(keys.get(label, pd.Index([])))]
+        write_table(kept, file_path, output_dir)
+        print(f"{os.path.relpath(file_path, data_dir)}: kept {len(kept)} of {len(df)} rows")
+
+    for file_name in relationship_files:
+        file_path = os.path.join(processed_data_dir, file_name)
+        if not os.path.exists(file_path):
+            continue
+        df = read_table(file_path)
+        # The first *_id column is the source of the edge, the second its destination
+        source_column, target_column = [col for col in df.columns if col.endswith('_id')][:2]
+        source_keys = keys.get(source_column[:-len('_id')], pd.Index([]))
+        target_keys = keys.get(target_column[:-len('_id')], pd.Index([]))
+        kept = df[df[source_column].isin(source_keys) & df[target_column].isin(target_keys)]
+        write_table(kept, file_path, output_dir)
+        print(f"{file_name}: kept {len(kept)} of {len(df)} rows")
+
+def extract_subgraph(output_dir, hops=2, fraud=False, client_ids=None, start_time=None, end_time=None,
+                     edge_types=None, rebuild=False):
+    """Write the k-hop neighborhood of the seeds as a reduced copy of data/raw and data/processed"""
+    start = time.perf_counter()
+    graph = open_graph(rebuild)
+
+    seeds = seed_nodes(graph, fraud, client_ids, start_time, end_time)
+    reached, _ = graph.k_hop(seeds, hops, 'both', edge_types)
+    nodes = np.union1d(seeds, reached)
+    print(f"{len(nodes)} nodes within {hops} hops of {len(seeds)} seeds")
+
+    keys = close_transactions(kept_keys(graph, nodes))
+    write_subgraph(keys, output_dir)
+    print(f"Wrote the subgraph to {output_dir} in {time.perf_counter() - start:.2f}s")
+    print(f"Import it with DATA_DIR={os.path.abspath(output_dir)}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract the k-hop neighborhood of seed clients or transactions "
+                                                 "as a self-consistent copy of the data, for partial imports")
+    parser.add_argument('--output', default=os.path.join(data_dir, 'subgraph'),
+                        help="Directory of the reduced raw/ and processed/ copies")
+    parser.add_argument('--hops', type=int, default=2, help="Hops from the seeds, in both edge directions")
+    parser.add_argument('--fraud', action='store_true', help="Seed with the clients flagged isfraud")
+    parser.add_argument('--clients', help="Seed with these comma separated client ids")
+    parser.add_argument('--clients-file', help="Seed with the client ids in this file, one per line")
+    parser.add_argument('--start', help="Seed with the transactions at or after this time, e.g. 2024-01-01T00:00:00")
+    parser.add_argument('--end', help="Seed with the transactions before this time")
+    parser.add_argument('--edge-types', help="Comma separated edge types to traverse, e.g. Has_Email,Has_SSN")
+    parser.add_argument('--rebuild', action='store_true', help=f"Rebuild the graph even if {csr_dir} is current")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    client_ids = args.clients.split(',') if args.clients else []
+    if args.clients_file:
+        with open(args.clients_file, 'r', encoding='utf-8') as f:
+            client_ids += [line.strip() for line in f if line.strip()]
+    edge_types = args.edge_types.split(',') if args.edge_types else None
+    extract_subgraph(args.output, args.hops, args.fraud, client_ids, args.start, args.end, edge_types, args.rebuild)
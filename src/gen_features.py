@@ -0,0 +1,134 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+raw_data_dir = os.path.join(data_dir, 'raw')
+processed_data_dir = os.path.join(data_dir, 'processed')
+
+# Feature columns are loaded as node properties, so their names must not end in "id"
+# (key columns) or start with "is" (boolean flags) in the importers
+client_feature_columns = [
+    'out_transactions', 'in_transactions',
+    'outflow_amount', 'inflow_amount',
+    'out_counterparties', 'in_counterparties',
+    'max_hourly_transactions',
+    'shared_email_clients', 'shared_phone_clients', 'shared_ssn_clients',
+]
+merchant_feature_columns = [
+    'in_transactions', 'inflow_amount', 'distinct_clients', 'max_hourly_transactions',
+]
+
+def max_window_counts(keys, times, window_seconds):
+    """Most rows of each key in any window of window_seconds. Rows are sorted by (key, time) and every
+    window start is found with one binary search over all rows, so there is no loop over keys."""
+    codes, uniques = pd.factorize(keys)
+    seconds = times.to_numpy(dtype='datetime64[s]').astype('int64')
+    if len(seconds) == 0:
+        return pd.Series(dtype='int64')
+    seconds = seconds - seconds.min()
+    # Keys are spaced further apart than any window, so a window never reaches into the previous key
+    stride = int(seconds.max()) + window_seconds + 1
+    composite = np.sort(codes.astype('int64') * stride + seconds)
+    window_start = np.searchsorted(composite, composite - window_seconds + 1, side='left')
+    counts = np.arange(len(composite)) - window_start + 1
+    peak = pd.Series(counts).groupby(composite // stride).max()
+    return pd.Series(peak.to_numpy(), index=uniques[peak.index])
+
+def shared_pii_counts(clients, column):
+    """Number of other clients with the same value in a PII column"""
+    values = clients[column].fillna('').astype('string')
+    group_sizes = values.map(values.value_counts())
+    return (group_sizes - 1).where(values != '', 0).astype('int64')
+
+def client_features(clients, transactions, window_seconds):
+    """Transaction aggregates, peak hourly activity and shared-PII counts per client"""
+    outgoing = transactions.groupby('idorig').agg(
+        out_transactions=('globalstep', 'size'),
+        outflow_amount=('amount', 'sum'),
+        out_counterparties=('iddest', 'nunique'),
+    )
+    received = transactions[transactions['typedest'].isin(['CLIENT', 'MULE'])]
+    incoming = received.groupby('iddest').agg(
+        in_transactions=('globalstep', 'size'),
+        inflow_amount=('amount', 'sum'),
+        in_counterparties=('idorig', 'nunique'),
+    )
+    hourly = max_window_counts(transactions['idorig'], transactions['timestamp'], window_seconds)
+
+    features = pd.DataFrame(index=pd.Index(clients['id'].astype('string')))
+    features = features.join(outgoing).join(incoming)
+    features['max_hourly_transactions'] = hourly.reindex(features.index)
+    for column, feature in [('email', 'shared_email_clients'),
+                            ('phonenumber', 'shared_phone_clients'),
+                            ('ssn', 'shared_ssn_clients')]:
+        if column in clients.columns:
+            features[feature] = shared_pii_counts(clients, column).to_numpy()
+        else:
+            features[feature] = 0
+    return finish_features(features, client_feature_columns)
+
+def merchant_features(merchants, transactions, window_seconds):
+    """Payments received, distinct paying clients and peak hourly activity per merchant"""
+    paid = transactions[transactions['typedest'] == 'MERCHANT']
+    incoming = paid.groupby('iddest').agg(
+        in_transactions=('globalstep', 'size'),
+        inflow_amount=('amount', 'sum'),
+        distinct_clients=('idorig', 'nunique'),
+    )
+    hourly = max_window_counts(paid['iddest'], paid['timestamp'], window_seconds)
+
+    features = pd.DataFrame(index=pd.Index(merchants['id'].astype('string')))
+    features = features.join(incoming)
+    features['max_hourly_transactions'] = hourly.reindex(features.index)
+    return finish_features(features, merchant_feature_columns)
+
+def finish_features(features, columns):
+    """Zero-fill entities without transactions and fix the column types"""
+    features = features[columns].fillna(0)
+    for col in columns:
+        if col.endswith('_amount'):
+            features[col] = features[col].astype('float64').round(2)
+        else:
+            features[col] = features[col].astype('int64')
+    return features.reset_index(drop=True)
+
+def read_transactions():
+    columns = ['globalstep', 'idorig', 'iddest', 'typedest', 'amount', 'timestamp']
+    df = pd.read_csv(os.path.join(processed_data_dir, 'transactions_cleaned.csv'), usecols=columns,
+                     dtype={'idorig': 'string', 'iddest': 'string', 'typedest': 'string'})
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    print(f"Read {len(df)} transactions")
+    return df
+
+def write_with_features(file_name, entities, features):
+    """Write the raw entity columns plus the features to data/processed, replacing earlier features"""
+    entities = entities.drop(columns=[col for col in features.columns if col in entities.columns])
+    output = pd.concat([entities.reset_index(drop=True), features], axis=1)
+    output.to_csv(os.path.join(processed_data_dir, file_name), index=False)
+    print(f"Saved {len(output)} rows with {len(features.columns)} features to data/processed/{file_name}")
+    print(output[['id'] + list(features.columns)].head())
+
+def generate_features(window_minutes=60):
+    """Compute client and merchant features and write clients.csv and merchants.csv to data/processed"""
+    window_seconds = window_minutes * 60
+    transactions = read_transactions()
+
+    clients = pd.read_csv(os.path.join(raw_data_dir, 'clients.csv'), dtype={'id': 'string'})
+    clients.columns = [col.lower() for col in clients.columns]
+    write_with_features('clients.csv', clients, client_features(clients, transactions, window_seconds))
+
+    merchants = pd.read_csv(os.path.join(raw_data_dir, 'merchants.csv'), dtype={'id': 'string'})
+    merchants.columns = [col.lower() for col in merchants.columns]
+    write_with_features('merchants.csv', merchants, merchant_features(merchants, transactions, window_seconds))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Materialize per-client and per-merchant fraud features")
+    parser.add_argument('--window-minutes', type=int, default=60,
+                        help="Window of the max_hourly_transactions rolling count")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate_features(args.window_minutes)
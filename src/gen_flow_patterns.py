@@ -0,0 +1,186 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+processed_data_dir = os.path.join(data_dir, 'processed')
+
+# Client -> client transfers, shared with the worker processes by the pool initializer
+g_transfers = None
+
+def read_transfers():
+    """Client -> client transfers from Client_Perform_Transaction and Transaction_To_Client,
+    with the amount and MULE destination flag of each transaction"""
+    transactions = pd.read_csv(os.path.join(processed_data_dir, 'transactions_cleaned.csv'),
+                               usecols=['globalstep', 'idorig', 'iddest', 'amount', 'typedest', 'timestamp'],
+                               dtype={'globalstep': str, 'idorig': str, 'iddest': str})
+    transactions = transactions.rename(columns={'globalstep': 'transaction_id'})
+    performs_path = os.path.join(processed_data_dir, 'Client_Perform_Transaction.csv')
+    to_client_path = os.path.join(processed_data_dir, 'Transaction_To_Client.csv')
+    if os.path.exists(performs_path) and os.path.exists(to_client_path):
+        performs = pd.read_csv(performs_path, dtype={'client_id': str, 'transaction_id': str})
+        to_client = pd.read_csv(to_client_path, dtype={'client_id': str, 'transaction_id': str})
+        transfers = performs[['transaction_id', 'client_id', 'timestamp']].rename(columns={'client_id': 'source'})
+        transfers = transfers.merge(to_client[['transaction_id', 'client_id']].rename(columns={'client_id': 'target'}),
+                                    on='transaction_id')
+        transfers = transfers.merge(transactions[['transaction_id', 'amount', 'typedest']], on='transaction_id')
+    else:
+        # Without the edge files (prepare_data.py --derived-edges) the transfers come from the transactions
+        print("Edge files not found, reading transfers from transactions_cleaned.csv")
+        transfers = transactions[transactions['typedest'].isin(['CLIENT', 'MULE'])]
+        transfers = transfers.rename(columns={'idorig': 'source', 'iddest': 'target'})
+    transfers['to_mule'] = transfers['typedest'] == 'MULE'
+    transfers['ts'] = pd.to_datetime(transfers['timestamp']).to_numpy(dtype='datetime64[s]').astype('int64')
+    # Self transfers never move money between clients
+    transfers = transfers[transfers['source'] != transfers['target']]
+    transfers = transfers[['transaction_id', 'source', 'target', 'ts', 'amount', 'to_mule']]
+    print(f"Read {len(transfers)} client to client transfers")
+    return transfers.sort_values(by=['source', 'ts']).reset_index(drop=True)
+
+def init_worker(transfers):
+    global g_transfers
+    g_transfers = transfers
+
+def find_flow_paths(starts, max_hops, window_seconds, min_amount_ratio, min_cycle_hops):
+    """Grow time-respecting paths from the start transfers, one hop at a time for all paths at once.
+    Each hop must happen after the previous one, within window_seconds of the first, move at least
+    min_amount_ratio of the previous amount and reach a client not yet on the path.
+    Returns (cycles, mule chains) as frames of the paths' clients c0..cN and transactions t1..tN."""
+    paths = pd.DataFrame({
+        'c0': starts['source'], 'c1': starts['target'], 't1': starts['transaction_id'],
+        'first_ts': starts['ts'], 'last_ts': starts['ts'],
+        'last_amount': starts['amount'], 'total_amount': starts['amount'],
+        'mule_path': starts['to_mule'],
+    })
+    cycles = []
+    chains = []
+    for hop in range(2, max_hops + 1):
+        if paths.empty:
+            break
+        end_column = f'c{hop - 1}'
+        # Hash join of the path ends against the transfer sources
+        steps = paths.merge(g_transfers, left_on=end_column, right_on='source')
+        steps = steps[(steps['ts'] > steps['last_ts'])
+                      & (steps['ts'] <= steps['first_ts'] + window_seconds)
+                      & (steps['amount'] >= min_amount_ratio * steps['last_amount'])]
+        steps = steps.assign(
+            last_ts=steps['ts'],
+            last_amount=steps['amount'],
+            total_amount=steps['total_amount'] + steps['amount'],
+            **{f't{hop}': steps['transaction_id'], f'c{hop}': steps['target']},
+        )
+
+        closing = steps['target'] == steps['c0']
+        if hop >= min_cycle_hops:
+            cycles.append(steps[closing])
+
+        # Simple paths only: the new client must not be on the path yet
+        revisits = closing.copy()
+        for i in range(1, hop):
+            revisits |= steps['target'] == steps[f'c{i}']
+        steps = steps[~revisits]
+
+        # A chain through mules ends where the money leaves the last mule, or at the hop limit
+        chain_ends = steps['mule_path'] & (~steps['to_mule'] | (hop == max_hops))
+        chains.append(steps[chain_ends])
+
+        steps = steps.assign(mule_path=steps['mule_path'] & steps['to_mule'])
+        paths = steps[list(paths.columns) + [f'c{hop}', f't{hop}']]
+    return concat_paths(cycles), concat_paths(chains)
+
+def concat_paths(frames):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def find_flow_paths_parallel(transfers, workers, max_hops, window_seconds, min_amount_ratio, min_cycle_hops):
+    """Split the start transfers by source client across worker processes"""
+    if workers <= 1:
+        init_worker(transfers)
+        return find_flow_paths(transfers, max_hops, window_seconds, min_amount_ratio, min_cycle_hops)
+    partition = pd.util.hash_array(transfers['source'].to_numpy()) % workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(transfers,)) as executor:
+        futures = [
+            executor.submit(find_flow_paths, transfers[partition == i], max_hops, window_seconds,
+                            min_amount_ratio, min_cycle_hops)
+            for i in range(workers)
+        ]
+        results = [future.result() for future in futures]
+    return (concat_paths([cycles for cycles, _ in results]),
+            concat_paths([chains for _, chains in results]))
+
+def to_pattern_tables(paths, pattern, max_hops):
+    """FlowPattern nodes and In_Flow client -> pattern edges of detected paths"""
+    if paths.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    transaction_columns = [f't{i}' for i in range(1, max_hops + 1) if f't{i}' in paths.columns]
+    client_columns = [f'c{i}' for i in range(0, max_hops + 1) if f'c{i}' in paths.columns]
+    paths = paths.reset_index(drop=True)
+    paths['hops'] = paths[transaction_columns].notna().sum(axis=1)
+    # Pattern ids hash the transactions of the path, so reruns give the same ids
+    keys = paths[transaction_columns].fillna('').astype(str)
+    paths['id'] = pattern + '-' + pd.Series(np.char.mod('%016x', pd.util.hash_pandas_object(keys, index=False).to_numpy()))
+
+    patterns = pd.DataFrame({
+        'id': paths['id'],
+        'pattern': pattern,
+        'hops': paths['hops'],
+        'total_amount': paths['total_amount'].round(2),
+        'last_amount': paths['last_amount'].round(2),
+        'start_time': pd.to_datetime(paths['first_ts'], unit='s').dt.strftime('%Y-%m-%dT%H:%M:%S'),
+        'end_time': pd.to_datetime(paths['last_ts'], unit='s').dt.strftime('%Y-%m-%dT%H:%M:%S'),
+        'duration_seconds': paths['last_ts'] - paths['first_ts'],
+    })
+
+    members = paths[['id'] + client_columns].melt(id_vars='id', var_name='position', value_name='client_id')
+    members = members.dropna(subset=['client_id'])
+    members['position'] = members['position'].str[1:].astype('int64')
+    # A cycle ends at its first client, which keeps position 0
+    members = members.sort_values(by=['id', 'position']).drop_duplicates(subset=['id', 'client_id'])
+    in_flow = members.rename(columns={'id': 'flowpattern_id'})[['client_id', 'flowpattern_id', 'position']]
+    return patterns, in_flow
+
+def generate_flow_patterns(max_hops=4, window_hours=24, min_amount_ratio=0.5, min_cycle_hops=3, workers=1):
+    """Write data/processed/flow_patterns.csv and In_Flow.csv"""
+    transfers = read_transfers()
+    cycles, chains = find_flow_paths_parallel(transfers, workers, max_hops, window_hours * 3600,
+                                              min_amount_ratio, min_cycle_hops)
+    print(f"Found {len(cycles)} cycles and {len(chains)} mule chains")
+
+    patterns, in_flow = [], []
+    for paths, pattern in [(cycles, 'cycle'), (chains, 'mule_chain')]:
+        pattern_nodes, pattern_edges = to_pattern_tables(paths, pattern, max_hops)
+        patterns.append(pattern_nodes)
+        in_flow.append(pattern_edges)
+    patterns = concat_paths(patterns)
+    in_flow = concat_paths(in_flow)
+    if patterns.empty:
+        patterns = pd.DataFrame(columns=['id', 'pattern', 'hops', 'total_amount', 'last_amount',
+                                         'start_time', 'end_time', 'duration_seconds'])
+        in_flow = pd.DataFrame(columns=['client_id', 'flowpattern_id', 'position'])
+
+    patterns = patterns.drop_duplicates(subset=['id']).sort_values(by=['id']).reset_index(drop=True)
+    in_flow = in_flow.drop_duplicates(subset=['client_id', 'flowpattern_id'])
+    in_flow = in_flow.sort_values(by=['client_id', 'flowpattern_id']).reset_index(drop=True)
+    patterns.to_csv(os.path.join(processed_data_dir, 'flow_patterns.csv'), index=False)
+    print(f"Saved {len(patterns)} flow patterns")
+    in_flow.to_csv(os.path.join(processed_data_dir, 'In_Flow.csv'), index=False)
+    print(f"Saved {len(in_flow)} In_Flow relationships")
+    print(patterns.groupby(['pattern', 'hops']).size())
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detect money-flow cycles and mule chains in client transfers")
+    parser.add_argument('--max-hops', type=int, default=4, help="Longest cycle or chain, in transfers")
+    parser.add_argument('--window-hours', type=float, default=24, help="Time from the first to the last transfer")
+    parser.add_argument('--min-amount-ratio', type=float, default=0.5,
+                        help="Each transfer moves at least this share of the previous transfer's amount")
+    parser.add_argument('--min-cycle-hops', type=int, default=3, help="Shortest cycle reported (2 finds A->B->A)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate_flow_patterns(args.max_hops, args.window_hours, args.min_amount_ratio, args.min_cycle_hops, args.workers)
@@ -0,0 +1,124 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+raw_data_dir = os.path.join(data_dir, 'raw')
+processed_data_dir = os.path.join(data_dir, 'processed')
+
+# Client -> identifier relationship files written by gen_pii.py, with their identifier column
+# and the clients.csv column it was extracted from
+pii_relationship_files = [
+    ('Has_Email.csv', 'email_id', 'email'),
+    ('Has_Phonenumber.csv', 'phonenumber_id', 'phonenumber'),
+    ('Has_SSN.csv', 'ssn_id', 'ssn'),
+]
+
+def connected_components(node_count, sources, targets):
+    """Component root (smallest node id) of every node, by array-based union-find.
+    Each round hooks the larger root of every edge under the smaller one in a single scatter,
+    then compresses all paths by pointer jumping, until no edge joins two roots."""
+    parent = np.arange(node_count, dtype=np.int64)
+    rounds = 0
+    while True:
+        source_roots = parent[sources]
+        target_roots = parent[targets]
+        joining = source_roots != target_roots
+        if not joining.any():
+            break
+        low = np.minimum(source_roots[joining], target_roots[joining])
+        high = np.maximum(source_roots[joining], target_roots[joining])
+        np.minimum.at(parent, high, low)
+        # Pointer jumping: every node points at its root again
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        rounds += 1
+    print(f"Found components in {rounds} union rounds")
+    return parent
+
+def read_client_pii_edges(clients):
+    """Client ids and identifier keys of all client -> identifier edges"""
+    edges = []
+    for file_name, id_column, client_column in pii_relationship_files:
+        file_path = os.path.join(processed_data_dir, file_name)
+        if os.path.exists(file_path):
+            df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+            print(f"Read {len(df)} {file_name} relationships")
+        else:
+            # Without gen_pii.py output (prepare_data.py --derived-pii) the edges come from the client columns
+            df = clients[['id', client_column]].dropna().astype(str)
+            df.columns = ['client_id', id_column]
+            print(f"{file_name} not found, using the {client_column} column of clients.csv")
+        # Prefix identifiers with their type, so an SSN and a phone number never collide
+        edges.append(pd.DataFrame({
+            'client_id': df['client_id'],
+            'identifier': id_column[:-len('_id')] + ':' + df[id_column],
+        }))
+    return pd.concat(edges, ignore_index=True)
+
+def find_rings(clients, edges, min_size=2):
+    """Rings of clients connected through shared identifiers.
+    Returns the ring nodes (with client count and fraud statistics) and the client -> ring edges."""
+    client_keys = pd.Index(clients['id'].unique())
+    edges = edges[edges['client_id'].isin(client_keys)]
+    identifier_keys = pd.Index(edges['identifier'].unique())
+
+    # Clients are nodes 0..len(client_keys)-1, identifiers follow them
+    sources = client_keys.get_indexer(edges['client_id'])
+    targets = identifier_keys.get_indexer(edges['identifier']) + len(client_keys)
+    roots = connected_components(len(client_keys) + len(identifier_keys), sources, targets)
+
+    members = pd.DataFrame({
+        'client_id': client_keys,
+        'root': roots[:len(client_keys)],
+    })
+    fraud = clients.drop_duplicates(subset=['id']).set_index('id')['isfraud']
+    members['isfraud'] = fraud.reindex(client_keys).fillna(False).astype(bool).to_numpy()
+    identifier_counts = pd.Series(roots[len(client_keys):]).value_counts()
+
+    rings = members.groupby('root').agg(
+        client_count=('client_id', 'size'),
+        fraud_clients=('isfraud', 'sum'),
+        first_client=('client_id', 'min'),
+    )
+    rings = rings[rings['client_count'] >= min_size]
+    rings['identifier_count'] = identifier_counts.reindex(rings.index).fillna(0).astype('int64')
+    rings['fraud_ratio'] = (rings['fraud_clients'] / rings['client_count']).round(4)
+    # Ring ids follow the smallest member client id, so they are stable across reruns
+    rings['id'] = 'ring-' + rings['first_client']
+
+    in_ring = members[members['root'].isin(rings.index)].copy()
+    in_ring['ring_id'] = rings['id'].reindex(in_ring['root']).to_numpy()
+    in_ring = in_ring[['client_id', 'ring_id']].sort_values(by=['client_id']).reset_index(drop=True)
+
+    rings = rings[['id', 'client_count', 'fraud_clients', 'fraud_ratio', 'identifier_count']]
+    rings = rings.sort_values(by=['id']).reset_index(drop=True)
+    return rings, in_ring
+
+def generate_rings(min_size=2):
+    """Write data/processed/rings.csv and In_Ring.csv"""
+    clients = pd.read_csv(os.path.join(raw_data_dir, 'clients.csv'), dtype={'id': str})
+    clients.columns = [col.lower() for col in clients.columns]
+    print(f"Read {len(clients)} clients")
+
+    rings, in_ring = find_rings(clients, read_client_pii_edges(clients), min_size)
+    rings.to_csv(os.path.join(processed_data_dir, 'rings.csv'), index=False)
+    print(f"Saved {len(rings)} rings")
+    in_ring.to_csv(os.path.join(processed_data_dir, 'In_Ring.csv'), index=False)
+    print(f"Saved {len(in_ring)} In_Ring relationships")
+
+    print("\nLargest rings:")
+    print(rings.sort_values(by=['client_count', 'fraud_ratio'], ascending=False).head())
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find rings of clients sharing an email, phone number or SSN")
+    parser.add_argument('--min-size', type=int, default=2, help="Fewest clients that make a ring")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate_rings(args.min_size)
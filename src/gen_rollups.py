@@ -0,0 +1,160 @@
+import pandas as pd
+import argparse
+import json
+import os
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+processed_data_dir = os.path.join(data_dir, 'processed')
+# Granularities and the last globalstep folded into the rollup tables
+state_path = os.path.join(processed_data_dir, 'rollups_state.json')
+
+# Rolled-up entity: (table name part, key column, transaction column of the entity, typedest filter)
+rollup_entities = [
+    ('Merchant', 'merchant_id', 'iddest', ['MERCHANT']),
+    ('Bank', 'bank_id', 'iddest', ['BANK']),
+    ('Client', 'client_id', 'idorig', None),
+]
+
+# Named granularities, anything else is used as a pandas frequency (e.g. 15min)
+granularity_freqs = {'minute': 'min', 'hour': 'h', 'day': 'D'}
+
+# Summed when rollups of old and new transactions are merged
+rollup_value_columns = ['transaction_count', 'total_amount', 'fraud_count']
+
+def rollup_file_name(entity, granularity):
+    return f"Rollup_{entity}_{granularity.capitalize()}.csv"
+
+def read_transactions(file_path, after_step=None):
+    """Transactions of the file, only those after the watermark step if one is given"""
+    columns = ['globalstep', 'idorig', 'iddest', 'typedest', 'amount', 'isfraud', 'timestamp']
+    df = pd.read_csv(file_path, usecols=lambda col: col.lower() in columns)
+    df.columns = [col.lower() for col in df.columns]
+    if 'isfraud' not in df.columns:
+        df['isfraud'] = False
+    if after_step is not None:
+        df = df[df['globalstep'] > after_step]
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    print(f"Read {len(df)} transactions from {os.path.basename(file_path)}")
+    return df
+
+def rollup(transactions, key_column, entity_column, typedest, freq):
+    """Count, amount and fraud count per entity and time bucket, in one vectorized group-by over the
+    bucket starts (the same buckets as resampling every entity's series separately)"""
+    if typedest is not None:
+        transactions = transactions[transactions['typedest'].isin(typedest)]
+    buckets = pd.DataFrame({
+        key_column: transactions[entity_column].astype('string'),
+        'timestamp': transactions['timestamp'].dt.floor(freq),
+        'amount': transactions['amount'],
+        'isfraud': transactions['isfraud'].astype(bool),
+    })
+    return buckets.groupby([key_column, 'timestamp'], sort=False).agg(
+        transaction_count=('amount', 'size'),
+        total_amount=('amount', 'sum'),
+        fraud_count=('isfraud', 'sum'),
+    ).reset_index()
+
+def merge_rollups(existing, delta, key_column):
+    """Add the rollups of new transactions to the stored ones; buckets are additive"""
+    table = pd.concat([existing, delta], ignore_index=True)
+    return table.groupby([key_column, 'timestamp'], sort=False)[rollup_value_columns].sum().reset_index()
+
+def write_rollup(table, file_name, key_column):
+    """Write the table next to its final path; finish_tables moves it in place"""
+    table = table.sort_values(by=[key_column, 'timestamp']).reset_index(drop=True)
+    table['total_amount'] = table['total_amount'].round(2)
+    table['transaction_count'] = table['transaction_count'].astype('int64')
+    table['fraud_count'] = table['fraud_count'].astype('int64')
+    table['timestamp'] = table['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    table.to_csv(os.path.join(processed_data_dir, file_name + '.tmp'), index=False)
+    print(f"Saved {len(table)} rows to {file_name}")
+
+def load_state(granularities):
+    """The watermark of the last run, or None if the stored tables do not match the granularities"""
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('pending'):
+        # The last run crashed after committing its watermark, finish moving its tables in place
+        print(f"Finishing {len(state['pending'])} table(s) of the interrupted last run")
+        finish_tables(state)
+    if state.get('granularities') != granularities:
+        print("Granularities changed since the last run, rebuilding")
+        return None
+    for granularity in granularities:
+        for entity, _, _, _ in rollup_entities:
+            if not os.path.exists(os.path.join(processed_data_dir, rollup_file_name(entity, granularity))):
+                print(f"{rollup_file_name(entity, granularity)} missing, rebuilding")
+                return None
+    return state
+
+def save_state(state):
+    """Write the state atomically"""
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+def finish_tables(state):
+    """Move the written tables over the old ones and clear them from the state. Files already moved
+    are skipped, so this can be repeated after a crash."""
+    for file_name in state['pending']:
+        tmp_path = os.path.join(processed_data_dir, file_name + '.tmp')
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, os.path.join(processed_data_dir, file_name))
+    state['pending'] = []
+    save_state(state)
+
+def generate_rollups(granularities, input_file=None, incremental=False):
+    """Write one Rollup_<Entity>_<Granularity>.csv per entity and granularity to data/processed"""
+    input_file = input_file or os.path.join(processed_data_dir, 'transactions_cleaned.csv')
+    state = load_state(granularities) if incremental else None
+    after_step = state['watermark'] if state else None
+    if state:
+        print(f"Folding in transactions after globalstep {after_step}")
+
+    transactions = read_transactions(input_file, after_step)
+    if transactions.empty and state:
+        print("No new transactions, rollups are up to date")
+        return
+
+    # All tables are written to .tmp files first. Saving the state with the new watermark and the
+    # list of pending tables is the commit point: a crash before it leaves the old tables and
+    # watermark, a crash after it is finished by the next load_state. Tables never hold new
+    # transactions under an old watermark, which would add them twice on the next run.
+    file_names = []
+    for granularity in granularities:
+        freq = granularity_freqs.get(granularity, granularity)
+        for entity, key_column, entity_column, typedest in rollup_entities:
+            file_name = rollup_file_name(entity, granularity)
+            table = rollup(transactions, key_column, entity_column, typedest, freq)
+            if state:
+                existing = pd.read_csv(os.path.join(processed_data_dir, file_name), dtype={key_column: 'string'})
+                existing['timestamp'] = pd.to_datetime(existing['timestamp'])
+                print(f"{file_name}: {len(table)} buckets of new transactions")
+                table = merge_rollups(existing, table, key_column)
+            write_rollup(table, file_name, key_column)
+            file_names.append(file_name)
+
+    watermark = int(transactions['globalstep'].max()) if not transactions.empty else -1
+    if state:
+        watermark = max(watermark, state['watermark'])
+    state = {'granularities': granularities, 'watermark': watermark, 'pending': file_names}
+    save_state(state)
+    finish_tables(state)
+    print(f"Rollups cover transactions up to globalstep {watermark}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute per-merchant, per-bank and per-client "
+                                                 "transaction rollups by time bucket")
+    parser.add_argument('--granularities', default='hour,day',
+                        help="Comma separated bucket sizes: minute, hour, day or a pandas frequency such as 15min")
+    parser.add_argument('--input', help="Transactions CSV (default data/processed/transactions_cleaned.csv)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fold in transactions after the globalstep watermark of the last run")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    generate_rollups(args.granularities.split(','), args.input, args.incremental)
@@ -0,0 +1,367 @@
+import numpy as np
+import argparse
+import json
+import os
+import time
+
+from validate_data import node_tables, relationship_files, read_table, data_dir, processed_data_dir
+
+# Memory-mapped arrays of the built graph
+csr_dir = os.path.join(processed_data_dir, 'graph_csr')
+
+# Relationship files prepare_data.py --derived-edges/--derived-pii does not write, with the node table
+# the importers' views derive them from: (label, {column: *_id column, source first}, typedest filter)
+derived_relationships = {
+    'Client_Perform_Transaction.csv': ('transaction', {'idorig': 'client_id', 'globalstep': 'transaction_id'}, None),
+    'Transaction_To_Client.csv': ('transaction', {'globalstep': 'transaction_id', 'iddest': 'client_id'}, ['CLIENT', 'MULE']),
+    'Transaction_To_Merchant.csv': ('transaction', {'globalstep': 'transaction_id', 'iddest': 'merchant_id'}, ['MERCHANT']),
+    'Transaction_To_Bank.csv': ('transaction', {'globalstep': 'transaction_id', 'iddest': 'bank_id'}, ['BANK']),
+    'Has_Email.csv': ('client', {'id': 'client_id', 'email': 'email_id'}, None),
+    'Has_Phonenumber.csv': ('client', {'id': 'client_id', 'phonenumber': 'phonenumber_id'}, None),
+    'Has_SSN.csv': ('client', {'id': 'client_id', 'ssn': 'ssn_id'}, None),
+}
+
+# Identifier node tables of --derived-pii, taken from these clients.csv columns
+derived_node_columns = {'email': 'email', 'phonenumber': 'phonenumber', 'ssn': 'ssn'}
+
+class CSRGraph:
+    """Compressed sparse row adjacency of the processed PaySim graph, in both directions.
+
+    Nodes get integer ids, contiguous per label: label_ranges[label] = (first id, end id), and
+    keys[label][i] is the key of node first id + i (keys are sorted, so lookups are binary searches).
+    The outgoing edges of node n are out_targets[out_offsets[n]:out_offsets[n + 1]], with their
+    edge types in out_types; in_offsets/in_targets/in_types hold the same for incoming edges."""
+
+    def __init__(self, labels, label_ranges, keys, edge_types, arrays, sources=None):
+        self.labels = labels
+        self.label_ranges = label_ranges
+        self.keys = keys
+        self.edge_types = edge_types
+        self.sources = sources
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.node_count = len(self.out_offsets) - 1
+        self.edge_count = len(self.out_targets)
+
+    def node_id(self, label, key):
+        """Integer id of the node with this label and key, or None if there is none"""
+        keys = self.keys[label]
+        position = np.searchsorted(keys, str(key))
+        if position == len(keys) or keys[position] != str(key):
+            return None
+        return self.label_ranges[label][0] + int(position)
+
+    def node_label(self, node):
+        for label in self.labels:
+            start, end = self.label_ranges[label]
+            if start <= node < end:
+                return label
+        raise IndexError(f"Node {node} is not in the graph")
+
+    def node_key(self, node):
+        label = self.node_label(node)
+        return label, str(self.keys[label][node - self.label_ranges[label][0]])
+
+    def label_mask(self, nodes, labels):
+        """Which of the nodes carry one of the labels"""
+        mask = np.zeros(len(nodes), dtype=bool)
+        for label in labels:
+            start, end = self.label_ranges[label]
+            mask |= (nodes >= start) & (nodes < end)
+        return mask
+
+    def _type_codes(self, edge_types):
+        if edge_types is None:
+            return None
+        return np.array([self.edge_types.index(edge_type) for edge_type in edge_types], dtype=np.int8)
+
+    def _expand(self, frontier, direction, type_codes):
+        """Neighbors of all frontier nodes at once. Returns (source, neighbor) arrays."""
+        sources = []
+        neighbors = []
+        for offsets, targets, types in self._directions(direction):
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            # Positions of every edge of the frontier, without a Python loop over nodes
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            source = np.repeat(frontier, counts)
+            neighbor = np.asarray(targets[positions])
+            if type_codes is not None:
+                keep = np.isin(types[positions], type_codes)
+                source, neighbor = source[keep], neighbor[keep]
+            sources.append(source)
+            neighbors.append(neighbor)
+        return np.concatenate(sources), np.concatenate(neighbors)
+
+    def _directions(self, direction):
+        if direction not in ['out', 'in', 'both']:
+            raise ValueError(f"direction must be out, in or both, not {direction}")
+        if direction in ['out', 'both']:
+            yield self.out_offsets, self.out_targets, self.out_types
+        if direction in ['in', 'both']:
+            yield self.in_offsets, self.in_targets, self.in_types
+
+    def neighbors(self, node, direction='out', edge_types=None):
+        """Direct neighbors of one node"""
+        _, neighbor = self._expand(np.array([node], dtype=np.int64), direction, self._type_codes(edge_types))
+        return np.unique(neighbor)
+
+    def k_hop(self, nodes, k, direction='both', edge_types=None, labels=None):
+        """Nodes reachable from the start nodes in 1 to k hops. Returns (node ids, hop distances);
+        labels keeps only the reached nodes with one of those labels (traversal still passes through all)."""
+        type_codes = self._type_codes(edge_types)
+        distance = np.full(self.node_count, -1, dtype=np.int16)
+        frontier = np.unique(np.asarray(nodes, dtype=np.int64))
+        distance[frontier] = 0
+        for hop in range(1, k + 1):
+            if len(frontier) == 0:
+                break
+            _, neighbor = self._expand(frontier, direction, type_codes)
+            frontier = np.unique(neighbor[distance[neighbor] < 0])
+            distance[frontier] = hop
+        reached = np.flatnonzero(distance > 0)
+        if labels is not None:
+            reached = reached[self.label_mask(reached, labels)]
+        return reached, distance[reached]
+
+    def shortest_path(self, source, target, direction='both', edge_types=None, max_hops=None):
+        """Node ids of a shortest path from source to target, or None if there is none within max_hops"""
+        type_codes = self._type_codes(edge_types)
+        parent = np.full(self.node_count, -1, dtype=np.int64)
+        parent[source] = source
+        frontier = np.array([source], dtype=np.int64)
+        hop = 0
+        while len(frontier) and parent[target] < 0 and (max_hops is None or hop < max_hops):
+            sources, neighbor = self._expand(frontier, direction, type_codes)
+            new = parent[neighbor] < 0
+            sources, neighbor = sources[new], neighbor[new]
+            # First discovered parent wins for nodes reached from several frontier nodes
+            neighbor, first = np.unique(neighbor, return_index=True)
+            parent[neighbor] = sources[first]
+            frontier = neighbor
+            hop += 1
+        if parent[target] < 0:
+            return None
+        path = [int(target)]
+        while path[-1] != source:
+            path.append(int(parent[path[-1]]))
+        return path[::-1]
+
+    def label_neighborhood(self, node, label, k=1, direction='both', edge_types=None):
+        """Nodes of one label within k hops of a node, e.g. the clients sharing PII with a client (k=2)"""
+        reached, _ = self.k_hop([node], k, direction, edge_types, labels=[label])
+        return reached
+
+def build_csr(sources, targets, types, node_count):
+    """Offsets, targets and edge types of the edges grouped by source node"""
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+    return offsets, targets[order], types[order]
+
+def source_stats():
+    """Size and mtime of every node and relationship file the graph is built from"""
+    paths = [os.path.join(table_dir, file_name) for table_dir, file_name, _ in node_tables.values()]
+    paths += [os.path.join(processed_data_dir, file_name) for file_name in relationship_files]
+    return {os.path.relpath(path, data_dir): [os.path.getsize(path), os.path.getmtime(path)]
+            for path in paths if os.path.exists(path)}
+
+def build_graph():
+    """Build the graph from the node and relationship files in data/processed and data/raw"""
+    # Taken before reading, so files changed during the build make the saved graph stale
+    source_files = source_stats()
+    labels = []
+    label_ranges = {}
+    keys = {}
+    next_id = 0
+    frames = {}
+
+    def node_frame(label):
+        """Rows of a node table, read once for its nodes and the edges derived from it"""
+        if label not in frames:
+            table_dir, file_name, _ = node_tables[label]
+            frames[label] = read_table(os.path.join(table_dir, file_name))
+        return frames[label]
+
+    for label, (table_dir, file_name, key_column) in node_tables.items():
+        file_path = os.path.join(table_dir, file_name)
+        if os.path.exists(file_path):
+            label_keys = np.unique(node_frame(label)[key_column].to_numpy(dtype=str))
+        elif label in derived_node_columns and 'client' in keys:
+            column = derived_node_columns[label]
+            values = node_frame('client')[column]
+            label_keys = np.unique(values[values != ''].to_numpy(dtype=str))
+            print(f"{file_name} not found, using the {column} column of clients.csv")
+        else:
+            print(f"Skipping {file_name}: file not found")
+            continue
+        labels.append(label)
+        label_ranges[label] = (next_id, next_id + len(label_keys))
+        keys[label] = label_keys
+        next_id += len(label_keys)
+        print(f"{label}: {len(label_keys)} nodes")
+    node_count = next_id
+
+    def to_node_ids(label, column):
+        """Node ids of the column values; -1 where the key has no node"""
+        label_keys = keys[label]
+        positions = np.searchsorted(label_keys, column)
+        found = positions < len(label_keys)
+        found[found] = label_keys[positions[found]] == column[found]
+        return np.where(found, positions + label_ranges[label][0], -1)
+
+    edge_types = []
+    sources, targets, types = [], [], []
+    for file_name in relationship_files:
+        file_path = os.path.join(processed_data_dir, file_name)
+        if os.path.exists(file_path):
+            df = read_table(file_path)
+        elif file_name in derived_relationships and derived_relationships[file_name][0] in keys:
+            label, columns, typedest = derived_relationships[file_name]
+            df = node_frame(label)
+            if typedest is not None:
+                df = df[df['typedest'].isin(typedest)]
+            df = df[list(columns)].rename(columns=columns)
+            df = df[(df != '').all(axis=1)]
+            print(f"{file_name} not found, deriving it from {node_tables[label][1]}")
+        else:
+            print(f"Skipping {file_name}: file not found")
+            continue
+        # The first *_id column is the source of the edge, the second its destination
+        source_column, target_column = [col for col in df.columns if col.endswith('_id')][:2]
+        source_label, target_label = source_column[:-len('_id')], target_column[:-len('_id')]
+        if source_label not in keys or target_label not in keys:
+            print(f"Skipping {file_name}: no node table loaded for {source_label} or {target_label}")
+            continue
+        source_ids = to_node_ids(source_label, df[source_column].to_numpy(dtype=str))
+        target_ids = to_node_ids(target_label, df[target_column].to_numpy(dtype=str))
+        valid = (source_ids >= 0) & (target_ids >= 0)
+        if not valid.all():
+            print(f"  {file_name}: dropped {(~valid).sum()} edges to missing nodes (see validate_data.py)")
+        edge_type = os.path.splitext(file_name)[0]
+        edge_types.append(edge_type)
+        sources.append(source_ids[valid])
+        targets.append(target_ids[valid])
+        types.append(np.full(valid.sum(), len(edge_types) - 1, dtype=np.int8))
+        print(f"{edge_type}: {valid.sum()} edges")
+
+    sources = np.concatenate(sources) if sources else np.array([], dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.array([], dtype=np.int64)
+    types = np.concatenate(types) if types else np.array([], dtype=np.int8)
+    # int32 ids halve the size of the arrays for graphs below 2^31 nodes
+    id_type = np.int32 if node_count < 2 ** 31 else np.int64
+
+    out_offsets, out_targets, out_types = build_csr(sources, targets, types, node_count)
+    in_offsets, in_targets, in_types = build_csr(targets, sources, types, node_count)
+    arrays = {
+        'out_offsets': out_offsets, 'out_targets': out_targets.astype(id_type), 'out_types': out_types,
+        'in_offsets': in_offsets, 'in_targets': in_targets.astype(id_type), 'in_types': in_types,
+    }
+    return CSRGraph(labels, label_ranges, keys, edge_types, arrays, source_files)
+
+def save_graph(graph, directory=csr_dir):
+    """Write the arrays as .npy files and the labels and edge types as meta.json"""
+    os.makedirs(directory, exist_ok=True)
+    for name in ['out_offsets', 'out_targets', 'out_types', 'in_offsets', 'in_targets', 'in_types']:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(graph, name))
+    for label in graph.labels:
+        np.save(os.path.join(directory, f"keys_{label}.npy"), graph.keys[label])
+    meta = {
+        "labels": graph.labels,
+        "label_ranges": graph.label_ranges,
+        "edge_types": graph.edge_types,
+        "sources": graph.sources,
+    }
+    # meta.json is replaced last, so an interrupted save is never opened as current
+    meta_path = os.path.join(directory, 'meta.json')
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+    print(f"Saved graph with {graph.node_count} nodes and {graph.edge_count} edges to {directory}")
+
+def load_graph(directory=csr_dir):
+    """Open a saved graph. The arrays are memory-mapped, so this returns at once and pages in on use."""
+    with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    arrays = {}
+    for name in ['out_offsets', 'out_targets', 'out_types', 'in_offsets', 'in_targets', 'in_types']:
+        arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+    keys = {label: np.load(os.path.join(directory, f"keys_{label}.npy"), mmap_mode='r') for label in meta["labels"]}
+    label_ranges = {label: tuple(bounds) for label, bounds in meta["label_ranges"].items()}
+    return CSRGraph(meta["labels"], label_ranges, keys, meta["edge_types"], arrays, meta.get("sources"))
+
+def open_graph(rebuild=False, directory=csr_dir):
+    """Open the saved graph, or build and save it if there is none, its source files changed
+    since it was built (sizes and mtimes differ) or rebuild is set"""
+    meta_path = os.path.join(directory, 'meta.json')
+    if not rebuild and os.path.exists(meta_path):
+        start = time.perf_counter()
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            sources = json.load(f).get("sources")
+        if sources == source_stats():
+            graph = load_graph(directory)
+            print(f"Opened graph from {directory} in {time.perf_counter() - start:.3f}s")
+            return graph
+        print(f"Source files changed since the graph in {directory} was built, rebuilding")
+    start = time.perf_counter()
+    graph = build_graph()
+    save_graph(graph, directory)
+    print(f"Built graph in {time.perf_counter() - start:.2f}s")
+    return graph
+
+def print_summary(graph):
+    print(f"\nGraph: {graph.node_count} nodes, {graph.edge_count} edges")
+    for label in graph.labels:
+        start, end = graph.label_ranges[label]
+        print(f"  {label}: {end - start} nodes")
+    counts = np.bincount(graph.out_types, minlength=len(graph.edge_types))
+    for code, edge_type in enumerate(graph.edge_types):
+        print(f"  {edge_type}: {counts[code]} edges")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build or query an in-memory CSR graph of the processed PaySim data")
+    parser.add_argument('--rebuild', action='store_true',
+                        help=f"Rebuild the graph even if {csr_dir} is current")
+    parser.add_argument('--start', help="Start node as label:key, e.g. client:4714960349516264")
+    parser.add_argument('--hops', type=int, default=2, help="Hops of the k-hop expansion from --start")
+    parser.add_argument('--label', help="Only report reached nodes with this label")
+    parser.add_argument('--edge-types', help="Comma separated edge types to traverse, e.g. Has_Email,Has_SSN")
+    parser.add_argument('--direction', choices=['out', 'in', 'both'], default='both')
+    parser.add_argument('--path-to', help="Target node as label:key, prints a shortest path from --start")
+    return parser.parse_args()
+
+def parse_node(graph, text):
+    label, key = text.split(':', 1)
+    node = graph.node_id(label, key)
+    if node is None:
+        raise SystemExit(f"Node {text} not found")
+    return node
+
+def main():
+    args = parse_args()
+    graph = open_graph(args.rebuild)
+    print_summary(graph)
+
+    if not args.start:
+        return
+    edge_types = args.edge_types.split(',') if args.edge_types else None
+    source = parse_node(graph, args.start)
+    start = time.perf_counter()
+    labels = [args.label] if args.label else None
+    reached, distance = graph.k_hop([source], args.hops, args.direction, edge_types, labels)
+    print(f"\n{len(reached)} nodes within {args.hops} hops of {args.start} ({time.perf_counter() - start:.3f}s)")
+    for hop in range(1, args.hops + 1):
+        print(f"  hop {hop}: {(distance == hop).sum()} nodes")
+    for node in reached[:10]:
+        print(f"  {graph.node_key(node)}")
+
+    if args.path_to:
+        target = parse_node(graph, args.path_to)
+        path = graph.shortest_path(source, target, args.direction, edge_types)
+        if path is None:
+            print(f"\nNo path from {args.start} to {args.path_to}")
+        else:
+            print(f"\nShortest path ({len(path) - 1} hops): " + " -> ".join(':'.join(graph.node_key(node)) for node in path))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import subprocess
+import argparse
 import sys
 from pathlib import Path
 
@@ -34,14 +35,34 @@ def run_command(command, description):
         print(f"\nError executing {command}: {e}", file=sys.stderr)
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Prepare the PaySim data for import")
+    parser.add_argument('--derived-edges', action='store_true',
+                        help="Skip the transaction edge CSVs, for imports with DERIVED_EDGES=true")
+    parser.add_argument('--derived-pii', action='store_true',
+                        help="Skip the PII node and edge CSVs, for imports with DERIVED_PII=true")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     # Define pipeline steps
     steps = [
         ("uv run src/prepare_transactions.py", "Prepare Transaction Data"),
         ("uv run src/gen_banks.py", "Extract Bank Data"),
         ("uv run src/gen_pii.py", "Generate PII Data"),
         ("uv run src/gen_relationships.py", "Generate Transaction Relationships"),
+        ("uv run src/gen_features.py", "Generate Client and Merchant Features"),
+        ("uv run src/gen_rings.py", "Detect Shared-Identifier Rings"),
+        ("uv run src/gen_flow_patterns.py", "Detect Money-Flow Cycles and Mule Chains"),
+        ("uv run src/gen_rollups.py", "Precompute Time-Bucketed Rollups"),
+        ("uv run src/validate_data.py", "Validate Referential Integrity"),
     ]
+    if args.derived_edges:
+        # The importers declare the transaction edges as views over the Transaction table
+        steps = [step for step in steps if step[0] != "uv run src/gen_relationships.py"]
+    if args.derived_pii:
+        # The importers declare the PII nodes and HAS_* edges as views over the Client table
+        steps = [step for step in steps if step[0] != "uv run src/gen_pii.py"]
     
     # Ensure all required files exist
     required_files = [
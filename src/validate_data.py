@@ -0,0 +1,138 @@
+import pandas as pd
+import argparse
+import os
+import sys
+
+data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+raw_data_dir = os.path.join(data_dir, 'raw')
+processed_data_dir = os.path.join(data_dir, 'processed')
+quarantine_dir = os.path.join(processed_data_dir, 'quarantine')
+
+# Node tables: label -> (directory, file, key column)
+node_tables = {
+    'client': (raw_data_dir, 'clients.csv', 'id'),
+    'merchant': (raw_data_dir, 'merchants.csv', 'id'),
+    'bank': (processed_data_dir, 'banks.csv', 'id'),
+    'transaction': (processed_data_dir, 'transactions_cleaned.csv', 'globalstep'),
+    'email': (processed_data_dir, 'emails.csv', 'id'),
+    'phonenumber': (processed_data_dir, 'phonenumbers.csv', 'id'),
+    'ssn': (processed_data_dir, 'ssns.csv', 'id'),
+    'ring': (processed_data_dir, 'rings.csv', 'id'),
+    'flowpattern': (processed_data_dir, 'flow_patterns.csv', 'id'),
+}
+
+# Relationship tables, each <label>_id column references the node table of that label
+relationship_files = [
+    'Client_Perform_Transaction.csv',
+    'Transaction_To_Client.csv',
+    'Transaction_To_Merchant.csv',
+    'Transaction_To_Bank.csv',
+    'Has_Email.csv',
+    'Has_Phonenumber.csv',
+    'Has_SSN.csv',
+    'In_Ring.csv',
+    'In_Flow.csv',
+]
+
+def read_table(file_path):
+    """Read a CSV as text, so keys compare the way the importers see them and rewrites keep the values as-is"""
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    df.columns = [col.lower() for col in df.columns]
+    return df
+
+def quarantine_rows(df, bad_rows, file_name, reason):
+    """Append rejected rows (with the reason) to the quarantine side file of the table"""
+    os.makedirs(quarantine_dir, exist_ok=True)
+    quarantine_path = os.path.join(quarantine_dir, file_name)
+    rejected = df[bad_rows].assign(quarantine_reason=reason)
+    rejected.to_csv(quarantine_path, mode='a', index=False, header=not os.path.exists(quarantine_path))
+
+def validate_nodes(quarantine=False):
+    """Check node tables for duplicate keys, returns the node keys per label and the issues found"""
+    node_keys = {}
+    issues = []
+    for label, (table_dir, file_name, key_column) in node_tables.items():
+        file_path = os.path.join(table_dir, file_name)
+        if not os.path.exists(file_path):
+            print(f"Skipping {file_name}: file not found")
+            continue
+        df = read_table(file_path)
+        duplicates = df.duplicated(subset=[key_column], keep='first')
+        print(f"{file_name}: {len(df)} rows, {duplicates.sum()} duplicate {key_column} values")
+        if duplicates.any():
+            issues.append((file_name, 'duplicate key', int(duplicates.sum())))
+            print(df[duplicates].head())
+            # Raw inputs are never rewritten, only the generated tables
+            if quarantine and table_dir == processed_data_dir:
+                quarantine_rows(df, duplicates, file_name, f"duplicate {key_column}")
+                df = df[~duplicates]
+                df.to_csv(file_path, index=False)
+                print(f"Quarantined {duplicates.sum()} rows from {file_name}")
+        node_keys[label] = pd.Index(df[key_column].unique())
+    return node_keys, issues
+
+def validate_relationships(node_keys, quarantine=False):
+    """Check relationship tables for duplicate keys and *_id values missing from their node table"""
+    issues = []
+    for file_name in relationship_files:
+        file_path = os.path.join(processed_data_dir, file_name)
+        if not os.path.exists(file_path):
+            print(f"Skipping {file_name}: file not found")
+            continue
+        df = read_table(file_path)
+        id_columns = [col for col in df.columns if col.endswith('_id')]
+        bad_rows = pd.Series(False, index=df.index)
+        reasons = pd.Series('', index=df.index)
+
+        duplicates = df.duplicated(subset=id_columns, keep='first')
+        print(f"{file_name}: {len(df)} rows, {duplicates.sum()} duplicate ({', '.join(id_columns)}) keys")
+        if duplicates.any():
+            issues.append((file_name, 'duplicate key', int(duplicates.sum())))
+            bad_rows |= duplicates
+            reasons[duplicates] = 'duplicate key'
+
+        for col in id_columns:
+            label = col[:-len('_id')]
+            if label not in node_keys:
+                print(f"  {col}: no node table loaded for '{label}', not checked")
+                continue
+            # Hash join of the column against the node keys
+            orphans = ~df[col].isin(node_keys[label])
+            print(f"  {col}: {orphans.sum()} orphans")
+            if orphans.any():
+                issues.append((file_name, f"orphan {col}", int(orphans.sum())))
+                print(df.loc[orphans, id_columns].head())
+                bad_rows |= orphans
+                reasons[orphans & (reasons == '')] = f"orphan {col}"
+
+        if quarantine and bad_rows.any():
+            quarantine_rows(df, bad_rows, file_name, reasons[bad_rows])
+            df[~bad_rows].to_csv(file_path, index=False)
+            print(f"Quarantined {bad_rows.sum()} rows from {file_name}")
+    return issues
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check processed PaySim data for orphan edges and duplicate keys")
+    parser.add_argument('--quarantine', action='store_true',
+                        help="Move offending rows of the processed tables to data/processed/quarantine/")
+    parser.add_argument('--strict', action='store_true', help="Exit with an error if any issue is found")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    node_keys, issues = validate_nodes(args.quarantine)
+    issues += validate_relationships(node_keys, args.quarantine)
+
+    print("\nValidation summary:")
+    if not issues:
+        print("No orphans or duplicate keys found")
+        return
+    for file_name, issue, count in issues:
+        print(f"  {file_name}: {count} rows with {issue}")
+    if args.quarantine:
+        print(f"Offending rows of processed tables were moved to {quarantine_dir}")
+    if args.strict:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()